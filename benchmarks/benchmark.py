@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+"""Benchmarks for the code visualizer pipeline.
+
+Run with ``uv run python benchmarks/benchmark.py <benchmark> [options]``. Each benchmark prints a
+small table of wall times (in milliseconds) to standard output.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from io import BytesIO
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image
+
+from cs1302_code_visualizer import browser_driver
+from cs1302_code_visualizer import native_renderer
+from cs1302_code_visualizer import trace_format
+from cs1302_code_visualizer import trace_generator
+
+
+SAMPLE_PROGRAM: str = """
+public class Main {
+    public static void main(String[] args) {
+        Person alice = new Person("Alice", 42);
+        int[] numbers = { 1, 2, 3 };
+        for (int i = 0; i < numbers.length; i++) {
+            numbers[i] *= 2;
+        }
+        System.out.println(alice);
+    }
+}
+
+record Person(String name, int age) { };
+"""
+
+
+def time_runs(fn: Callable[[], object], runs: int) -> list[float]:
+    """Call ``fn`` ``runs`` times and return the wall time of each call in milliseconds."""
+    times: list[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def report(rows: dict[str, list[float]]) -> None:
+    """Print the median, minimum and maximum of each row of timings."""
+    name_width = max(len(name) for name in rows)
+    print(f"{'case':<{name_width}}  {'median':>10}  {'min':>10}  {'max':>10}")
+    for name, times in rows.items():
+        print(
+            f"{name:<{name_width}}  {statistics.median(times):>10.1f}"
+            f"  {min(times):>10.1f}  {max(times):>10.1f}"
+        )
+
+
+def bench_startup(args: argparse.Namespace, java_home: Path) -> None:
+    """Compare tracer runs with and without the CDS archive and startup JVM options."""
+    # build the archive up front so it isn't included in the timings
+    trace_generator.ensure_cds_archive(java_home)
+
+    rows: dict[str, list[float]] = {}
+    for name, use_cds in [("trace (default JVM)", False), ("trace (CDS)", True)]:
+        rows[name] = time_runs(
+            lambda: trace_generator.generate_trace(
+                java_home, SAMPLE_PROGRAM, use_cds=use_cds
+            ),
+            args.runs,
+        )
+    report(rows)
+
+    baseline = statistics.median(rows["trace (default JVM)"])
+    improved = statistics.median(rows["trace (CDS)"])
+    print(
+        f"\nstartup improvement: {baseline - improved:.1f} ms ({1 - improved / baseline:.1%})"
+    )
+
+
+ENCODING_CASES: list[tuple[str, str, browser_driver.EncodeOptions]] = [
+    ("PNG", "PNG", {}),
+    ("PNG optimize", "PNG", {"optimize": True}),
+    ("PNG 256 colors", "PNG", {"colors": 256}),
+    ("PNG 64 colors optimize", "PNG", {"colors": 64, "optimize": True}),
+    ("WEBP lossless", "WEBP", {"lossless": True}),
+    ("WEBP quality 90", "WEBP", {"quality": 90}),
+    ("AVIF quality 60", "AVIF", {"quality": 60}),
+    ("GIF 64 colors", "GIF", {"colors": 64}),
+]
+
+
+def sample_snapshot(java_home: Path) -> str:
+    """Return the trace of SAMPLE_PROGRAM at the end of its main method."""
+    traces: dict[str, dict] = json.loads(
+        trace_generator.generate_trace(java_home, SAMPLE_PROGRAM, breakpoints={-1})
+    )
+    return json.dumps(next(iter(traces.values())))
+
+
+def bench_encoding(args: argparse.Namespace, java_home: Path) -> None:
+    """Compare the size and encoding time of a screenshot with each set of encoder options."""
+    trace = sample_snapshot(java_home)
+    screenshot = Image.open(
+        BytesIO(
+            browser_driver.generate_image(
+                trace, dpi=2, encode_options={"compress_level": 0}
+            )
+        )
+    )
+    screenshot.load()
+
+    rows: dict[str, list[float]] = {}
+    sizes: dict[str, int] = {}
+    for name, format, options in ENCODING_CASES:
+        rows[name] = time_runs(
+            lambda: browser_driver.encode_image(screenshot, format, options), args.runs
+        )
+        sizes[name] = len(browser_driver.encode_image(screenshot, format, options))
+    report(rows)
+
+    print(f"\n{'case':<{max(map(len, sizes))}}  {'bytes':>10}")
+    for name, size in sizes.items():
+        print(f"{name:<{max(map(len, sizes))}}  {size:>10}")
+
+
+def bench_browser(args: argparse.Namespace, java_home: Path) -> None:
+    """Compare renders through Selenium and chromedriver with renders over a DevTools pipe.
+
+    Warm renders reuse one browser, so they measure the per-render overhead of each backend. Cold
+    renders include launching the browser.
+    """
+    trace = sample_snapshot(java_home)
+
+    rows: dict[str, list[float]] = {}
+    for backend in ["selenium", "cdp"]:
+        driver = browser_driver.get_webdriver(backend=backend)
+        if backend == "cdp" and not isinstance(driver, browser_driver.CdpDriver):
+            print("skipping cdp: Chrome can't be driven directly", file=sys.stderr)
+            driver.quit()
+            continue
+        try:
+            # the first render loads the frontend's scripts and fonts into the cache
+            browser_driver.generate_image(trace, driver=driver)
+            rows[f"{backend} (warm)"] = time_runs(
+                lambda: browser_driver.generate_image(trace, driver=driver), args.runs
+            )
+        finally:
+            driver.quit()
+
+        browser_driver.BROWSER_BACKEND = backend
+        rows[f"{backend} (cold)"] = time_runs(
+            lambda: browser_driver.generate_image(trace), args.runs
+        )
+    report(rows)
+
+
+def bench_trace_format(args: argparse.Namespace, java_home: Path) -> None:
+    """Compare the size and decoding time of JSON traces and compact traces."""
+    # every step of the loop, so the trace has many similar snapshots
+    trace = trace_generator.generate_trace(
+        java_home, SAMPLE_PROGRAM, breakpoints={7}, accumulate_breakpoints=True
+    )
+
+    rows: dict[str, list[float]] = {
+        "json": time_runs(lambda: json.loads(trace), args.runs)
+    }
+    sizes: dict[str, int] = {"json": len(trace.encode())}
+    compressions = ["none", "gzip"] + (
+        ["zstd"] if trace_format.zstd is not None else []
+    )
+    for compression in compressions:
+        compact_trace = trace_format.encode_trace(trace, compression)
+        name = f"compact ({compression})"
+        rows[name] = time_runs(
+            lambda: trace_format.decode_trace(compact_trace), args.runs
+        )
+        sizes[name] = len(compact_trace)
+    report(rows)
+
+    print(f"\n{'case':<{max(map(len, sizes))}}  {'bytes':>10}")
+    for name, size in sizes.items():
+        print(f"{name:<{max(map(len, sizes))}}  {size:>10}")
+
+
+def bench_native(args: argparse.Namespace, java_home: Path) -> None:
+    """Compare the native renderer with browser screenshots, at two resolutions.
+
+    Warm browser renders reuse one browser and cold ones include launching it. Native renders
+    include painting and encoding the image. The layout of the trace alone is timed separately.
+    """
+    trace = sample_snapshot(java_home)
+
+    rows: dict[str, list[float]] = {
+        "native layout": time_runs(lambda: native_renderer.layout(trace), args.runs)
+    }
+    for dpi in [1, 2]:
+        rows[f"native PNG (dpi {dpi})"] = time_runs(
+            lambda: native_renderer.generate_image(trace, dpi=dpi), args.runs
+        )
+    rows["native SVG"] = time_runs(
+        lambda: native_renderer.generate_image(trace, format=native_renderer.SVG),
+        args.runs,
+    )
+
+    for dpi in [1, 2]:
+        driver = browser_driver.get_webdriver(dpi)
+        try:
+            # the first render loads the frontend's scripts and fonts into the cache
+            browser_driver.generate_image(trace, dpi=dpi, driver=driver)
+            rows[f"browser PNG (dpi {dpi}, warm)"] = time_runs(
+                lambda: browser_driver.generate_image(trace, dpi=dpi, driver=driver),
+                args.runs,
+            )
+        finally:
+            driver.quit()
+    rows["browser PNG (dpi 1, cold)"] = time_runs(
+        lambda: browser_driver.generate_image(trace), args.runs
+    )
+    report(rows)
+
+    native = statistics.median(rows["native PNG (dpi 2)"])
+    browser = statistics.median(rows["browser PNG (dpi 2, warm)"])
+    print(f"\nnative speedup over a warm browser at dpi 2: {browser / native:.1f}x")
+
+
+BENCHMARKS: dict[str, Callable[[argparse.Namespace, Path], None]] = {
+    "startup": bench_startup,
+    "encoding": bench_encoding,
+    "browser": bench_browser,
+    "trace-format": bench_trace_format,
+    "native": bench_native,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Code visualizer benchmarks")
+
+    parser.add_argument(
+        "benchmark",
+        help="The benchmark to run.",
+        choices=list(BENCHMARKS),
+    )
+
+    parser.add_argument(
+        "--runs",
+        "-n",
+        help="Number of timed runs per case.",
+        type=int,
+        default=10,
+    )
+
+    parser.add_argument(
+        "--jdk",
+        help=(
+            "Path to the home of a JDK 21+ installation. If not provided, "
+            "the script will attempt to download one itself."
+        ),
+    )
+
+    args = parser.parse_args()
+
+    if args.jdk is not None and trace_generator.jdk_exists(args.jdk):
+        java_home = Path(args.jdk)
+    else:
+        java_home = trace_generator.ensure_jdk_installed()
+
+    trace_generator.ensure_code_tracer_installed()
+
+    BENCHMARKS[args.benchmark](args, java_home)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
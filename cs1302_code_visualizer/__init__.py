@@ -1,15 +1,34 @@
 #!/bin/env python3
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from typing import Iterator
+import argparse
+import base64
 import fileinput
+import os
+import tarfile
+import time
 
 import json
+from io import BytesIO
 from pathlib import Path
 from sys import stdout
 import logging
 
 from . import browser_driver
+from . import native_renderer
+from . import process_usage
 from . import trace_generator
+from . import watch
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# A single rendered image, or a mapping from each (dpi, format) pair to an image when several
+# resolutions or formats are requested.
+RenderedImage = bytes | dict[tuple[int, str], bytes]
 
 
 def render_images(
@@ -18,15 +37,22 @@ def render_images(
     *,
     java_home: Path | None = None,
     timeout_secs: int | None = None,
-    dpi: int = 1,
-    format: str = "PNG",
+    dpi: int | list[int] = 1,
+    format: str | list[str] = "PNG",
     inline_strings: bool = True,
     remove_main_args: bool = True,
     include_types: bool = True,
     text_memory_labels: bool = False,
     strip_type_prefixes: list[str] = [],
     render_all_breakpoint_occurrences: bool = False,
-) -> dict[int, bytes] | dict[int, list[bytes]]:
+    limits: trace_generator.TracerLimits | None = None,
+    trace: str | None = None,
+    animate: bool = False,
+    frame_duration_ms: int = 1000,
+    encode_options: browser_driver.EncodeOptions | None = None,
+    renderer: str | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> dict[int, RenderedImage] | dict[int, list[RenderedImage]]:
     """Visualize the state of a Java program at given breakpoints.
     java_source:         The Java source code to visualize.
     breakpoints:         The source lines at which an execution snapshot should be taken. If a line is
@@ -36,9 +62,10 @@ def render_images(
                          automatically.
     timeout_secs:        Maximum execution time for the Java source's trace generation, or no limit if
                          None.
-    dpi:                 A positive, integer multiplicative factor for the output image's resolution.
-    format:              The image output format. This gets passed directly into PIL's Image.save() method,
-                         refer to that method's documentation for acceptable values.
+    dpi:                 A positive, integer multiplicative factor for the output image's resolution, or a
+                         list of them. All resolutions are captured from a single page render.
+    format:              The image output format, or a list of them. This gets passed directly into PIL's
+                         Image.save() method, refer to that method's documentation for acceptable values.
     inline_strings:      True if strings should be inlined in the visualization, false if they should be
                          rendered separately on the heap.
     remove_main_args:    False if the visualization should include the main method's `args` parameter,
@@ -48,59 +75,346 @@ def render_images(
     strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
     render_all_breakpoint_occurrences: If true, render each occurrence of a breakpoint as a separate image.
                          This changes the return type of the function.
+    limits:              Resource limits (memory, CPU time, output size) for the trace generation. See
+                         trace_generator.TracerLimits.
+    trace:               A trace already generated for java_source with these breakpoints, e.g. the
+                         `trace` of breakpoint_lister.list_breakpoints_and_trace(). If given, the tracer
+                         isn't run again. It must have been generated with accumulated breakpoints if
+                         render_all_breakpoint_occurrences or animate is true.
+    animate:             If true, render every occurrence of each breakpoint as a frame of one animated
+                         image per breakpoint line. format must then be PNG (APNG), WEBP or GIF, and dpi
+                         and format must not be lists. All frames are captured in a single page session.
+    frame_duration_ms:   How long each animation frame is shown, in milliseconds.
+    encode_options:      Palette quantization, compression and quality options for the image encoders. See
+                         browser_driver.encode_image. Images are encoded in the background while the next
+                         snapshot is rendered.
+    renderer:            "browser" to screenshot the frontend, or "native" to draw images without a
+                         browser (see native_renderer), which also supports the "SVG" format. Snapshots
+                         the native renderer doesn't support are rendered by the browser. Defaults to
+                         native_renderer.RENDERER. Animations are always rendered by the browser.
+    usage:               If given, the wall time, CPU time and peak memory of the tracer's and the
+                         browser's process trees are sampled and appended to this list (one entry per
+                         tracer run or browser session). See process_usage.ProcessUsage.
 
     out:                 Mapping from a breakpoint line to a visualization image. If
                          render_all_breakpoint_occurrences is true, then this instead returns a mapping from
                          a breakpoint line to a list of visualization images (first occurrence first,
-                         last occurrence last).
+                         last occurrence last). If dpi or format is a list, each image is instead a
+                         mapping from a (dpi, format) pair to the image at that resolution and format.
+                         If animate is true, each breakpoint line maps to one animated image.
+
+    Note that exceptions may be raised if image generation fails.
+    """
+    if trace is None:
+        trace = _generate_trace(
+            java_source,
+            breakpoints,
+            java_home=java_home,
+            timeout_secs=timeout_secs,
+            inline_strings=inline_strings,
+            remove_main_args=remove_main_args,
+            accumulate_breakpoints=render_all_breakpoint_occurrences or animate,
+            limits=limits,
+            usage=usage,
+        )
+
+    if animate:
+        assert isinstance(dpi, int) and isinstance(
+            format, str
+        ), "dpi and format can't be lists when animating"
+        traces_accumulated: dict[str, list[dict]] = json.loads(trace)
+        frames = browser_driver.capture_frames(
+            [
+                json.dumps(occurrence)
+                for line in traces_accumulated
+                for occurrence in traces_accumulated[line]
+            ],
+            dpi=dpi,
+            include_types=include_types,
+            text_memory_labels=text_memory_labels,
+            strip_type_prefixes=strip_type_prefixes,
+        )
+        out = dict()
+        for line in traces_accumulated:
+            line_frames = frames[: len(traces_accumulated[line])]
+            frames = frames[len(traces_accumulated[line]) :]
+            out[int(line)] = browser_driver.encode_animation(
+                line_frames,
+                format=format,
+                frame_duration_ms=frame_duration_ms,
+            )
+        return out
+
+    submit_images = (
+        native_renderer.submit_images_with_fallback
+        if (renderer or native_renderer.RENDERER) == "native"
+        else browser_driver.submit_images
+    )
+
+    def render(snapshot: dict) -> dict[tuple[int, str], Future[bytes]]:
+        return submit_images(
+            json.dumps(snapshot),
+            dpis=dpi if isinstance(dpi, list) else [dpi],
+            formats=format if isinstance(format, list) else [format],
+            include_types=include_types,
+            text_memory_labels=text_memory_labels,
+            strip_type_prefixes=strip_type_prefixes,
+            encode_options=encode_options,
+            usage=usage,
+        )
+
+    def result(images: dict[tuple[int, str], Future[bytes]]) -> RenderedImage:
+        if isinstance(dpi, list) or isinstance(format, list):
+            return {key: image.result() for key, image in images.items()}
+        return images[(dpi, format)].result()
+
+    # every snapshot is rendered before waiting for the encoders
+    if render_all_breakpoint_occurrences:
+        traces_accumulated: dict[str, list[dict]] = json.loads(trace)
+        pending = {
+            int(line): [render(occurrence) for occurrence in traces_accumulated[line]]
+            for line in traces_accumulated
+        }
+        out = defaultdict(list)
+        for line, occurrences in pending.items():
+            out[line] = [result(images) for images in occurrences]
+        return out
+    else:
+        traces: dict[str, dict] = json.loads(trace)
+        pending = {int(line): render(traces[line]) for line in traces}
+        return {line: result(images) for line, images in pending.items()}
+
+
+def iter_render_images(
+    java_source: str,
+    breakpoints: set[int],
+    *,
+    java_home: Path | None = None,
+    timeout_secs: int | None = None,
+    dpi: int = 1,
+    format: str = "PNG",
+    inline_strings: bool = True,
+    remove_main_args: bool = True,
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    render_all_breakpoint_occurrences: bool = False,
+    limits: trace_generator.TracerLimits | None = None,
+    trace: str | None = None,
+    encode_options: browser_driver.EncodeOptions | None = None,
+    renderer: str | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> Iterator[tuple[int, int, bytes]]:
+    """Visualize the state of a Java program at given breakpoints, one image at a time.
+
+    Like render_images, but images are yielded as soon as they are encoded instead of being
+    collected, so they can be written out or uploaded right away and memory use doesn't grow with
+    the number of snapshots. One browser renders every snapshot, and only a few images (one per
+    encoder thread) are in flight at a time. Images are yielded in breakpoint and occurrence order.
+
+    The arguments are the same as those of render_images, except that dpi and format can't be
+    lists and there are no animations. With the native renderer, the browser is only started for
+    the first snapshot that the native renderer doesn't support.
+
+    out:                 Tuples of a breakpoint line, an occurrence number and the image of that
+                         occurrence. Occurrences are numbered from 1 if
+                         render_all_breakpoint_occurrences is true. Otherwise, only the last
+                         occurrence of each breakpoint is rendered and its number is -1.
+
+    Note that exceptions may be raised if image generation fails.
+    """
+    if trace is None:
+        trace = _generate_trace(
+            java_source,
+            breakpoints,
+            java_home=java_home,
+            timeout_secs=timeout_secs,
+            inline_strings=inline_strings,
+            remove_main_args=remove_main_args,
+            accumulate_breakpoints=render_all_breakpoint_occurrences,
+            limits=limits,
+            usage=usage,
+        )
+
+    snapshots: list[tuple[int, int, dict]] = []
+    if render_all_breakpoint_occurrences:
+        traces_accumulated: dict[str, list[dict]] = json.loads(trace)
+        for line in traces_accumulated:
+            for occurrence, snapshot in enumerate(traces_accumulated[line], start=1):
+                snapshots.append((int(line), occurrence, snapshot))
+    else:
+        traces: dict[str, dict] = json.loads(trace)
+        for line in traces:
+            snapshots.append((int(line), -1, traces[line]))
+    del trace
+
+    max_in_flight: int = os.cpu_count() or 1
+    in_flight: deque[tuple[int, int, Future[bytes]]] = deque()
+
+    native: bool = (renderer or native_renderer.RENDERER) == "native"
+    driver = None if native else browser_driver.get_webdriver(dpi)
+
+    def submit(snapshot: str) -> Future[bytes]:
+        nonlocal driver
+        options = dict(
+            dpis=[dpi],
+            formats=[format],
+            include_types=include_types,
+            text_memory_labels=text_memory_labels,
+            strip_type_prefixes=strip_type_prefixes,
+            encode_options=encode_options,
+        )
+        if native:
+            try:
+                return native_renderer.submit_images(snapshot, **options)[(dpi, format)]
+            except native_renderer.UnsupportedTrace as exc:
+                # the browser can't write SVG images
+                if format.upper() == native_renderer.SVG:
+                    raise
+                logger.info(f"Rendering with the browser: {exc}")
+        if driver is None:
+            driver = browser_driver.get_webdriver(dpi)
+        return browser_driver.submit_images(
+            snapshot, driver=driver, usage=usage, **options
+        )[(dpi, format)]
+
+    try:
+        for line, occurrence, snapshot in snapshots:
+            in_flight.append((line, occurrence, submit(json.dumps(snapshot))))
+            while len(in_flight) > max_in_flight or (
+                in_flight and in_flight[0][2].done()
+            ):
+                line, occurrence, image = in_flight.popleft()
+                yield line, occurrence, image.result()
+        while in_flight:
+            line, occurrence, image = in_flight.popleft()
+            yield line, occurrence, image.result()
+    finally:
+        if driver is not None:
+            driver.quit()
+
+
+def stream_images(
+    images: Iterator[tuple[int, int, bytes]], format: str, output_format: str
+) -> None:
+    """Write images from iter_render_images to standard output as they arrive.
+
+    Args:
+        images: The images, see iter_render_images.
+        format: The format of the images, used for their file name extension.
+        output_format: ``tar`` for an uncompressed tar archive with one ``<line>.<ext>`` (or
+            ``<line>-<occurrence>.<ext>``) member per image, or ``ndjson`` for one JSON object per
+            line with the ``line``, ``occurrence``, ``format`` and base64-encoded ``data`` of an
+            image.
+    """
+    extension = format.lower()
+    if output_format == "tar":
+        with tarfile.open(fileobj=stdout.buffer, mode="w|") as archive:
+            for line, occurrence, image in images:
+                name = (
+                    f"{line}.{extension}"
+                    if occurrence == -1
+                    else f"{line}-{occurrence}.{extension}"
+                )
+                info = tarfile.TarInfo(name)
+                info.size = len(image)
+                info.mtime = int(time.time())
+                archive.addfile(info, BytesIO(image))
+                stdout.buffer.flush()
+    else:
+        for line, occurrence, image in images:
+            record = {
+                "line": line,
+                "occurrence": occurrence,
+                "format": format,
+                "data": base64.b64encode(image).decode(),
+            }
+            stdout.write(json.dumps(record) + "\n")
+            stdout.flush()
+
+
+def render_animation(
+    java_source: str,
+    breakpoints: set[int],
+    *,
+    java_home: Path | None = None,
+    timeout_secs: int | None = None,
+    dpi: int = 1,
+    format: str = "PNG",
+    frame_duration_ms: int = 1000,
+    inline_strings: bool = True,
+    remove_main_args: bool = True,
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    limits: trace_generator.TracerLimits | None = None,
+) -> bytes:
+    """Visualize every occurrence of the given breakpoints as a single animated image.
+
+    Frames are ordered by breakpoint line (in the tracer's output order), then by occurrence, so
+    with a single breakpoint line the animation follows the program's execution. The arguments are
+    the same as those of render_images; format must be PNG (APNG), WEBP or GIF.
+
+    out:                 The bytes of the animated image.
 
     Note that exceptions may be raised if image generation fails.
     """
+    trace = _generate_trace(
+        java_source,
+        breakpoints,
+        java_home=java_home,
+        timeout_secs=timeout_secs,
+        inline_strings=inline_strings,
+        remove_main_args=remove_main_args,
+        accumulate_breakpoints=True,
+        limits=limits,
+    )
+
+    traces_accumulated: dict[str, list[dict]] = json.loads(trace)
+    return browser_driver.generate_animation(
+        [
+            json.dumps(occurrence)
+            for line in traces_accumulated
+            for occurrence in traces_accumulated[line]
+        ],
+        dpi=dpi,
+        format=format,
+        frame_duration_ms=frame_duration_ms,
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+    )
+
+
+def _generate_trace(
+    java_source: str,
+    breakpoints: set[int],
+    *,
+    java_home: Path | None,
+    timeout_secs: int | None,
+    inline_strings: bool,
+    remove_main_args: bool,
+    accumulate_breakpoints: bool,
+    limits: trace_generator.TracerLimits | None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> str:
     if not (java_home and trace_generator.jdk_exists(java_home)):
         java_home = trace_generator.ensure_jdk_installed()
 
     trace_generator.ensure_code_tracer_installed()
 
-    trace = trace_generator.generate_trace(
+    return trace_generator.generate_trace(
         java_home,
         java_source,
         timeout_secs,
         inline_strings,
         remove_main_args,
         breakpoints,
-        accumulate_breakpoints=render_all_breakpoint_occurrences,
+        accumulate_breakpoints=accumulate_breakpoints,
+        limits=limits,
+        usage=usage,
     )
 
-    if render_all_breakpoint_occurrences:
-        traces_accumulated: dict[str, list[dict]] = json.loads(trace)
-        out = defaultdict(list)
-        for line in traces_accumulated:
-            for occurrence in traces_accumulated[line]:
-                out[int(line)].append(
-                    browser_driver.generate_image(
-                        json.dumps(occurrence),
-                        dpi=dpi,
-                        format=format,
-                        include_types=include_types,
-                        text_memory_labels=text_memory_labels,
-                        strip_type_prefixes=strip_type_prefixes,
-                    )
-                )
-        return out
-    else:
-        traces: dict[str, dict] = json.loads(trace)
-        out = dict()
-        for line in traces:
-            out[int(line)] = browser_driver.generate_image(
-                json.dumps(traces[line]),
-                dpi=dpi,
-                format=format,
-                include_types=include_types,
-                text_memory_labels=text_memory_labels,
-                strip_type_prefixes=strip_type_prefixes,
-            )
-        return out
-
 
 def render_image(
     java_source: str,
@@ -116,6 +430,9 @@ def render_image(
     include_types: bool = True,
     text_memory_labels: bool = False,
     strip_type_prefixes: list[str] = [],
+    limits: trace_generator.TracerLimits | None = None,
+    encode_options: browser_driver.EncodeOptions | None = None,
+    renderer: str | None = None,
 ) -> bytes:
     """Visualize the state of a Java program just before exiting as an image.
 
@@ -156,6 +473,17 @@ def render_image(
 
         strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
 
+        limits: Resource limits (memory, CPU time, output size) for the trace generation. See
+            trace_generator.TracerLimits.
+
+        encode_options: Palette quantization, compression and quality options for the image
+            encoder. See browser_driver.encode_image.
+
+        renderer: "browser" to screenshot the frontend, or "native" to draw the image without a
+            browser (see native_renderer), which also supports the "SVG" format. Traces the native
+            renderer doesn't support are rendered by the browser. Defaults to
+            native_renderer.RENDERER.
+
     Return:
 
         Raw bytes of the visualization image.
@@ -198,6 +526,7 @@ def render_image(
             remove_main_args,
             breakpoints=breakpoints,
             accumulate_breakpoints=breakpoint_index != None,
+            limits=limits,
         )
 
         traces: dict[str, list[dict]] = json.loads(execution_trace)
@@ -217,6 +546,16 @@ def render_image(
         raise Exception("Unable to generate execution trace!") from exc
 
     try:
+        if (renderer or native_renderer.RENDERER) == "native":
+            return native_renderer.submit_images_with_fallback(
+                trace,
+                dpis=[dpi],
+                formats=[format],
+                include_types=include_types,
+                text_memory_labels=text_memory_labels,
+                strip_type_prefixes=strip_type_prefixes,
+                encode_options=encode_options,
+            )[(dpi, format)].result()
         output: bytes = browser_driver.generate_image(
             trace,
             dpi=dpi,
@@ -224,6 +563,7 @@ def render_image(
             include_types=include_types,
             text_memory_labels=text_memory_labels,
             strip_type_prefixes=strip_type_prefixes,
+            encode_options=encode_options,
         )
         return output
     except Exception as exc:
@@ -232,12 +572,188 @@ def render_image(
         ) from exc
 
 
+def watch_render(
+    java_file: Path,
+    breakpoints: set[int],
+    output: str,
+    *,
+    java_home: Path | None = None,
+    timeout_secs: int | None = None,
+    dpi: int = 1,
+    format: str = "PNG",
+    inline_strings: bool = False,
+    remove_main_args: bool = True,
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    limits: trace_generator.TracerLimits | None = None,
+) -> None:
+    """Render a Java file's breakpoints again whenever the file changes, until interrupted.
+
+    A tracer JVM and a browser are kept running between changes, and only the breakpoints whose
+    snapshot changed since the previous iteration are rendered again. The images of breakpoints
+    that are no longer reached are deleted. The latency of each iteration is printed to standard
+    error.
+
+    java_file:           The Java source file to watch.
+    breakpoints:         The source lines at which an execution snapshot should be taken.
+    output:              Output path of the images. It may contain a {line} placeholder, which is
+                         replaced by the breakpoint line of each image.
+
+    The remaining arguments are the same as those of render_images.
+    """
+    if not (java_home and trace_generator.jdk_exists(java_home)):
+        java_home = trace_generator.ensure_jdk_installed()
+
+    trace_generator.ensure_code_tracer_installed()
+
+    command: list[str] = trace_generator.tracer_command(
+        java_home, limits=limits
+    ) + trace_generator.trace_arguments(inline_strings, remove_main_args, breakpoints)
+
+    rendered_snapshots: dict[str, str] = {}
+
+    driver = browser_driver.get_webdriver(dpi)
+    try:
+        with trace_generator.WarmTracer(command, limits) as tracer:
+
+            def rerender() -> str:
+                traces: dict[str, dict] = json.loads(
+                    tracer.run(java_file.read_text(), timeout_secs)
+                )
+                rendered_count = 0
+                for line in traces:
+                    snapshot = json.dumps(traces[line], sort_keys=True)
+                    if rendered_snapshots.get(line) == snapshot:
+                        continue
+                    image = browser_driver.generate_image(
+                        snapshot,
+                        dpi=dpi,
+                        format=format,
+                        include_types=include_types,
+                        text_memory_labels=text_memory_labels,
+                        strip_type_prefixes=strip_type_prefixes,
+                        driver=driver,
+                    )
+                    trace_generator.atomic_write(Path(output.format(line=line)), image)
+                    rendered_snapshots[line] = snapshot
+                    rendered_count += 1
+
+                # without a {line} placeholder, every breakpoint shares the same image path
+                current_paths = {output.format(line=line) for line in traces}
+                for line in set(rendered_snapshots) - set(traces):
+                    del rendered_snapshots[line]
+                    if (path := output.format(line=line)) not in current_paths:
+                        Path(path).unlink(missing_ok=True)
+                return f"rendered {rendered_count} of {len(traces)} breakpoints"
+
+            watch.watch_files([java_file], rerender)
+    finally:
+        driver.quit()
+
+
 def main() -> None:
-    java_source: str = "".join(fileinput.input())
+    parser = argparse.ArgumentParser(
+        description="Render an image of a Java program's memory state."
+    )
+
+    parser.add_argument(
+        "files",
+        help="Java source files to read, or none for standard input.",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "--watch",
+        "-w",
+        help=(
+            "Render the (single) input file again whenever it changes, keeping a tracer JVM "
+            "and a browser running between changes. Requires --output. Stop with Ctrl+C."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--stream",
+        help=(
+            "Render every breakpoint and write the images to standard output as they are "
+            "done, as a tar archive or as newline-delimited JSON."
+        ),
+        choices=["tar", "ndjson"],
+    )
+
+    parser.add_argument(
+        "--all-occurrences",
+        help="In --stream mode, render every occurrence of each breakpoint.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--breakpoint",
+        "-b",
+        help=(
+            "Breakpoint line to render in --watch or --stream mode. May be given more than "
+            "once. Defaults to the end of the main method."
+        ),
+        type=int,
+        action="append",
+    )
+
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="Image path in --watch mode. May contain a {line} placeholder.",
+    )
+
+    parser.add_argument(
+        "--renderer",
+        help=(
+            "Screenshot the frontend in a browser, or draw the image natively, falling back to "
+            "the browser for traces the native renderer doesn't support. Not used in --watch "
+            "mode."
+        ),
+        choices=["browser", "native"],
+    )
+
+    args = parser.parse_args()
+
+    if args.watch:
+        if len(args.files) != 1 or args.output is None:
+            parser.error("--watch requires a single input file and --output")
+        breakpoints: set[int] = set(args.breakpoint or [-1])
+        if len(breakpoints) > 1 and "{line}" not in args.output:
+            parser.error("several breakpoints require a {line} placeholder in --output")
+        watch_render(
+            Path(args.files[0]),
+            breakpoints,
+            args.output,
+            dpi=2,
+            strip_type_prefixes=["java.util.", "java.lang."],
+        )
+        return
+
+    java_source: str = "".join(fileinput.input(args.files))
+
+    if args.stream is not None:
+        stream_images(
+            iter_render_images(
+                java_source,
+                set(args.breakpoint or [-1]),
+                dpi=2,
+                strip_type_prefixes=["java.util.", "java.lang."],
+                render_all_breakpoint_occurrences=args.all_occurrences,
+                renderer=args.renderer,
+            ),
+            "PNG",
+            args.stream,
+        )
+        return
+
     rendered_image: bytes = render_image(
         java_source,
         dpi=2,
         strip_type_prefixes=["java.util.", "java.lang."],
         breakpoint_line=(36, 9),
+        renderer=args.renderer,
     )
     stdout.buffer.write(rendered_image)
@@ -1,20 +1,26 @@
 #!/usr/bin/env python3
 
+import bisect
 import fileinput
+import hashlib
 import json
+import re
+import threading
 import argparse
 import os
 import sys
 import subprocess
 import logging
-from typing import Any
+from typing import Any, TypedDict
 import platformdirs
 
 from subprocess import CalledProcessError
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from halo import Halo as spinner
 
 from . import trace_generator
+from . import watch
 
 
 logger: logging.Logger = logging.getLogger(__name__)
@@ -29,12 +35,27 @@ cache_dir: Path = Path(
 )
 
 
+def breakpoint_cache_path(java_program: str, output_json: bool) -> Path:
+    """Return the cache file for a program's breakpoint listing.
+
+    The listing is keyed by the SHA256 sum of the source and of the installed tracer JAR, so
+    updating the tracer invalidates every cached listing.
+    """
+    key = hashlib.sha256()
+    key.update(trace_generator.file_sha256(cache_dir / "code-tracer.jar").encode())
+    key.update(b"json" if output_json else b"text")
+    key.update(java_program.encode())
+    return cache_dir / "breakpoints" / f"{key.hexdigest()}.txt"
+
+
 def list_breakpoints(
     java_program: str,
     java_home: Path | None,
     timeout_secs: float | None = None,
     output_json: bool = False,
     verbose: bool = False,
+    limits: trace_generator.TracerLimits | None = None,
+    use_cache: bool = True,
 ) -> str:
 
     if not (java_home and trace_generator.jdk_exists(java_home)):
@@ -45,31 +66,37 @@ def list_breakpoints(
     except Exception as exc:
         raise Exception("Unable to ensure code tracer is installed!") from exc
 
+    cache_path = breakpoint_cache_path(java_program, output_json)
+    if use_cache and cache_path.is_file():
+        logger.debug(f"Using cached breakpoint listing {cache_path}")
+        return cache_path.read_text()
+
     args: list[str] = []
 
     args.append("list-breakpoints")
     if output_json:
         args.append("--json")
 
-    return subprocess.check_output(
-        (
-            [
-                str(java_home / "bin" / "java"),
-                "-jar",
-                str(cache_dir / "code-tracer.jar"),
-            ]
-            + args
-        ),
-        input=java_program,
-        timeout=timeout_secs,
-        text=True,
+    output = trace_generator.run_tracer(
+        trace_generator.tracer_command(java_home, limits=limits) + args,
+        java_program,
+        timeout_secs,
+        limits,
     )
 
+    if use_cache:
+        trace_generator.atomic_write(cache_path, output.encode())
+
+    return output
+
+
 def list_breakpoints_json(
     java_program: str,
     java_home: Path | None,
     timeout_secs: float | None = None,
     verbose: bool = False,
+    limits: trace_generator.TracerLimits | None = None,
+    use_cache: bool = True,
 ) -> dict[str, Any]:
     list_breakpoints_output = list_breakpoints(
         java_program=java_program,
@@ -77,9 +104,321 @@ def list_breakpoints_json(
         timeout_secs=timeout_secs,
         output_json=True,
         verbose=verbose,
+        limits=limits,
+        use_cache=use_cache,
     ).strip()
     return json.loads(list_breakpoints_output)
 
+
+# Tokens of Java source that matter for finding statements. Comments and literals are matched so
+# that braces and semicolons inside of them are skipped.
+JAVA_TOKEN_PATTERN: re.Pattern = re.compile(
+    r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+    | (?P<literal>\"\"\".*?\"\"\"|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<word>[A-Za-z_$][A-Za-z0-9_$]*)
+    | (?P<symbol>->|[{}();:=])
+    | (?P<other>\S)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+TYPE_KEYWORDS: set[str] = {"class", "interface", "enum", "record"}
+
+CONTROL_KEYWORDS: set[str] = {"if", "for", "while", "synchronized", "catch", "switch"}
+
+LABEL_KEYWORDS: set[str] = {"case", "default"}
+
+# tokens that never start a statement, such as the ``)`` and ``;`` of a line holding only ``});``
+NON_STATEMENT_TOKENS: set[str] = {
+    "{",
+    "}",
+    ";",
+    ")",
+    "]",
+    ",",
+    "else",
+    "do",
+    "try",
+    "finally",
+}
+
+
+def _follows_new(statement_tokens: list[str]) -> bool:
+    """Return whether the tokens end in a ``new`` expression's type, e.g. ``new Foo<T>``."""
+    for token in reversed(statement_tokens):
+        if token == "new":
+            return True
+        if not (
+            token in {".", "<", ">", ",", "?"} or token[0].isalpha() or token[0] in "_$"
+        ):
+            return False
+    return False
+
+
+def approximate_breakpoints(java_program: str) -> list[int]:
+    """Guess the breakable lines of a Java program without running the tracer.
+
+    The source is tokenized and every line on which a statement starts inside of a method,
+    constructor or initializer body is reported. This is only an approximation of what
+    ``list_breakpoints`` returns; it's meant to give editors an instant answer while the
+    authoritative listing is computed (see ``list_breakpoints_async``).
+
+    Return:
+        The 1-based line numbers of the likely breakpoints, in ascending order.
+    """
+    line_starts: list[int] = [0] + [
+        match.end() for match in re.finditer("\n", java_program)
+    ]
+
+    lines: set[int] = set()
+    # kind of each open brace: "type" (class body), "code" (method or statement block) or "expr"
+    # (array initializer)
+    blocks: list[str] = []
+    statement_tokens: list[str] = []
+    paren_depth: int = 0
+    # whether each open parenthesis holds the arguments of a ``new`` expression
+    new_parens: list[bool] = []
+    # whether the previous token closed the arguments of a ``new`` expression, so that a brace
+    # after it opens an anonymous class body
+    after_new_arguments: bool = False
+    expect_statement: bool = True
+
+    for match in JAVA_TOKEN_PATTERN.finditer(java_program):
+        if match.lastgroup == "comment":
+            continue
+        token = match.group()
+
+        if (
+            expect_statement
+            and blocks
+            and blocks[-1] == "code"
+            and token not in NON_STATEMENT_TOKENS
+            and token not in LABEL_KEYWORDS
+        ):
+            lines.add(bisect.bisect_right(line_starts, match.start()))
+        expect_statement = False
+        closes_new_arguments = after_new_arguments
+        after_new_arguments = False
+
+        if token == "(":
+            new_parens.append(_follows_new(statement_tokens))
+            paren_depth += 1
+        elif token == ")":
+            after_new_arguments = bool(new_parens) and new_parens.pop()
+            paren_depth = max(0, paren_depth - 1)
+            # the body of a control statement without braces is a statement of its own
+            if (
+                paren_depth == 0
+                and statement_tokens[:1]
+                and statement_tokens[0] in CONTROL_KEYWORDS
+            ):
+                statement_tokens = []
+                expect_statement = True
+        elif token == "{":
+            # method headers in a class body, anonymous ones included, are declarations
+            if TYPE_KEYWORDS.intersection(statement_tokens) or closes_new_arguments:
+                blocks.append("type")
+            elif statement_tokens[-1:] in (["="], ["]"]) or (
+                blocks and blocks[-1] == "expr"
+            ):
+                blocks.append("expr")
+            else:
+                blocks.append("code")
+            statement_tokens = []
+            paren_depth = 0
+            new_parens = []
+            expect_statement = True
+        elif token == "}":
+            if blocks:
+                blocks.pop()
+            statement_tokens = []
+            expect_statement = True
+        elif token == ";" and paren_depth == 0:
+            statement_tokens = []
+            expect_statement = True
+        elif token in {"else", "do", "try", "finally"} and paren_depth == 0:
+            statement_tokens = []
+            expect_statement = True
+        elif (
+            token in {":", "->"}
+            and statement_tokens[:1]
+            and statement_tokens[0] in LABEL_KEYWORDS
+        ):
+            statement_tokens = []
+            expect_statement = True
+        else:
+            statement_tokens.append(token)
+
+    return sorted(lines)
+
+
+class PendingBreakpoints(TypedDict):
+    approximate: list[int]
+    listing: Future[dict[str, Any]]
+
+
+_background_executor: ThreadPoolExecutor | None = None
+# background listings by the SHA256 sum of their source
+_in_flight: dict[str, Future[dict[str, Any]]] = {}
+_in_flight_lock: threading.Lock = threading.Lock()
+
+
+def list_breakpoints_async(
+    java_program: str,
+    java_home: Path | None,
+    timeout_secs: float | None = None,
+    limits: trace_generator.TracerLimits | None = None,
+) -> PendingBreakpoints:
+    """List a program's breakpoints, answering instantly with an approximation.
+
+    The authoritative JSON listing is computed by the tracer in a background thread (or read from
+    the cache) and delivered through the returned future, which should replace the approximation
+    once it's done. Concurrent calls for the same source share a single tracer run. Resolving the
+    JDK and installing the tracer happen in the background too, so this never waits on them.
+
+    Return:
+        The ``approximate_breakpoints`` lines, and a future for the ``list_breakpoints_json``
+        result.
+    """
+    global _background_executor
+
+    approximate = approximate_breakpoints(java_program)
+
+    # the cache is keyed by the tracer JAR, so there is nothing cached before it's installed
+    if (cache_dir / "code-tracer.jar").is_file():
+        cache_path = breakpoint_cache_path(java_program, output_json=True)
+        if cache_path.is_file():
+            listing: Future[dict[str, Any]] = Future()
+            listing.set_result(json.loads(cache_path.read_text().strip()))
+            return PendingBreakpoints(approximate=approximate, listing=listing)
+
+    source_hash = hashlib.sha256(java_program.encode()).hexdigest()
+    with _in_flight_lock:
+        if source_hash not in _in_flight:
+            if _background_executor is None:
+                _background_executor = ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix="list-breakpoints"
+                )
+            future = _background_executor.submit(
+                list_breakpoints_json,
+                java_program,
+                java_home,
+                timeout_secs,
+                limits=limits,
+            )
+            _in_flight[source_hash] = future
+
+            def forget(_: Future, source_hash: str = source_hash):
+                with _in_flight_lock:
+                    _in_flight.pop(source_hash, None)
+
+            future.add_done_callback(forget)
+        listing = _in_flight[source_hash]
+
+    return PendingBreakpoints(approximate=approximate, listing=listing)
+
+
+class BreakpointsAndTrace(TypedDict):
+    breakpoints: dict[str, Any]
+    trace: str
+
+
+def list_breakpoints_and_trace(
+    java_program: str,
+    java_home: Path | None,
+    breakpoints: set[int],
+    timeout_secs: float | None = None,
+    inline_strings: bool = True,
+    remove_main_args: bool = True,
+    accumulate_breakpoints: bool = False,
+    limits: trace_generator.TracerLimits | None = None,
+    use_cache: bool = True,
+    concurrent: bool = False,
+) -> BreakpointsAndTrace:
+    """List the available breakpoints of a Java program and trace it in a single call.
+
+    The JDK and tracer checks and the tracer's JVM options (including its CDS archive) are
+    resolved once and shared. The listing is read from the breakpoint cache if it's there, and
+    then only the program is traced. Otherwise, the tracer has no subcommand that does both, so
+    the ``list-breakpoints`` and ``trace`` subcommands run one after the other in two JVMs, and
+    the listing is added to the cache.
+
+    Args:
+        java_program: The Java source code to trace.
+        java_home: A path to a JDK 21+ installation home. If not provided, a JDK will be fetched
+            automatically.
+        breakpoints: The source lines at which an execution snapshot should be taken.
+        timeout_secs: Maximum execution time of each tracer run, or no limit if None.
+        inline_strings: True if strings should be inlined in the trace.
+        remove_main_args: True if the main method's `args` parameter should be left out.
+        accumulate_breakpoints: True if every occurrence of a breakpoint should be traced.
+        limits: Resource limits for each tracer run. See trace_generator.TracerLimits.
+        use_cache: Whether to read and write the cached breakpoint listing.
+        concurrent: If True, run the two JVMs of an uncached listing at the same time. The call
+            then takes about as long as the slower of the two runs, but the peak memory of both.
+
+    Return:
+        The JSON breakpoint listing (as returned by ``list_breakpoints_json``) and the raw trace.
+        The trace can be passed to ``render_images`` through its ``trace`` argument.
+    """
+
+    if not (java_home and trace_generator.jdk_exists(java_home)):
+        java_home = trace_generator.ensure_jdk_installed()
+
+    try:
+        trace_generator.ensure_code_tracer_installed()
+    except Exception as exc:
+        raise Exception("Unable to ensure code tracer is installed!") from exc
+
+    command: list[str] = trace_generator.tracer_command(java_home, limits=limits)
+    trace_command: list[str] = command + trace_generator.trace_arguments(
+        inline_strings,
+        remove_main_args,
+        breakpoints,
+        accumulate_breakpoints,
+    )
+
+    cache_path = breakpoint_cache_path(java_program, output_json=True)
+    if use_cache and cache_path.is_file():
+        logger.debug(f"Using cached breakpoint listing {cache_path}")
+        return BreakpointsAndTrace(
+            breakpoints=json.loads(cache_path.read_text().strip()),
+            trace=trace_generator.run_tracer(
+                trace_command, java_program, timeout_secs, limits
+            ),
+        )
+
+    list_command: list[str] = command + ["list-breakpoints", "--json"]
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            trace_future = executor.submit(
+                trace_generator.run_tracer,
+                trace_command,
+                java_program,
+                timeout_secs,
+                limits,
+            )
+            listing_output = trace_generator.run_tracer(
+                list_command, java_program, timeout_secs, limits
+            )
+            trace = trace_future.result()
+    else:
+        listing_output = trace_generator.run_tracer(
+            list_command, java_program, timeout_secs, limits
+        )
+        trace = trace_generator.run_tracer(
+            trace_command, java_program, timeout_secs, limits
+        )
+
+    if use_cache:
+        trace_generator.atomic_write(cache_path, listing_output.encode())
+    return BreakpointsAndTrace(
+        breakpoints=json.loads(listing_output.strip()),
+        trace=trace,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="List available breakpoints for a Java program."
@@ -126,11 +465,90 @@ def main():
         ),
     )
 
+    parser.add_argument(
+        "--trace",
+        "-t",
+        help=(
+            "Also trace the program and output a JSON object with `breakpoints` and `trace` keys "
+            "(implies --json)."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--breakpoint",
+        "-b",
+        help="Breakpoint line to trace with --trace. May be given more than once.",
+        type=int,
+        action="append",
+        default=[],
+    )
+
+    parser.add_argument(
+        "--concurrent",
+        help=(
+            "With --trace, list the breakpoints and trace the program in two JVMs at the same "
+            "time, which is faster but needs twice the memory."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--accumulate-breakpoints",
+        help="With --trace, trace every occurrence of each breakpoint.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--approximate",
+        help=(
+            "Print the lines that likely have breakpoints, found without running the tracer. "
+            "This is instant, but may differ from the tracer's listing."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        help="Don't read or write cached breakpoint listings.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--watch",
+        "-w",
+        help=(
+            "List the breakpoints of the --input file again whenever it changes, keeping a "
+            "tracer JVM booted between changes. Stop with Ctrl+C."
+        ),
+        action="store_true",
+    )
+
+    trace_generator.add_limit_arguments(parser)
+
     args = parser.parse_args()
 
+    if args.watch and args.input == "-":
+        parser.error("--watch requires an --input file")
+
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
 
+    if args.approximate:
+        approximate_lines = approximate_breakpoints(
+            "".join(fileinput.input(args.input))
+        )
+        if args.json:
+            approximate_output = json.dumps(approximate_lines)
+        else:
+            approximate_output = "\n".join(map(str, approximate_lines))
+        if args.output is None:
+            print(approximate_output)
+        else:
+            with open(args.output, "w") as f:
+                f.write(approximate_output)
+        return
+
     if args.jdk is not None and trace_generator.jdk_exists(args.jdk):
         java_home = Path(args.jdk)
     else:
@@ -140,17 +558,57 @@ def main():
     with spinner(text="Downloading Java tracer...", stream=sys.stderr):
         trace_generator.ensure_code_tracer_installed()
 
+    if args.watch:
+        limits = trace_generator.limits_from_args(args)
+        command = trace_generator.tracer_command(java_home, limits=limits)
+        command += ["list-breakpoints"] + (["--json"] if args.json else [])
+        with trace_generator.WarmTracer(command, limits) as tracer:
+
+            def relist() -> str:
+                java_program = Path(args.input).read_text()
+                cache_path = breakpoint_cache_path(java_program, args.json)
+                if not args.no_cache and cache_path.is_file():
+                    listing = cache_path.read_text()
+                else:
+                    listing = tracer.run(java_program, args.trace_timeout)
+                    if not args.no_cache:
+                        trace_generator.atomic_write(cache_path, listing.encode())
+                if args.output is None:
+                    print(listing)
+                else:
+                    trace_generator.atomic_write(Path(args.output), listing.encode())
+                return f"listed breakpoints of {args.input}"
+
+            watch.watch_files([Path(args.input)], relist)
+        return
+
     # get java file from stdin
     java_input = "".join(fileinput.input(args.input))
 
     try:
         with spinner(text="Generating execution trace...", stream=sys.stderr):
-            list_breakpoints_output = list_breakpoints(
-                java_program=java_input,
-                java_home=java_home,
-                timeout_secs=args.trace_timeout,
-                output_json=args.json,
-            )
+            if args.trace:
+                list_breakpoints_output = json.dumps(
+                    list_breakpoints_and_trace(
+                        java_program=java_input,
+                        java_home=java_home,
+                        breakpoints=set(args.breakpoint),
+                        timeout_secs=args.trace_timeout,
+                        accumulate_breakpoints=args.accumulate_breakpoints,
+                        limits=trace_generator.limits_from_args(args),
+                        use_cache=not args.no_cache,
+                        concurrent=args.concurrent,
+                    )
+                )
+            else:
+                list_breakpoints_output = list_breakpoints(
+                    java_program=java_input,
+                    java_home=java_home,
+                    timeout_secs=args.trace_timeout,
+                    output_json=args.json,
+                    limits=trace_generator.limits_from_args(args),
+                    use_cache=not args.no_cache,
+                )
     except CalledProcessError as e:
         logger.exception(
             "Trace generation failed with exit code %d and output:", e.returncode
@@ -2,16 +2,17 @@
 
 import os
 import sys
-import fileinput
 import argparse
 import logging
 import shutil
 import json
+import threading
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from textwrap import dedent, indent
 from contextlib import contextmanager
 from pathlib import Path
-from typing import TypedDict
+from typing import Iterable, TypedDict
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -23,6 +24,10 @@ from PIL import Image
 from urllib.parse import urlencode
 from tempfile import _TemporaryFileWrapper, NamedTemporaryFile
 
+from . import process_usage
+from . import trace_format
+from .cdp_driver import CdpDriver
+
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -38,29 +43,77 @@ logging.getLogger("selenium.webdriver.remote").setLevel(logging.DEBUG)
 logging.getLogger("selenium.webdriver.common").setLevel(logging.DEBUG)
 
 
-def get_webdriver(dpi: int = 1) -> webdriver.Chrome:
+# Trace categories recorded when profiling: the DevTools timeline (layout, paint, scripting),
+# performance.mark/measure spans, and V8 (garbage collection and compilation).
+PROFILE_TRACE_CATEGORIES: str = (
+    "devtools.timeline,disabled-by-default-devtools.timeline,blink.user_timing,v8,"
+    "disabled-by-default-v8.gc"
+)
+
+
+# The browser backend: "selenium" (Selenium and chromedriver) or "cdp" (Chrome driven directly
+# over the DevTools protocol, see cdp_driver.CdpDriver). Defaults to the
+# CS1302_CODE_VISUALIZER_BROWSER environment variable, or "selenium".
+BROWSER_BACKEND: str = os.environ.get("CS1302_CODE_VISUALIZER_BROWSER", "selenium")
+
+
+def get_webdriver(
+    dpi: int = 1, *, profile: bool = False, backend: str | None = None
+) -> webdriver.Chrome | CdpDriver:
     """Get the webdriver used to display the frontend.
 
     Args:
         dpi: Dots Per Inch (DPI), a positive integer used to scale the driver's display resolution.
+        profile: Record a DevTools performance trace of the browser, see ``collect_profile``.
+        backend: ``selenium`` or ``cdp``, or ``BROWSER_BACKEND`` if not provided. The ``cdp``
+            backend falls back to Selenium if Chrome can't be driven directly.
 
     Return:
         The webdriver used to display the frontend.
     """
+    arguments: list[str] = [
+        f"--force-device-scale-factor={dpi}",
+        "--allow-file-access-from-files",
+        "--no-sandbox",
+        "start-maximized",
+        "--hide-scrollbars",
+        "--screen-info={1920x1080}",
+        "--window-size=1920,1080",
+    ]
+
+    if not DEBUG_MODE:
+        arguments.insert(0, "--headless=new")
+
+    if (backend or BROWSER_BACKEND) == "cdp":
+        try:
+            cdp_driver = CdpDriver(arguments, profile=profile)
+            cdp_driver.implicitly_wait(4)
+            return cdp_driver
+        except Exception:
+            logger.warning(
+                "Unable to drive Chrome over the DevTools protocol, falling back to Selenium",
+                exc_info=True,
+            )
+
     options: Options = Options()
 
     if DEBUG_MODE:
         options.add_experimental_option("detach", True)
-    else:
-        options.add_argument("--headless=new")
 
-    options.add_argument(f"--force-device-scale-factor={dpi}")
-    options.add_argument("--allow-file-access-from-files")
-    options.add_argument("--no-sandbox")
-    options.add_argument("start-maximized")
-    options.add_argument("--hide-scrollbars")
-    options.add_argument("--screen-info={1920x1080}")
-    options.add_argument("--window-size=1920,1080")
+    for argument in arguments:
+        options.add_argument(argument)
+
+    if profile:
+        # chromedriver records the trace and hands it out through the performance log
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option(
+            "perfLoggingPrefs",
+            {
+                "enableNetwork": False,
+                "enablePage": False,
+                "traceCategories": PROFILE_TRACE_CATEGORIES,
+            },
+        )
 
     if chromedriver_path := shutil.which("chromedriver"):
         # use the local chromedriver on the executable PATH, if available
@@ -79,6 +132,14 @@ def get_webdriver(dpi: int = 1) -> webdriver.Chrome:
         )
 
 
+def browser_pid(driver: webdriver.Chrome | CdpDriver) -> int | None:
+    """Return the pid at the root of a driver's process tree: chromedriver, or Chrome itself."""
+    if isinstance(driver, CdpDriver):
+        return driver.pid
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return process.pid if process is not None else None
+
+
 def tidy_set_window_size_for_element(
     driver: webdriver.Chrome, element: WebElement
 ) -> None:
@@ -147,62 +208,257 @@ class OnlinePythonTutor(TypedDict):
 
 @contextmanager
 def online_python_tutor_frontend(
-    trace: str,
+    trace: str | bytes,
     *,
     dpi: int = 1,
     include_types: bool = True,
     text_memory_labels: bool = True,
     strip_type_prefixes: list[str] = [],
+    driver: webdriver.Chrome | None = None,
+    profile: bool = False,
+    usage: list[process_usage.ProcessUsage] | None = None,
 ):
     """TODO."""
     frontend_path = (this_files_dir / "frontend" / "render-trace.html").as_uri()
-    driver = get_webdriver(dpi)
-    trace_file = NamedTemporaryFile()
-    wait = WebDriverWait(driver, 10)
-
-    with open(trace_file.name, "w") as f:
-        print(trace, file=f)
-
-    frontend_query: dict = {
-        "tracePath": trace_file.name,
-        "includeTypes": str(include_types).lower(),
-        "textMemoryLabels": str(text_memory_labels).lower(),
-        "stripTypePrefixes": json.dumps(strip_type_prefixes),
-    }
+    trace = trace_format.read_trace(trace)
+    # a driver passed in by the caller stays open for later renders
+    owns_driver: bool = driver is None
+    if driver is None:
+        driver = get_webdriver(dpi, profile=profile)
+    elif profile:
+        # drop what was recorded during earlier renders
+        _performance_log(driver)
+    try:
+        # sampled until the render is done, before the browser is closed
+        with process_usage.sample_process_tree(browser_pid(driver), "browser", usage):
+            if profile:
+                driver.execute_cdp_cmd("Performance.enable", {})
+            trace_file = NamedTemporaryFile()
+            wait = WebDriverWait(driver, 10)
 
-    frontend_uri: str = frontend_path + "?" + urlencode(frontend_query)
+            with open(trace_file.name, "w") as f:
+                print(trace, file=f)
 
-    driver.get(frontend_uri)
+            frontend_query: dict = {
+                "tracePath": trace_file.name,
+                "includeTypes": str(include_types).lower(),
+                "textMemoryLabels": str(text_memory_labels).lower(),
+                "stripTypePrefixes": json.dumps(strip_type_prefixes),
+            }
 
-    vizDiv = driver.find_element(By.ID, "visualizerDiv")
-    dataViz = driver.find_element(By.ID, "dataViz")
+            frontend_uri: str = frontend_path + "?" + urlencode(frontend_query)
 
-    driver.fullscreen_window()
+            driver.get(frontend_uri)
 
-    driver.find_element(By.ID, "screenshotReadyIndicator")
+            vizDiv = driver.find_element(By.ID, "visualizerDiv")
+            dataViz = driver.find_element(By.ID, "dataViz")
 
-    frontend: OnlinePythonTutor = OnlinePythonTutor(
-        driver=driver,
-        vizDiv=vizDiv,
-        dataViz=dataViz,
-        wait=wait,
-    )
+            driver.fullscreen_window()
 
-    try:
-        yield frontend
+            driver.find_element(By.ID, "screenshotReadyIndicator")
+
+            frontend: OnlinePythonTutor = OnlinePythonTutor(
+                driver=driver,
+                vizDiv=vizDiv,
+                dataViz=dataViz,
+                wait=wait,
+            )
+
+            try:
+                yield frontend
+            finally:
+                trace_file.close()
     finally:
-        trace_file.close()
-        if not DEBUG_MODE:
+        if owns_driver and not DEBUG_MODE:
             driver.quit()
 
 
+class RenderProfile(TypedDict):
+    spans_ms: dict[str, float]
+    metrics: dict[str, float]
+    trace_events: list[dict]
+
+
+def _performance_log(driver: webdriver.Chrome) -> list[dict]:
+    """Return the trace events recorded since the last call, or none if the driver doesn't log."""
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        logger.debug("The webdriver has no performance log", exc_info=True)
+        return []
+    events: list[dict] = []
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Tracing.dataCollected":
+            events.append(message["params"])
+    return events
+
+
+def collect_profile(driver: webdriver.Chrome) -> RenderProfile:
+    """Summarize the profile of the page loaded in a driver.
+
+    The driver should have been created by ``get_webdriver`` with ``profile`` set, and the page
+    loaded by ``online_python_tutor_frontend`` with ``profile`` set.
+
+    Return:
+        The total duration (in milliseconds) of each ``cv:`` span recorded by the frontend with
+        ``performance.measure`` (e.g. ``precomputeCurTraceLayouts``, ``renderDataStructures``,
+        ``jsPlumbConnectors``, ``redrawConnectors`` and ``fontLoading``), the page's DevTools
+        performance metrics (e.g. ``JSHeapUsedSize`` in bytes and ``LayoutDuration`` in
+        seconds), and the raw trace events recorded by the browser.
+    """
+    spans_ms: dict[str, float] = {}
+    for name, duration in driver.execute_script(
+        "return performance.getEntriesByType('measure')"
+        ".filter((entry) => entry.name.startsWith('cv:'))"
+        ".map((entry) => [entry.name.slice(3), entry.duration]);"
+    ):
+        spans_ms[name] = spans_ms.get(name, 0) + duration
+
+    metrics: dict[str, float] = {
+        metric["name"]: metric["value"]
+        for metric in driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    }
+
+    return RenderProfile(
+        spans_ms=spans_ms,
+        metrics=metrics,
+        trace_events=_performance_log(driver),
+    )
+
+
+def save_profile(profile: RenderProfile, path: Path) -> None:
+    """Save a profile as a trace file that the DevTools Performance panel can load.
+
+    The spans and metrics are stored in the trace's metadata.
+    """
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "traceEvents": profile["trace_events"],
+                "metadata": {
+                    "spans_ms": profile["spans_ms"],
+                    "metrics": profile["metrics"],
+                },
+            },
+            f,
+        )
+
+
+def format_profile(profile: RenderProfile) -> str:
+    """Format the spans and heap usage of a profile as a few lines of text."""
+    lines = [
+        f"{name:<28}{duration:>10.1f} ms"
+        for name, duration in sorted(
+            profile["spans_ms"].items(), key=lambda span: -span[1]
+        )
+    ]
+    for metric in ["JSHeapUsedSize", "JSHeapTotalSize"]:
+        if metric in profile["metrics"]:
+            lines.append(f"{metric:<28}{profile['metrics'][metric] / 2**20:>10.1f} MiB")
+    return "\n".join(lines)
+
+
+class EncodeOptions(TypedDict, total=False):
+    colors: int
+    compress_level: int
+    optimize: bool
+    lossless: bool
+    quality: int
+
+
+_encoder_pool: ThreadPoolExecutor | None = None
+_encoder_pool_lock: threading.Lock = threading.Lock()
+
+
+def encoder_pool() -> ThreadPoolExecutor:
+    """Return the pool that encodes screenshots in the background.
+
+    Pillow releases the GIL while decoding and encoding, so a thread pool keeps every core busy
+    without having to copy screenshots to other processes.
+    """
+    global _encoder_pool
+    with _encoder_pool_lock:
+        if _encoder_pool is None:
+            _encoder_pool = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix="encoder",
+            )
+        return _encoder_pool
+
+
+def encode_image(
+    image: Image.Image, format: str, options: EncodeOptions | None = None
+) -> bytes:
+    """Encode an image.
+
+    Screenshots of the visualization are mostly flat-colored boxes, so palette quantization
+    (``colors``) often shrinks PNGs and GIFs several times over with no visible difference.
+
+    Args:
+        image: The image to encode.
+        format: The image output format. This gets passed directly into PIL's ``Image.save()``.
+        options: Any of
+            ``colors``: quantize PNG and GIF images to a palette of at most this many colors
+            (2 to 256),
+            ``compress_level``: the zlib compression level (0 to 9) of PNG images,
+            ``optimize``: make an extra pass to find the smallest PNG or GIF encoding,
+            ``lossless``: encode WebP images losslessly,
+            ``quality``: the quality (0 to 100) of WebP and AVIF images, or the encoding effort
+            of lossless WebP images.
+
+    Return:
+        The bytes of the encoded image.
+    """
+    options = options or EncodeOptions()
+    save_options: dict = {}
+    match format.upper():
+        case "PNG" | "GIF":
+            if "colors" in options:
+                image = image.convert("RGB").quantize(
+                    colors=options["colors"],
+                    method=Image.Quantize.MEDIANCUT,
+                    dither=Image.Dither.NONE,
+                )
+            if "compress_level" in options:
+                save_options["compress_level"] = options["compress_level"]
+            if "optimize" in options:
+                save_options["optimize"] = options["optimize"]
+        case "WEBP":
+            if "lossless" in options:
+                save_options["lossless"] = options["lossless"]
+            if "quality" in options:
+                save_options["quality"] = options["quality"]
+        case "AVIF":
+            if "quality" in options:
+                save_options["quality"] = options["quality"]
+        case "JPEG":
+            image = image.convert("RGB")
+            if "quality" in options:
+                save_options["quality"] = options["quality"]
+
+    image_bytes = BytesIO()
+    image.save(image_bytes, format=format, **save_options)
+    return image_bytes.getvalue()
+
+
+def _encode_screenshot(
+    screenshot: bytes,
+    box: tuple[int, int, int, int],
+    format: str,
+    options: EncodeOptions | None,
+) -> bytes:
+    return encode_image(Image.open(BytesIO(screenshot)).crop(box), format, options)
+
+
 def generate_html(trace: str, *, dpi: int = 1, include_style: bool = False) -> str:
     """Generate HTML depicting the final state of an execution trace file.
 
     The trace file is expected to be formatted using JSON as specified by OnlinePythonTutor.
 
     Args:
-        trace: The execution trace file.
+        trace: The execution trace file, as JSON or in the compact trace format (see
+            ``trace_format``).
         dpi: Dots Per Inch (DPI), a positive integer used to scale the driver's display resolution.
         include_style: If True, prefix the output with a style tag that contains some default CSS.
 
@@ -231,26 +487,202 @@ def generate_html(trace: str, *, dpi: int = 1, include_style: bool = False) -> s
             raise Exception("unable to generate an HTML visualization for this trace")
 
 
+def submit_images(
+    trace: str | bytes,
+    *,
+    dpis: Iterable[int] = (1,),
+    formats: Iterable[str] = ("PNG",),
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    driver: webdriver.Chrome | None = None,
+    profiles: list[RenderProfile] | None = None,
+    encode_options: EncodeOptions | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> dict[tuple[int, str], Future[bytes]]:
+    """Capture the final state of an execution trace file and encode it in the background.
+
+    Like ``generate_images``, but returns as soon as the screenshots are taken, so the browser is
+    free for the next render while the images are cropped and encoded by the ``encoder_pool``.
+
+    Args:
+        trace: The execution trace file, as JSON or in the compact trace format (see
+            ``trace_format``).
+        dpis: Positive multiplicative factors for the output images' resolution.
+        formats: The image output formats. These get passed directly into PIL's ``Image.save()``.
+        include_types: Whether or not type tags should be included in this visualization.
+        text_memory_labels: Whether or not memory connections should be rendered as text instead of arrows.
+        strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
+        driver: An open webdriver (see ``get_webdriver``) to render with instead of starting a new
+            browser. It is left open.
+        profiles: If given, the render is profiled and its profile (see ``collect_profile``) is
+            appended to this list. A driver passed in must have been created with ``profile`` set
+            for the profile to include a DevTools trace.
+        encode_options: Options for the image encoders, see ``encode_image``.
+        usage: If given, the resources used by the browser's process tree (chromedriver and
+            Chrome, or Chrome alone) during the render are sampled and appended to this list, see
+            ``process_usage.ProcessUsage``.
+
+    Return:
+        A mapping from each ``(dpi, format)`` pair to a future of the bytes of the generated image.
+
+    """
+    dpis = list(dpis)
+    formats = list(formats)
+
+    # a new browser is started at the first resolution, a reused one may have any resolution
+    launch_dpi: int | None = dpis[0] if driver is None else None
+
+    with online_python_tutor_frontend(
+        trace,
+        dpi=dpis[0],
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+        driver=driver,
+        profile=profiles is not None,
+        usage=usage,
+    ) as frontend:
+
+        frontend_driver: webdriver.Chrome = frontend["driver"]
+        viz: WebElement = frontend["dataViz"]
+
+        tidy_set_window_size_for_element(frontend_driver, viz)
+
+        (left, top, right, bottom) = (
+            viz.location["x"],
+            viz.location["y"],
+            viz.location["x"] + viz.size["width"],
+            viz.location["y"] + viz.size["height"],
+        )
+
+        viewport_width, viewport_height = frontend_driver.execute_script(
+            "return [window.innerWidth, window.innerHeight];"
+        )
+
+        images: dict[tuple[int, str], Future[bytes]] = {}
+
+        for dpi in dpis:
+            if dpi != launch_dpi:
+                # keep the viewport size so the layout doesn't change, only its pixel density
+                frontend_driver.execute_cdp_cmd(
+                    "Emulation.setDeviceMetricsOverride",
+                    {
+                        "width": viewport_width,
+                        "height": viewport_height,
+                        "deviceScaleFactor": dpi,
+                        "mobile": False,
+                    },
+                )
+
+            frontend_driver.execute_script("window.optFrontend.redrawConnectors()")
+
+            screenshot = frontend_driver.get_screenshot_as_png()
+
+            # crop the screenshot down to the element borders
+            box = tuple(dpi * x for x in [left, top, right, bottom])
+
+            for format in formats:
+                images[(dpi, format)] = encoder_pool().submit(
+                    _encode_screenshot, screenshot, box, format, encode_options
+                )
+
+        if driver is not None:
+            # a driver passed in is used again, at the resolution it was created with
+            frontend_driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+
+        if profiles is not None:
+            profiles.append(collect_profile(frontend_driver))
+
+        return images
+
+
+def generate_images(
+    trace: str | bytes,
+    *,
+    dpis: Iterable[int] = (1,),
+    formats: Iterable[str] = ("PNG",),
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    driver: webdriver.Chrome | None = None,
+    profiles: list[RenderProfile] | None = None,
+    encode_options: EncodeOptions | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> dict[tuple[int, str], bytes]:
+    """Generate images of the final state of an execution trace file at several resolutions.
+
+    The frontend is loaded once. Each resolution is captured by overriding the page's device
+    scale factor between screenshots, and each capture is encoded in every requested format.
+    Encoding happens in the ``encoder_pool`` once the browser is done, see ``submit_images``.
+
+    Args:
+        trace: The execution trace file, as JSON or in the compact trace format (see
+            ``trace_format``).
+        dpis: Positive multiplicative factors for the output images' resolution.
+        formats: The image output formats. These get passed directly into PIL's ``Image.save()``.
+        include_types: Whether or not type tags should be included in this visualization.
+        text_memory_labels: Whether or not memory connections should be rendered as text instead of arrows.
+        strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
+        driver: An open webdriver (see ``get_webdriver``) to render with instead of starting a new
+            browser. It is left open.
+        profiles: If given, the render is profiled and its profile (see ``collect_profile``) is
+            appended to this list. A driver passed in must have been created with ``profile`` set
+            for the profile to include a DevTools trace.
+        encode_options: Options for the image encoders, see ``encode_image``.
+        usage: If given, the resource usage of the browser is appended to this list, see
+            ``submit_images``.
+
+    Return:
+        A mapping from each ``(dpi, format)`` pair to the bytes of the generated image.
+
+    """
+    images = submit_images(
+        trace,
+        dpis=dpis,
+        formats=formats,
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+        driver=driver,
+        profiles=profiles,
+        encode_options=encode_options,
+        usage=usage,
+    )
+    return {key: image.result() for key, image in images.items()}
+
+
 def generate_image(
-    trace: str,
+    trace: str | bytes,
     *,
     dpi: int = 1,
     format: str = "PNG",
     include_types: bool = True,
     text_memory_labels: bool = False,
     strip_type_prefixes: list[str] = [],
+    driver: webdriver.Chrome | None = None,
+    profiles: list[RenderProfile] | None = None,
+    encode_options: EncodeOptions | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
 ) -> bytes:
     """Generate an image of the final state of an execution trace file.
 
     The trace file is expected to be formatted using JSON as specified by OnlinePythonTutor.
 
     Args:
-        trace: The execution trace file.
+        trace: The execution trace file, as JSON or in the compact trace format (see
+            ``trace_format``).
         dpi: Dots Per Inch (DPI), a positive integer used to scale the driver's display resolution.
         format: The image output format. This gets passed directly into PIL's ``Image.save()``.
         include_types: Whether or not type tags should be included in this visualization.
         text_memory_labels: Whether or not memory connections should be rendered as text instead of arrows.
         strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
+        driver: An open webdriver (see ``get_webdriver``) to render with instead of starting a new
+            browser. It is left open.
+        profiles: If given, the render is profiled, see ``generate_images``.
+        encode_options: Options for the image encoders, see ``encode_image``.
+        usage: If given, the resource usage of the browser is appended to this list, see
+            ``submit_images``.
 
     Return:
         The bytes of the generated image in the format specified by the ``format`` argument.
@@ -259,8 +691,57 @@ def generate_image(
 
     # print(f"#dataViz.outerHTML={generate_html(trace, dpi=dpi)}", file=sys.stderr)
 
-    with online_python_tutor_frontend(
+    return generate_images(
         trace,
+        dpis=[dpi],
+        formats=[format],
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+        driver=driver,
+        profiles=profiles,
+        encode_options=encode_options,
+        usage=usage,
+    )[(dpi, format)]
+
+
+def merge_snapshots(traces: list[str]) -> str:
+    """Merge snapshot traces into a single trace with one step per snapshot.
+
+    Each trace is expected to be formatted using JSON as specified by OnlinePythonTutor; only its
+    last step (the one that gets visualized) is kept.
+    """
+    snapshots: list[dict] = [json.loads(trace) for trace in traces]
+    merged: dict = dict(snapshots[0])
+    merged["trace"] = [snapshot["trace"][-1] for snapshot in snapshots]
+    return json.dumps(merged)
+
+
+def capture_frames(
+    traces: list[str],
+    *,
+    dpi: int = 1,
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+) -> list[Image.Image]:
+    """Capture an image of each of several execution traces in a single page session.
+
+    The traces are merged into one trace (see ``merge_snapshots``) that is loaded once, and the
+    frontend is stepped through it, taking a screenshot of each step.
+
+    Args:
+        traces: The execution trace files, in frame order.
+        dpi: Dots Per Inch (DPI), a positive integer used to scale the driver's display resolution.
+        include_types: Whether or not type tags should be included in this visualization.
+        text_memory_labels: Whether or not memory connections should be rendered as text instead of arrows.
+        strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
+
+    Return:
+        One image per trace, each cropped to the visualization's size at that step.
+    """
+    with online_python_tutor_frontend(
+        merge_snapshots(traces),
         dpi=dpi,
         include_types=include_types,
         text_memory_labels=text_memory_labels,
@@ -270,31 +751,136 @@ def generate_image(
         driver: webdriver.Chrome = frontend["driver"]
         viz: WebElement = frontend["dataViz"]
 
-        tidy_set_window_size_for_element(driver, viz)
+        frames: list[Image.Image] = []
 
-        (left, top, right, bottom) = (
-            viz.location["x"],
-            viz.location["y"],
-            viz.location["x"] + viz.size["width"],
-            viz.location["y"] + viz.size["height"],
-        )
+        for step in range(len(traces)):
+            driver.execute_script("window.optFrontend.renderStep(arguments[0])", step)
 
-        driver.execute_script("window.optFrontend.redrawConnectors()")
+            tidy_set_window_size_for_element(driver, viz)
 
-        screenshot = driver.get_screenshot_as_png()
+            (left, top, right, bottom) = (
+                viz.location["x"],
+                viz.location["y"],
+                viz.location["x"] + viz.size["width"],
+                viz.location["y"] + viz.size["height"],
+            )
 
-        # crop the screenshot down to the element borders
-        screenshot_bytes = BytesIO(screenshot)
-        pil_img = Image.open(BytesIO(screenshot))
+            driver.execute_script("window.optFrontend.redrawConnectors()")
 
-        pil_img = pil_img.crop(tuple(dpi * x for x in [left, top, right, bottom]))
+            screenshot = driver.get_screenshot_as_png()
 
-        pil_img.save(
-            screenshot_bytes,
-            format=format,
-        )
+            pil_img = Image.open(BytesIO(screenshot))
+            frames.append(
+                pil_img.crop(tuple(dpi * x for x in [left, top, right, bottom]))
+            )
+
+        return frames
 
-        return screenshot_bytes.getvalue()
+
+def encode_animation(
+    frames: list[Image.Image],
+    *,
+    format: str = "PNG",
+    frame_duration_ms: int = 1000,
+    loop: int = 0,
+) -> bytes:
+    """Encode frames as an animated image.
+
+    Frames are padded to a common size with the page's background color. Each format is encoded
+    so that only the region that changed since the previous frame is stored: APNG frames are
+    cropped to their difference with the previous frame, GIF frames are optimized the same way,
+    and WebP animations use libwebp's sub-frame minimization.
+
+    Args:
+        frames: The frames of the animation, in order.
+        format: ``PNG`` (APNG), ``WEBP`` or ``GIF``.
+        frame_duration_ms: How long each frame is shown, in milliseconds.
+        loop: Number of times the animation plays, or 0 to loop forever.
+
+    Return:
+        The bytes of the animated image.
+    """
+    width = max(frame.width for frame in frames)
+    height = max(frame.height for frame in frames)
+
+    padded_frames: list[Image.Image] = []
+    for frame in frames:
+        frame = frame.convert("RGBA")
+        padded = Image.new("RGBA", (width, height), frame.getpixel((0, 0)))
+        padded.paste(frame, (0, 0))
+        padded_frames.append(padded)
+
+    match format.upper():
+        case "PNG" | "APNG":
+            options = {
+                "format": "PNG",
+                # keep the previous frame and overwrite only the changed region
+                "disposal": 0,  # APNG_DISPOSE_OP_NONE
+                "blend": 0,  # APNG_BLEND_OP_SOURCE
+            }
+        case "WEBP":
+            options = {
+                "format": "WEBP",
+                "lossless": True,
+                "minimize_size": True,
+            }
+        case "GIF":
+            options = {
+                "format": "GIF",
+                "optimize": True,
+                "disposal": 1,  # do not dispose
+            }
+        case _:
+            raise Exception(f"Unsupported animation format: {format}")
+
+    image_bytes = BytesIO()
+    padded_frames[0].save(
+        image_bytes,
+        save_all=True,
+        append_images=padded_frames[1:],
+        duration=frame_duration_ms,
+        loop=loop,
+        **options,
+    )
+    return image_bytes.getvalue()
+
+
+def generate_animation(
+    traces: list[str],
+    *,
+    dpi: int = 1,
+    format: str = "PNG",
+    frame_duration_ms: int = 1000,
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+) -> bytes:
+    """Generate an animated image with one frame per execution trace.
+
+    Args:
+        traces: The execution trace files, in frame order.
+        dpi: Dots Per Inch (DPI), a positive integer used to scale the driver's display resolution.
+        format: ``PNG`` (APNG), ``WEBP`` or ``GIF``.
+        frame_duration_ms: How long each frame is shown, in milliseconds.
+        include_types: Whether or not type tags should be included in this visualization.
+        text_memory_labels: Whether or not memory connections should be rendered as text instead of arrows.
+        strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
+
+    Return:
+        The bytes of the animated image.
+    """
+    frames = capture_frames(
+        traces,
+        dpi=dpi,
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+    )
+    return encode_animation(
+        frames,
+        format=format,
+        frame_duration_ms=frame_duration_ms,
+    )
 
 
 def main():
@@ -310,19 +896,155 @@ def main():
 
     parser.add_argument(
         "--dpi",
-        help="DPI scale to apply to the screenshot.",
+        help=(
+            "DPI scale to apply to the screenshot. May be given more than once to render "
+            "several resolutions from one page load (requires --output)."
+        ),
         type=require_geq_one,
-        default=1,
+        action="append",
+    )
+
+    parser.add_argument(
+        "--format",
+        "-f",
+        help=(
+            "Image format passed to PIL. May be given more than once (requires --output). "
+            "Defaults to PNG."
+        ),
+        action="append",
+    )
+
+    parser.add_argument(
+        "--output",
+        "-o",
+        help=(
+            "Output path. May contain {dpi} and {format} placeholders, which are required when "
+            "several DPIs or formats are requested. If not provided, the image is written to "
+            "standard output."
+        ),
+    )
+
+    parser.add_argument(
+        "--colors",
+        help="Quantize PNG and GIF images to a palette of at most this many colors (2 to 256).",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--compress-level",
+        help="zlib compression level (0 to 9) of PNG images.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--optimize",
+        help="Search for the smallest PNG or GIF encoding.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--lossless",
+        help="Encode WebP images losslessly.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--quality",
+        help="Quality (0 to 100) of WebP and AVIF images, or the effort of lossless WebP.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--browser",
+        help=(
+            "How to drive Chrome: through Selenium and chromedriver, or directly over the "
+            "DevTools protocol (falls back to Selenium if that fails)."
+        ),
+        choices=["selenium", "cdp"],
+    )
+
+    parser.add_argument(
+        "--profile",
+        help=(
+            "Profile the render. A DevTools performance trace is saved next to the output as "
+            "<output>.trace.json (or to trace.json) and a summary is printed to standard error."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--usage",
+        help=(
+            "Print the wall time, CPU time and peak memory of the browser's process "
+            "tree to standard error (requires /proc)."
+        ),
+        action="store_true",
     )
 
     args = parser.parse_args()
 
-    stdin_data = "".join(fileinput.input("-"))
+    dpis: list[int] = args.dpi or [1]
+    formats: list[str] = args.format or ["PNG"]
+
+    output: str = args.output or ""
+    if (len(dpis) > 1 and "{dpi}" not in output) or (
+        len(formats) > 1 and "{format}" not in output
+    ):
+        parser.error("several DPIs or formats require an --output with placeholders")
+
+    if args.browser is not None:
+        global BROWSER_BACKEND
+        BROWSER_BACKEND = args.browser
+
+    # a JSON or compact trace
+    stdin_data = sys.stdin.buffer.read()
+
+    encode_options = EncodeOptions()
+    for key, value in [
+        ("colors", args.colors),
+        ("compress_level", args.compress_level),
+        ("optimize", args.optimize or None),
+        ("lossless", args.lossless or None),
+        ("quality", args.quality),
+    ]:
+        if value is not None:
+            encode_options[key] = value
+
+    profiles: list[RenderProfile] | None = [] if args.profile else None
+    usage: list[process_usage.ProcessUsage] | None = [] if args.usage else None
+
+    images = generate_images(
+        stdin_data,
+        dpis=dpis,
+        formats=formats,
+        profiles=profiles,
+        encode_options=encode_options,
+        usage=usage,
+    )
 
-    image_bytes = generate_image(stdin_data, dpi=args.dpi)
+    if usage is not None:
+        print(process_usage.summarize(usage), file=sys.stderr)
 
-    # dump png to stdout, should be redirected to destination
-    sys.stdout.buffer.write(image_bytes)
+    if profiles:
+        if args.output is None:
+            trace_path = Path("trace.json")
+        else:
+            trace_path = Path(
+                args.output.format(dpi=f"{dpis[0]:g}", format=formats[0].lower())
+                + ".trace.json"
+            )
+        save_profile(profiles[0], trace_path)
+        print(format_profile(profiles[0]), file=sys.stderr)
+        print(f"Saved the performance trace to {trace_path}", file=sys.stderr)
+
+    for (dpi, format), image_bytes in images.items():
+        if args.output is None:
+            # dump png to stdout, should be redirected to destination
+            sys.stdout.buffer.write(image_bytes)
+        else:
+            output_path = args.output.format(dpi=f"{dpi:g}", format=format.lower())
+            with open(output_path, "wb") as f:
+                f.write(image_bytes)
 
 
 if __name__ == "__main__":
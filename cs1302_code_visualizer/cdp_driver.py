@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+
+import base64
+import json
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where the pipe isn't available
+    fcntl = None
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# Chrome executables looked up on the PATH, in order, if CS1302_CODE_VISUALIZER_CHROME isn't set.
+CHROME_EXECUTABLES: tuple[str, ...] = (
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "chrome",
+    "chrome-headless-shell",
+)
+
+
+# Chrome reads commands from this file descriptor and writes responses and events to the next one.
+PIPE_FDS: tuple[int, int] = (3, 4)
+
+
+def _normalize_argument(argument: str) -> str:
+    # chromedriver accepts switches without dashes, e.g. "start-maximized", and Chrome would take
+    # them for URLs to open
+    return argument if argument.startswith("-") else f"--{argument}"
+
+
+def _spawn_with_pipe(command: list[str], command_read: int, response_write: int) -> int:
+    """Launch Chrome with the pipe ends at ``PIPE_FDS`` and return its pid.
+
+    The pipe ends are moved to fds 3 and 4 by the spawn's file actions, i.e. in the child only, so
+    the fds of this process (which other threads may be using) are left alone. Like every fd that
+    Python opens, the other fds of this process aren't inherited.
+    """
+    # copies above PIPE_FDS, so that moving the first end can't overwrite the second
+    sources = [
+        fcntl.fcntl(fd, fcntl.F_DUPFD_CLOEXEC, max(PIPE_FDS) + 1)
+        for fd in (command_read, response_write)
+    ]
+    try:
+        return os.posix_spawnp(
+            command[0],
+            command,
+            os.environ,
+            file_actions=[
+                (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+                (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+                (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+                *(
+                    (os.POSIX_SPAWN_DUP2, source, target)
+                    for source, target in zip(sources, PIPE_FDS)
+                ),
+            ],
+        )
+    finally:
+        for fd in sources:
+            os.close(fd)
+
+
+def _wait_for_exit(pid: int, timeout_secs: float) -> bool:
+    """Reap a child process, waiting at most ``timeout_secs``. Return whether it exited."""
+    deadline = time.monotonic() + timeout_secs
+    while os.waitpid(pid, os.WNOHANG) == (0, 0):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def find_chrome() -> str | None:
+    """Return the path of a Chrome executable, or None if there is none."""
+    if chrome := os.environ.get("CS1302_CODE_VISUALIZER_CHROME"):
+        return chrome
+    for name in CHROME_EXECUTABLES:
+        if path := shutil.which(name):
+            return path
+    return None
+
+
+class CdpElement:
+    """The parts of Selenium's WebElement used by browser_driver, for an element with an id."""
+
+    def __init__(self, driver: "CdpDriver", element_id: str):
+        self._driver = driver
+        self._element_id = element_id
+
+    def _rect(self) -> dict[str, float]:
+        return self._driver.execute_script(
+            "const rect = document.getElementById(arguments[0]).getBoundingClientRect();"
+            "return {x: rect.left + window.scrollX, y: rect.top + window.scrollY,"
+            " width: rect.width, height: rect.height};",
+            self._element_id,
+        )
+
+    @property
+    def location(self) -> dict[str, int]:
+        rect = self._rect()
+        return {"x": round(rect["x"]), "y": round(rect["y"])}
+
+    @property
+    def size(self) -> dict[str, int]:
+        rect = self._rect()
+        return {"width": round(rect["width"]), "height": round(rect["height"])}
+
+    def get_attribute(self, name: str) -> str | None:
+        return self._driver.execute_script(
+            "const element = document.getElementById(arguments[0]);"
+            "const value = element[arguments[1]];"
+            "return value === undefined || value === null"
+            " ? element.getAttribute(arguments[1]) : String(value);",
+            self._element_id,
+            name,
+        )
+
+
+class CdpDriver:
+    """Headless Chrome driven over the DevTools protocol, without chromedriver.
+
+    Chrome is launched with ``--remote-debugging-pipe``, which makes it read protocol messages
+    from file descriptor 3 and write them to file descriptor 4, each terminated by a NUL byte. This
+    skips the chromedriver process and its HTTP round trips.
+
+    The methods mirror the subset of Selenium's ``webdriver.Chrome`` that ``browser_driver`` uses,
+    so either can be passed wherever a driver is expected. Only elements with an id can be found.
+    The pipe isn't available on Windows. This backend is experimental and isn't used unless it's
+    asked for, see ``browser_driver.BROWSER_BACKEND``.
+    """
+
+    def __init__(self, arguments: list[str], *, profile: bool = False):
+        chrome = find_chrome()
+        if chrome is None:
+            raise Exception("Unable to find a Chrome executable")
+        if fcntl is None:
+            raise Exception("--remote-debugging-pipe isn't supported on Windows")
+
+        self._user_data_dir = tempfile.mkdtemp(prefix="cs1302-code-visualizer-chrome-")
+        self._implicit_wait_secs: float = 0
+        self._next_id = 0
+        self._pending: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._events: list[dict] = []
+        self._events_changed = threading.Condition(self._lock)
+        self._profile = profile
+        # Tracing.dataCollected events since tracing was (re)started, kept apart from _events so
+        # that navigating doesn't drop them
+        self._trace_events: list[dict] = []
+        self._exited = False
+
+        command_read, self._command_write = os.pipe()
+        self._response_read, response_write = os.pipe()
+
+        try:
+            self._pid = _spawn_with_pipe(
+                [
+                    chrome,
+                    "--remote-debugging-pipe",
+                    f"--user-data-dir={self._user_data_dir}",
+                    "--no-first-run",
+                    "--no-default-browser-check",
+                    *map(_normalize_argument, arguments),
+                    "about:blank",
+                ],
+                command_read,
+                response_write,
+            )
+        finally:
+            os.close(command_read)
+            os.close(response_write)
+
+        self._reader = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+        try:
+            target_id, self._session_id = self._attach_to_page()
+            self.execute_cdp_cmd("Page.enable", {})
+            self._window_id = self._send(
+                "Browser.getWindowForTarget", {"targetId": target_id}
+            )["windowId"]
+            if profile:
+                self._start_tracing()
+        except BaseException:
+            self.quit()
+            raise
+
+    def _read_messages(self) -> None:
+        buffer = b""
+        with open(self._response_read, "rb", buffering=0) as pipe:
+            while chunk := pipe.read(2**16):
+                buffer += chunk
+                *messages, buffer = buffer.split(b"\0")
+                for message in messages:
+                    self._dispatch(json.loads(message))
+        # Chrome exited, fail whatever is still waiting for a response
+        with self._lock:
+            for future in self._pending.values():
+                future.set_exception(Exception("Chrome exited"))
+            self._pending.clear()
+
+    def _dispatch(self, message: dict) -> None:
+        with self._lock:
+            if "id" in message:
+                future = self._pending.pop(message["id"], None)
+                if future is None:
+                    return
+                if "error" in message:
+                    future.set_exception(
+                        Exception(f"DevTools error: {message['error'].get('message')}")
+                    )
+                else:
+                    future.set_result(message.get("result", {}))
+            elif message.get("method") == "Tracing.dataCollected":
+                self._trace_events.extend(message["params"]["value"])
+            else:
+                self._events.append(message)
+                self._events_changed.notify_all()
+
+    def _send(
+        self,
+        method: str,
+        params: dict | None = None,
+        *,
+        session_id: str | None = None,
+        timeout_secs: float = 30,
+    ) -> dict:
+        future: Future = Future()
+        with self._lock:
+            self._next_id += 1
+            message: dict[str, Any] = {
+                "id": self._next_id,
+                "method": method,
+                "params": params or {},
+            }
+            if session_id is not None:
+                message["sessionId"] = session_id
+            self._pending[self._next_id] = future
+        data = json.dumps(message).encode() + b"\0"
+        with self._write_lock:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._command_write, view) :]
+        return future.result(timeout_secs)
+
+    def _wait_for_event(
+        self, method: str, *, since: int, timeout_secs: float = 30
+    ) -> dict:
+        deadline = time.monotonic() + timeout_secs
+        with self._lock:
+            while True:
+                for event in self._events[since:]:
+                    if event["method"] == method:
+                        return event
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for {method}")
+                self._events_changed.wait(remaining)
+
+    def _event_count(self) -> int:
+        with self._lock:
+            return len(self._events)
+
+    def _attach_to_page(self) -> tuple[str, str]:
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            targets = self._send("Target.getTargets")["targetInfos"]
+            pages = [target for target in targets if target["type"] == "page"]
+            if pages:
+                target_id = pages[0]["targetId"]
+                session_id = self._send(
+                    "Target.attachToTarget", {"targetId": target_id, "flatten": True}
+                )["sessionId"]
+                return target_id, session_id
+            time.sleep(0.05)
+        raise Exception("Chrome didn't open a page")
+
+    def _start_tracing(self) -> None:
+        from .browser_driver import PROFILE_TRACE_CATEGORIES
+
+        with self._lock:
+            self._trace_events = []
+        self._send(
+            "Tracing.start",
+            {
+                "transferMode": "ReportEvents",
+                "traceConfig": {
+                    "includedCategories": PROFILE_TRACE_CATEGORIES.split(","),
+                },
+            },
+        )
+
+    @property
+    def pid(self) -> int:
+        """The pid of the Chrome process."""
+        return self._pid
+
+    # the webdriver.Chrome methods used by browser_driver
+
+    def implicitly_wait(self, time_to_wait: float) -> None:
+        self._implicit_wait_secs = time_to_wait
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict) -> dict:
+        return self._send(cmd, cmd_args, session_id=self._session_id)
+
+    def get(self, url: str) -> None:
+        with self._lock:
+            # events of the previous page aren't needed anymore
+            self._events.clear()
+        self.execute_cdp_cmd("Page.navigate", {"url": url})
+        self._wait_for_event("Page.loadEventFired", since=0)
+
+    def execute_script(self, script: str, *args) -> Any:
+        result = self.execute_cdp_cmd(
+            "Runtime.evaluate",
+            {
+                "expression": f"(function() {{ {script} }}).apply(null, {json.dumps(args)})",
+                "returnByValue": True,
+            },
+        )
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise Exception(
+                f"JavaScript error: {details.get('exception', {}).get('description') or details['text']}"
+            )
+        return result["result"].get("value")
+
+    def find_element(self, by: str, value: str) -> CdpElement:
+        if by != "id":
+            raise Exception(f"Only elements with an id can be found, not by {by}")
+        deadline = time.monotonic() + self._implicit_wait_secs
+        while not self.execute_script(
+            "return document.getElementById(arguments[0]) !== null;", value
+        ):
+            if time.monotonic() > deadline:
+                raise Exception(f"No element with id {value}")
+            time.sleep(0.05)
+        return CdpElement(self, value)
+
+    def _set_window_bounds(self, bounds: dict) -> None:
+        self._send(
+            "Browser.setWindowBounds", {"windowId": self._window_id, "bounds": bounds}
+        )
+
+    def set_window_size(self, width: int, height: int) -> None:
+        # sizes can't be combined with the fullscreen state
+        self._set_window_bounds({"windowState": "normal"})
+        self._set_window_bounds({"width": width, "height": height})
+
+    def get_window_size(self) -> dict[str, int]:
+        bounds = self._send("Browser.getWindowBounds", {"windowId": self._window_id})[
+            "bounds"
+        ]
+        return {"width": bounds["width"], "height": bounds["height"]}
+
+    def fullscreen_window(self) -> None:
+        self._set_window_bounds({"windowState": "fullscreen"})
+
+    def get_screenshot_as_png(self) -> bytes:
+        return base64.b64decode(
+            self.execute_cdp_cmd("Page.captureScreenshot", {"format": "png"})["data"]
+        )
+
+    def get_log(self, log_type: str) -> list[dict]:
+        """Return the trace recorded since the last call, in chromedriver's log format."""
+        if log_type != "performance" or not self._profile:
+            raise Exception(f"No {log_type} log")
+        since = self._event_count()
+        self._send("Tracing.end")
+        # Chrome sends the last of the trace before tracingComplete
+        self._wait_for_event("Tracing.tracingComplete", since=since)
+        with self._lock:
+            collected = self._trace_events
+        self._start_tracing()
+        return [
+            {
+                "message": json.dumps(
+                    {"message": {"method": "Tracing.dataCollected", "params": event}}
+                )
+            }
+            for event in collected
+        ]
+
+    def quit(self) -> None:
+        try:
+            self._send("Browser.close", timeout_secs=5)
+        except Exception:
+            pass
+        if not self._exited:
+            if not _wait_for_exit(self._pid, 5):
+                os.kill(self._pid, signal.SIGKILL)
+                os.waitpid(self._pid, 0)
+            self._exited = True
+        if self._command_write is not None:
+            os.close(self._command_write)
+            self._command_write = None
+        self._reader.join(5)
+        shutil.rmtree(self._user_data_dir, ignore_errors=True)
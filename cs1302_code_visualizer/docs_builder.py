@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import shlex
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib import metadata
+from pathlib import Path
+from typing import Any, TypedDict
+
+from . import browser_driver
+from . import native_renderer
+from . import process_usage
+from . import render_images
+from . import trace_generator
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# Markdown: a fence whose info string is `java` followed by a `visualize` flag and options, e.g.
+# ```java visualize breakpoints=5,9 dpi=2
+MARKDOWN_FENCE_PATTERN: re.Pattern = re.compile(
+    r"^(?P<indent>[ \t]*)(?P<fence>`{3,}|~{3,})[ \t]*java[ \t]+(?P<info>visualize\b.*)$"
+)
+
+# reST: a `code-block` or `code` directive for Java with a `:visualize:` option
+REST_DIRECTIVE_PATTERN: re.Pattern = re.compile(
+    r"^(?P<indent>[ \t]*)\.\.[ \t]+(?:code-block|code|sourcecode)::[ \t]*java[ \t]*$"
+)
+REST_OPTION_PATTERN: re.Pattern = re.compile(
+    r"^[ \t]+:(?P<name>[\w-]+):[ \t]*(?P<value>.*)$"
+)
+
+SOURCE_SUFFIXES: set[str] = {".md", ".markdown", ".rst"}
+
+# the images and manifests written by render_block, see build for how stale ones are removed
+OUTPUT_NAME_PATTERN: re.Pattern = re.compile(r"^[0-9a-f]{16}(?:-\d+)?\.\w+$")
+
+
+class JavaBlock(TypedDict):
+    path: Path
+    line: int
+    source: str
+    options: dict[str, str]
+
+
+def _dedent(lines: list[str], indent: str) -> list[str]:
+    return [line[len(indent) :] if line.startswith(indent) else line for line in lines]
+
+
+def find_markdown_blocks(path: Path, text: str) -> list[JavaBlock]:
+    """Find the fenced Java blocks of a Markdown file that are annotated with ``visualize``."""
+    blocks: list[JavaBlock] = []
+    lines = text.splitlines()
+    index = 0
+    while index < len(lines):
+        match = MARKDOWN_FENCE_PATTERN.match(lines[index])
+        index += 1
+        if not match:
+            continue
+        start = index
+        fence = match.group("fence")
+        # only a line of at least as many of the fence's characters (and nothing else) closes it
+        closing_fence = re.compile(
+            rf"[ \t]*{re.escape(fence[0])}{{{len(fence)},}}[ \t]*"
+        )
+        while index < len(lines) and not closing_fence.fullmatch(lines[index]):
+            index += 1
+        tokens = shlex.split(match.group("info"))[1:]
+        blocks.append(
+            JavaBlock(
+                path=path,
+                line=start,
+                source="\n".join(_dedent(lines[start:index], match.group("indent")))
+                + "\n",
+                options=dict(
+                    token.split("=", 1) if "=" in token else (token, "true")
+                    for token in tokens
+                ),
+            )
+        )
+        index += 1
+    return blocks
+
+
+def find_rest_blocks(path: Path, text: str) -> list[JavaBlock]:
+    """Find the Java code directives of a reST file that have a ``:visualize:`` option."""
+    blocks: list[JavaBlock] = []
+    lines = text.splitlines()
+    index = 0
+    while index < len(lines):
+        match = REST_DIRECTIVE_PATTERN.match(lines[index])
+        index += 1
+        if not match:
+            continue
+        directive_line = index
+        options: dict[str, str] = {}
+        while index < len(lines) and (
+            option := REST_OPTION_PATTERN.match(lines[index])
+        ):
+            options[option.group("name")] = option.group("value").strip() or "true"
+            index += 1
+        while index < len(lines) and not lines[index].strip():
+            index += 1
+        start = index
+        body_indent = (
+            re.match(r"[ \t]*", lines[start]).group() if start < len(lines) else ""
+        )
+        if len(body_indent) <= len(match.group("indent")):
+            # a directive without content
+            continue
+        while index < len(lines) and (
+            not lines[index].strip() or lines[index].startswith(body_indent)
+        ):
+            index += 1
+        if "visualize" not in options:
+            continue
+        del options["visualize"]
+        body = _dedent(lines[start:index], body_indent)
+        blocks.append(
+            JavaBlock(
+                path=path,
+                line=directive_line,
+                source="\n".join(body).rstrip() + "\n",
+                options=options,
+            )
+        )
+    return blocks
+
+
+def find_blocks(path: Path) -> list[JavaBlock]:
+    """Find the annotated Java blocks of a Markdown or reST file."""
+    text = path.read_text()
+    if path.suffix == ".rst":
+        return find_rest_blocks(path, text)
+    return find_markdown_blocks(path, text)
+
+
+def _boolean(value: str) -> bool:
+    return value.lower() in {"true", "yes", "1", "on"}
+
+
+def render_options(block: JavaBlock) -> dict[str, Any]:
+    """Convert a block's options into keyword arguments for ``render_images``.
+
+    Supported options are ``breakpoints`` (comma-separated lines, defaults to the end of the main
+    method), ``dpi``, ``format``, ``timeout``, ``inline_strings``, ``remove_main_args``,
+    ``include_types``, ``text_memory_labels`` and ``strip_type_prefixes`` (comma-separated).
+    Dashes may be used instead of underscores in option names.
+    """
+    options = {
+        name.replace("-", "_"): value for name, value in block["options"].items()
+    }
+    kwargs: dict[str, Any] = {
+        "breakpoints": {
+            int(line) for line in options.pop("breakpoints", "-1").split(",") if line
+        },
+    }
+    for name, value in options.items():
+        match name:
+            case "dpi":
+                kwargs["dpi"] = int(value)
+            case "format":
+                kwargs["format"] = value.upper()
+            case "timeout":
+                kwargs["timeout_secs"] = int(value)
+            case (
+                "inline_strings"
+                | "remove_main_args"
+                | "include_types"
+                | "text_memory_labels"
+            ):
+                kwargs[name] = _boolean(value)
+            case "strip_type_prefixes":
+                kwargs[name] = [prefix for prefix in value.split(",") if prefix]
+            case _:
+                raise Exception(
+                    f"{block['path']}:{block['line']}: unknown visualization option {name!r}"
+                )
+    return kwargs
+
+
+def block_hash(block: JavaBlock) -> str:
+    """Hash everything that affects a block's images: its source, options and the renderer.
+
+    The renderer covers the package version, the tracer JAR, the image renderer
+    (``native_renderer.RENDERER``) and the browser backend (``browser_driver.BROWSER_BACKEND``), so
+    switching any of them re-renders every block.
+    """
+    try:
+        version = metadata.version("cs1302-code-visualizer")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    key = hashlib.sha256()
+    key.update(version.encode())
+    tracer_jar = trace_generator.cache_dir / "code-tracer.jar"
+    if tracer_jar.is_file():
+        key.update(trace_generator.file_sha256(tracer_jar).encode())
+    key.update(f"{native_renderer.RENDERER}:{browser_driver.BROWSER_BACKEND}".encode())
+    key.update(json.dumps(block["options"], sort_keys=True).encode())
+    key.update(block["source"].encode())
+    return key.hexdigest()[:16]
+
+
+def render_block(
+    block: JavaBlock,
+    output_dir: Path,
+    java_home: Path | None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> tuple[list[str], bool]:
+    """Render a block's images into ``output_dir`` unless they already exist.
+
+    Images are named ``<hash>-<line>.<ext>``, where ``hash`` is the ``block_hash`` of the block
+    and ``line`` a breakpoint line (blocks without breakpoints get ``<hash>.<ext>``). A
+    ``<hash>.json`` manifest records the images of each rendered block so that unchanged blocks are
+    skipped on the next build.
+
+    If ``usage`` is given, the resources used by the tracer and the browser are appended to it, see
+    ``render_images``.
+
+    Return:
+        The file names of the block's images and whether they had to be rendered.
+    """
+    digest = block_hash(block)
+    manifest_path = output_dir / f"{digest}.json"
+    if manifest_path.is_file():
+        image_names: list[str] = json.loads(manifest_path.read_text())
+        if all((output_dir / name).is_file() for name in image_names):
+            return image_names, False
+
+    kwargs = render_options(block)
+    images = render_images(block["source"], java_home=java_home, usage=usage, **kwargs)
+    extension = kwargs.get("format", "PNG").lower()
+
+    image_names = []
+    for line, image in sorted(images.items()):
+        name = f"{digest}-{line}.{extension}" if line >= 0 else f"{digest}.{extension}"
+        trace_generator.atomic_write(output_dir / name, image)
+        image_names.append(name)
+    trace_generator.atomic_write(manifest_path, json.dumps(image_names).encode())
+    return image_names, True
+
+
+def build(
+    paths: list[Path],
+    output_dir: Path,
+    *,
+    jobs: int = 4,
+    java_home: Path | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> dict[str, list[str]]:
+    """Render the annotated Java blocks of Markdown and reST files.
+
+    Directories are searched recursively for ``.md``, ``.markdown`` and ``.rst`` files. Blocks are
+    rendered in parallel, and blocks whose images already exist in ``output_dir`` are skipped. An
+    ``index.json`` mapping each block's ``<file>:<line>`` to its image names is written to
+    ``output_dir``, and the images and manifests that it no longer references (those of edited or
+    removed blocks) are deleted.
+
+    Args:
+        paths: Documents or directories of documents to scan.
+        output_dir: Directory that receives the images.
+        jobs: Maximum number of blocks rendered at the same time.
+        java_home: A path to a JDK 21+ installation home. If not provided, a JDK will be fetched
+            automatically.
+        usage: If given, the resources used by the tracer and browser process trees of every
+            rendered block are appended to this list. Their peak memory and CPU use help choose
+            ``jobs``, see ``process_usage.summarize``.
+
+    Return:
+        The contents of ``index.json``.
+    """
+    documents: list[Path] = []
+    for path in paths:
+        if path.is_dir():
+            documents += sorted(
+                p for p in path.rglob("*") if p.suffix in SOURCE_SUFFIXES
+            )
+        else:
+            documents.append(path)
+
+    blocks: list[JavaBlock] = [block for doc in documents for block in find_blocks(doc)]
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # install everything up front rather than in every worker
+    if blocks:
+        if not (java_home and trace_generator.jdk_exists(java_home)):
+            java_home = trace_generator.ensure_jdk_installed()
+        trace_generator.ensure_code_tracer_installed()
+
+    index: dict[str, list[str]] = {}
+    manifest_names: set[str] = set()
+    rendered_count = 0
+    failed_count = 0
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(render_block, block, output_dir, java_home, usage): block
+            for block in blocks
+        }
+        for future in as_completed(futures):
+            block = futures[future]
+            location = f"{block['path']}:{block['line']}"
+            try:
+                image_names, rendered = future.result()
+            except Exception:
+                logger.exception(f"Unable to render the Java block at {location}")
+                failed_count += 1
+                continue
+            index[location] = image_names
+            manifest_names.add(f"{block_hash(block)}.json")
+            rendered_count += rendered
+
+    index = dict(sorted(index.items()))
+    trace_generator.atomic_write(
+        output_dir / "index.json", json.dumps(index, indent=2).encode()
+    )
+
+    referenced_names = manifest_names.union(*index.values())
+    for output_path in output_dir.iterdir():
+        if (
+            OUTPUT_NAME_PATTERN.match(output_path.name)
+            and output_path.name not in referenced_names
+        ):
+            logger.debug(f"Removing unreferenced output {output_path}")
+            output_path.unlink(missing_ok=True)
+
+    print(
+        f"{len(blocks)} blocks: {rendered_count} rendered, "
+        f"{len(blocks) - rendered_count - failed_count} unchanged, {failed_count} failed",
+        file=sys.stderr,
+    )
+
+    if failed_count:
+        raise Exception(f"{failed_count} Java blocks could not be rendered")
+
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Render the Java blocks of Markdown and reST documents that are annotated for "
+            "visualization, e.g. ```java visualize breakpoints=5,9 dpi=2"
+        )
+    )
+
+    parser.add_argument(
+        "paths",
+        help="Documents, or directories to search for .md, .markdown and .rst documents.",
+        nargs="+",
+        type=Path,
+    )
+
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="Output directory for the images and index.json.",
+        type=Path,
+        required=True,
+    )
+
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        help="Number of blocks to render in parallel.",
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        help="Enable output from logger.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--jdk",
+        help=(
+            "Path to the home of a JDK 21+ installation. If not provided, "
+            "the script will attempt to download one itself."
+        ),
+    )
+
+    parser.add_argument(
+        "--usage",
+        help=(
+            "Print the wall time, CPU time and peak memory of the tracer and browser "
+            "process trees over all rendered blocks, e.g. to choose --jobs (requires /proc)."
+        ),
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+
+    java_home = Path(args.jdk) if args.jdk is not None else None
+
+    usage: list[process_usage.ProcessUsage] | None = [] if args.usage else None
+
+    start = time.perf_counter()
+    try:
+        build(args.paths, args.output, jobs=args.jobs, java_home=java_home, usage=usage)
+    except Exception as exc:
+        print(exc, file=sys.stderr)
+        exit(1)
+    finally:
+        if usage is not None:
+            print(process_usage.summarize(usage), file=sys.stderr)
+    print(f"Built in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
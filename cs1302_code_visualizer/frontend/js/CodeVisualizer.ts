@@ -1,4 +1,8 @@
-import { ExecutionVisualizer } from "./pytutor";
+import {
+  ExecutionVisualizer,
+  brightRed,
+  createJsPlumbInstance,
+} from "./pytutor";
 
 type Lang = "java";
 
@@ -8,20 +12,35 @@ interface Options {
   stripTypePrefixes: string[];
 }
 
+// a base64 data URI, the URL of a JSON trace, or an already parsed trace
+type Trace = `data:application/json;base64,${string}` | string | object;
+
 interface CreateParams {
   lang: Lang;
-  trace: `data:application/json;base64,${string}`;
+  trace: `data:application/json;base64,${string}` | object;
   element: HTMLElement;
   options: Options;
 }
 
-export function create({
-  lang,
-  trace,
-  element,
-  options,
-}: CreateParams): ExecutionVisualizer {
-  let pyTutorOptions = {
+interface EmbedParams {
+  lang: Lang;
+  trace: Trace;
+  element: HTMLElement;
+  options: Options;
+  // how far outside the viewport visualizers are built (and kept), as a CSS margin
+  rootMargin?: string;
+}
+
+export interface EmbeddedVisualizer {
+  // null while the element is offscreen
+  readonly visualizer: ExecutionVisualizer | null;
+  destroy(): void;
+}
+
+const DATA_URI_PREFIX = /^data:application\/json;base64,/;
+
+function pyTutorOptions(lang: Lang, options: Options) {
+  return {
     lang: lang,
     includeTypes: options.includeTypes ?? false,
     textualMemoryLabels: options.textualMemoryLabels ?? false,
@@ -30,19 +49,183 @@ export function create({
     hideCode: true,
     disableHeapNesting: true,
   };
+}
+
+function decodeDataUri(trace: string): object {
+  return JSON.parse(atob(trace.replace(DATA_URI_PREFIX, "")));
+}
 
+export function create({
+  lang,
+  trace,
+  element,
+  options,
+}: CreateParams): ExecutionVisualizer {
   // TODO error handling
-  let decodedTrace = JSON.parse(
-    atob(trace.replace(/^data:application\/json;base64,/, "")),
-  );
+  let decodedTrace = typeof trace === "string" ? decodeDataUri(trace) : trace;
 
   let viz = new ExecutionVisualizer(
     element.id, // TODO is this safe?
     decodedTrace,
-    pyTutorOptions,
+    pyTutorOptions(lang, options),
   );
 
   viz.updateOutput();
 
   return viz;
 }
+
+// all embedded visualizers draw their connectors with one jsPlumb instance
+// (see the jsPlumbInstance param of ExecutionVisualizer). it has no default
+// container, which would take precedence over each visualizer's own
+let sharedJsPlumbInstance: any = null;
+
+function jsPlumbInstance() {
+  if (sharedJsPlumbInstance === null) {
+    sharedJsPlumbInstance = createJsPlumbInstance(null);
+  }
+  return sharedJsPlumbInstance;
+}
+
+// one observer per rootMargin, shared by every embedded visualizer using it
+const observers: { [rootMargin: string]: IntersectionObserver } = {};
+// the visibility callbacks of the observed elements, by element id
+const visibilityCallbacks: { [id: string]: (visible: boolean) => void } = {};
+
+function observe(
+  element: HTMLElement,
+  rootMargin: string,
+  callback: (visible: boolean) => void,
+): IntersectionObserver {
+  let observer = observers[rootMargin];
+  if (observer === undefined) {
+    observer = new IntersectionObserver(
+      (entries) => {
+        for (const entry of entries) {
+          let visibilityCallback = visibilityCallbacks[entry.target.id];
+          if (visibilityCallback !== undefined) {
+            visibilityCallback(entry.isIntersecting);
+          }
+        }
+      },
+      { rootMargin },
+    );
+    observers[rootMargin] = observer;
+  }
+  visibilityCallbacks[element.id] = callback;
+  observer.observe(element);
+  return observer;
+}
+
+// traces fetched from a URL, by URL, so that visualizers of the same trace share one
+// request (a failed request is forgotten, so it's retried the next time it's needed)
+const fetchedTraces: { [url: string]: Promise<object> } = {};
+
+function fetchTrace(url: string): Promise<object> {
+  if (!(url in fetchedTraces)) {
+    fetchedTraces[url] = fetch(url).then((response) => {
+      if (!response.ok) {
+        throw new Error(
+          `Unable to load trace ${url}: ${response.status} ${response.statusText}`,
+        );
+      }
+      return response.json();
+    });
+    fetchedTraces[url].catch(() => delete fetchedTraces[url]);
+  }
+  return fetchedTraces[url];
+}
+
+function loadTrace(trace: Trace): Promise<object> {
+  if (typeof trace !== "string") {
+    return Promise.resolve(trace);
+  } else if (DATA_URI_PREFIX.test(trace)) {
+    // decoding errors reject the promise too
+    return new Promise((resolve) => resolve(decodeDataUri(trace)));
+  } else {
+    return fetchTrace(trace);
+  }
+}
+
+// Like create, but only builds the visualizer while element is within rootMargin
+// (default "200px") of the viewport, so pages with many visualizers stay fast. The
+// trace, which may also be a URL, is only loaded once the element is first visible,
+// and a trace that can't be loaded is reported in element. When the element leaves the
+// viewport, the visualizer is torn down and its height kept as element's min-height so
+// that the page doesn't jump. As with create, element needs a unique id.
+export function embed({
+  lang,
+  trace,
+  element,
+  options,
+  rootMargin = "200px",
+}: EmbedParams): EmbeddedVisualizer {
+  let visualizer: ExecutionVisualizer | null = null;
+  // kept once loaded, so that it isn't decoded again when the element is visible again
+  let decodedTrace: object | null = null;
+  let visible = false;
+  let destroyed = false;
+
+  function build() {
+    if (!visible || destroyed || visualizer !== null) {
+      return;
+    }
+    visualizer = new ExecutionVisualizer(element.id, decodedTrace, {
+      ...pyTutorOptions(lang, options),
+      jsPlumbInstance: jsPlumbInstance(),
+    });
+    visualizer.updateOutput();
+    element.style.minHeight = "";
+  }
+
+  function showError(error: any) {
+    console.error(error);
+    if (destroyed) {
+      return;
+    }
+    let message = document.createElement("div");
+    message.style.color = brightRed;
+    message.textContent = String(error?.message ?? error);
+    element.style.minHeight = "";
+    $(element).empty().append(message);
+  }
+
+  function tearDown() {
+    if (visualizer === null) {
+      return;
+    }
+    element.style.minHeight = `${element.offsetHeight}px`;
+    visualizer.dataViz.detachConnections();
+    $(element).empty();
+    visualizer = null;
+  }
+
+  const observer = observe(element, rootMargin, (isVisible) => {
+    visible = isVisible;
+    if (visible && decodedTrace !== null) {
+      build();
+    } else if (visible) {
+      loadTrace(trace)
+        .then((loadedTrace) => {
+          decodedTrace = loadedTrace;
+          build();
+        })
+        .catch(showError);
+    } else {
+      tearDown();
+    }
+  });
+
+  return {
+    get visualizer() {
+      return visualizer;
+    },
+    destroy() {
+      destroyed = true;
+      observer.unobserve(element);
+      delete visibilityCallbacks[element.id];
+      tearDown();
+      element.style.minHeight = "";
+    },
+  };
+}
@@ -61,6 +61,62 @@ export var darkArrowColor = brightRed;
 export var lightArrowColor = "#c9e6ca";
 
 var heapPtrSrcRE = /__heap_pointer_src_/;
+
+// runs fn between performance.mark/measure calls, so that its duration shows up as a
+// "cv:<name>" span in DevTools traces and in performance.getEntriesByType("measure")
+export function measureSpan<T>(name: string, fn: () => T): T {
+  performance.mark("cv:" + name + ":start");
+  try {
+    return fn();
+  } finally {
+    performance.measure("cv:" + name, "cv:" + name + ":start");
+  }
+}
+// creates the jsPlumb instance that draws a DataVisualizer's connectors. container is
+// the default parent of the connector elements. visualizers that share an instance
+// (via the jsPlumbInstance param) pass their own domRoot with every connection
+// instead, so a shared instance must be created with a null container: jsPlumb puts
+// connectors into the default container even if a connection has its own
+export function createJsPlumbInstance(container) {
+  return jsPlumb.getInstance({
+    Endpoint: ["Dot", { radius: 3 }],
+    EndpointStyles: [
+      { fillStyle: connectorBaseColor },
+      { fillstyle: null } /* make right endpoint invisible */,
+    ],
+    Anchors: ["RightMiddle", "LeftMiddle"],
+    PaintStyle: { lineWidth: 1, strokeStyle: connectorBaseColor },
+
+    // From: http://jsplumb.github.io/jsplumb/home.html#container
+    // "It is strongly recommended that you set a Container before you begin plumbing."
+    // - if you don't do this, then jsplumb arrow elements will live next to
+    //   the elements that anchor them, which INTERACTS REALLY REALLY BADLY
+    //   with jQuery draggable in weird ways. so set the visualizer's domRoot as container
+    Container: container,
+
+    // note that this documentation covers a newer version of jsPlumb, and
+    // we're still on a super-old jsPlumb-1.3.10 in lib/
+    // https://docs.jsplumbtoolkit.com/toolkit/current/articles/connectors.html
+    Connector: ["StateMachine"],
+    Overlays: [
+      [
+        "Arrow",
+        {
+          length: 10,
+          width: 7,
+          foldback: 0.55,
+          location: 1 /* 1 = display at target */,
+        },
+      ],
+    ],
+    EndpointHoverStyles: [
+      { fillStyle: connectorHighlightColor },
+      { fillstyle: null } /* make right endpoint invisible */,
+    ],
+    HoverPaintStyle: { lineWidth: 1, strokeStyle: connectorHighlightColor },
+  });
+}
+
 var rightwardNudgeHack = true; // suggested by John DeNero, toggle with global
 
 // returns a list of length a.length * b.length with elements from both
@@ -248,6 +304,8 @@ export class ExecutionVisualizer {
   //                          whenever the HEIGHT of #dataViz changes
   //   verticalStack - if true, then stack code display ON TOP of visualization
   //                   (else place side-by-side)
+  //   jsPlumbInstance - a jsPlumb instance (see createJsPlumbInstance) to draw connectors with
+  //                     instead of creating one; it can be shared by several visualizers
   //   visualizerIdOverride - override visualizer ID instead of auto-assigning it
   //                          (BE CAREFUL ABOUT NOT HAVING DUPLICATE IDs ON THE SAME PAGE,
   //                           OR ELSE ARROWS AND OTHER STUFF WILL GO HAYWIRE!)
@@ -605,7 +663,9 @@ export class ExecutionVisualizer {
       this.domRoot.find("#vizLayoutTdFirst").hide(); // gigantic hack!
     }
 
-    this.dataViz.precomputeCurTraceLayouts();
+    measureSpan("precomputeCurTraceLayouts", () =>
+      this.dataViz.precomputeCurTraceLayouts(),
+    );
 
     if (!this.params.hideCode) {
       this.codDisplay.renderPyCodeOutput();
@@ -807,7 +867,9 @@ export class ExecutionVisualizer {
     }
 
     // finally, render all of the data structures
-    this.dataViz.renderDataStructures(this.curInstr);
+    measureSpan("renderDataStructures", () =>
+      this.dataViz.renderDataStructures(this.curInstr),
+    );
 
     // call the callback if necessary (AFTER rendering)
     if (myViz.dataViz.height() != prevDataVizHeight) {
@@ -829,7 +891,9 @@ export class ExecutionVisualizer {
 
   updateOutputMini() {
     assert(this.params.hideCode);
-    this.dataViz.renderDataStructures(this.curInstr);
+    measureSpan("renderDataStructures", () =>
+      this.dataViz.renderDataStructures(this.curInstr),
+    );
   }
 
   renderStep(step) {
@@ -846,7 +910,7 @@ export class ExecutionVisualizer {
   }
 
   redrawConnectors() {
-    this.dataViz.redrawConnectors();
+    measureSpan("redrawConnectors", () => this.dataViz.redrawConnectors());
   }
 
   // All of the Java frontend code in this function was written by David
@@ -1266,6 +1330,8 @@ class DataVisualizer {
   curTraceLayouts: any[]; // initialized in precomputeCurTraceLayouts
 
   jsPlumbInstance: any;
+  // the connectors this visualizer drew, when jsPlumbInstance is shared
+  connections: any[];
   jsPlumbManager: any;
 
   // for selectively hiding variables and fields: d3.map used as a set,
@@ -1335,49 +1401,55 @@ class DataVisualizer {
           '"></table></div>',
       );
 
-    this.jsPlumbInstance = jsPlumb.getInstance({
-      Endpoint: ["Dot", { radius: 3 }],
-      EndpointStyles: [
-        { fillStyle: connectorBaseColor },
-        { fillstyle: null } /* make right endpoint invisible */,
-      ],
-      Anchors: ["RightMiddle", "LeftMiddle"],
-      PaintStyle: { lineWidth: 1, strokeStyle: connectorBaseColor },
-
-      // From: http://jsplumb.github.io/jsplumb/home.html#container
-      // "It is strongly recommended that you set a Container before you begin plumbing."
-      // - if you don't do this, then jsplumb arrow elements will live next to
-      //   the elements that anchor them, which INTERACTS REALLY REALLY BADLY
-      //   with jQuery draggable in weird ways. so set this.domRoot as container
-      Container: this.domRoot,
-
-      // note that this documentation covers a newer version of jsPlumb, and
-      // we're still on a super-old jsPlumb-1.3.10 in lib/
-      // https://docs.jsplumbtoolkit.com/toolkit/current/articles/connectors.html
-      Connector: ["StateMachine"],
-      Overlays: [
-        [
-          "Arrow",
-          {
-            length: 10,
-            width: 7,
-            foldback: 0.55,
-            location: 1 /* 1 = display at target */,
-          },
-        ],
-      ],
-      EndpointHoverStyles: [
-        { fillStyle: connectorHighlightColor },
-        { fillstyle: null } /* make right endpoint invisible */,
-      ],
-      HoverPaintStyle: { lineWidth: 1, strokeStyle: connectorHighlightColor },
-    });
+    this.jsPlumbInstance =
+      this.params.jsPlumbInstance || createJsPlumbInstance(this.domRoot);
+    this.connections = [];
   }
 
   height() {
     return this.domRoot.find("#dataViz").height();
   }
 
+  // connectors are always added to this visualizer's domRoot, even when
+  // jsPlumbInstance is shared with other visualizers
+  connect(params) {
+    var connection = this.jsPlumbInstance.connect(
+      $.extend({ container: this.domRoot }, params),
+    );
+    if (this.params.jsPlumbInstance) {
+      this.connections.push(connection);
+    }
+    return connection;
+  }
+
+  // calls fn on each of this visualizer's connectors (and not on those of other
+  // visualizers sharing jsPlumbInstance). connectors are tracked explicitly rather
+  // than by their source element, since re-rendering replaces the source elements
+  // before the old connectors are detached
+  eachConnection(fn) {
+    if (!this.params.jsPlumbInstance) {
+      this.jsPlumbInstance.select().each(fn);
+      return;
+    }
+    // drop the connectors that were detached some other way, e.g. by source id
+    var live = [];
+    this.jsPlumbInstance.select().each(function (c) {
+      live.push(c);
+    });
+    this.connections = this.connections.filter((c) => live.indexOf(c) >= 0);
+    this.connections.forEach(fn);
+  }
+
+  // deletes all of this visualizer's connectors
+  detachConnections() {
+    if (!this.params.jsPlumbInstance) {
+      this.jsPlumbInstance.reset();
+      return;
+    }
+    this.connections.forEach((c) => this.jsPlumbInstance.detach(c));
+    this.connections = [];
+  }
+
   trimTypePrefix(type: string): string {
     let prefixes: string[] | null = this.params.stripTypePrefixes;
 
@@ -2222,9 +2294,8 @@ class DataVisualizer {
     // div contains, say, a "position: relative;" CSS tag
     // (which happens in the IPython Notebook)
     var existingConnectionEndpointIDs = d3.map();
-    myViz.jsPlumbInstance
-      .select({ scope: "varValuePointer" })
-      .each(function (c) {
+    myViz.eachConnection(function (c) {
+      if (c.scope == "varValuePointer") {
         // This is VERY crude, but to prevent multiple redundant HEAP->HEAP
         // connectors from being drawn with the same source and origin, we need to first
         // DELETE ALL existing HEAP->HEAP connections, and then re-render all of
@@ -2236,14 +2307,15 @@ class DataVisualizer {
         if (!c.sourceId.match(heapPtrSrcRE)) {
           existingConnectionEndpointIDs.set(c.sourceId, c.targetId);
         }
-      });
+      }
+    });
 
     var existingParentPointerConnectionEndpointIDs = d3.map();
-    myViz.jsPlumbInstance
-      .select({ scope: "frameParentPointer" })
-      .each(function (c) {
+    myViz.eachConnection(function (c) {
+      if (c.scope == "frameParentPointer") {
         existingParentPointerConnectionEndpointIDs.set(c.sourceId, c.targetId);
-      });
+      }
+    });
 
     // what variables/fields were hidden in this call to renderDataStructures?
     // (make these fields and not locals so that we can access them in
@@ -2386,7 +2458,7 @@ class DataVisualizer {
         });
 
         // use foundTargetId to highlight ALL ALIASES
-        myViz.jsPlumbInstance.select().each(function (c) {
+        myViz.eachConnection(function (c) {
           if (c.targetId == foundTargetId) {
             c.setHover(true);
             $(c.canvas).css("z-index", 2000); // ... and move it to the VERY FRONT
@@ -2398,7 +2470,7 @@ class DataVisualizer {
     }
 
     function unhighlightAllConnectors(d, i) {
-      myViz.jsPlumbInstance.select().each(function (c) {
+      myViz.eachConnection(function (c) {
         c.setHover(false);
       });
     }
@@ -2524,7 +2596,7 @@ class DataVisualizer {
                 .find("div#" + labelID)
                 .hover(
                   function () {
-                    myViz.jsPlumbInstance.connect({
+                    myViz.connect({
                       source: labelID,
                       target: heapObjID,
                       scope: "varValuePointer",
@@ -2840,7 +2912,7 @@ class DataVisualizer {
                 .find("div#" + labelID)
                 .hover(
                   function () {
-                    myViz.jsPlumbInstance.connect({
+                    myViz.connect({
                       source: labelID,
                       target: heapObjID,
                       scope: "varValuePointer",
@@ -3056,7 +3128,7 @@ class DataVisualizer {
     // I suspect that this is due to the fact that parent pointers are SIBLINGS
     // of stackFrame divs and not children, so when stackFrame divs get destroyed,
     // their associated parent pointers do NOT.)
-    myViz.jsPlumbInstance.reset();
+    myViz.detachConnections();
 
     // use jsPlumb scopes to keep the different kinds of pointers separated
     function renderVarValueConnector(varID, valueID) {
@@ -3064,7 +3136,7 @@ class DataVisualizer {
       // the boat on my existing (battle-tested) code
       if (myViz.isCppMode()) {
         if (myViz.domRoot.find("#" + valueID).length) {
-          myViz.jsPlumbInstance.connect({
+          myViz.connect({
             source: varID,
             target: valueID,
             scope: "varValuePointer",
@@ -3076,7 +3148,7 @@ class DataVisualizer {
             .html("\uD83D\uDCA9" /* pile of poo emoji */);
         }
       } else {
-        myViz.jsPlumbInstance.connect({
+        myViz.connect({
           source: varID,
           target: valueID,
           scope: "varValuePointer",
@@ -3098,7 +3170,7 @@ class DataVisualizer {
 
       //console.log('renderParentPointerConnector:', srcID, dstID);
 
-      myViz.jsPlumbInstance.connect({
+      myViz.connect({
         source: srcID,
         target: dstID,
         anchors: ["LeftMiddle", "LeftMiddle"],
@@ -3116,6 +3188,7 @@ class DataVisualizer {
       totalParentPointersRendered++;
     }
 
+    performance.mark("cv:jsPlumbConnectors:start");
     if (!myViz.params.textualMemoryLabels) {
       // re-render existing connectors and then ...
       //
@@ -3139,6 +3212,7 @@ class DataVisualizer {
         renderParentPointerConnector,
       );
     }
+    performance.measure("cv:jsPlumbConnectors", "cv:jsPlumbConnectors:start");
 
     /*
     myViz.jsPlumbInstance.select().each(function(c) {
@@ -3148,7 +3222,7 @@ class DataVisualizer {
     //console.log('---', myViz.jsPlumbInstance.select().length, '---');
 
     function highlight_frame(frameID) {
-      myViz.jsPlumbInstance.select().each(function (c) {
+      myViz.eachConnection(function (c) {
         // find the enclosing .stackFrame ...
         var stackFrameDiv = c.source.closest(".stackFrame");
 
@@ -3550,7 +3624,7 @@ class DataVisualizer {
 
         myViz.domRoot.find("div#" + labelID).hover(
           function () {
-            myViz.jsPlumbInstance.connect({
+            myViz.connect({
               source: labelID,
               target: dstDivID,
               scope: "varValuePointer",
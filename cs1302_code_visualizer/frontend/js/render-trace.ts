@@ -2,7 +2,7 @@
 // Copyright (C) Philip Guo (philip@pgbovine.net)
 // LICENSE: https://github.com/pgbovine/OnlinePythonTutor/blob/master/LICENSE.txt
 
-import { ExecutionVisualizer } from "./pytutor";
+import { ExecutionVisualizer, measureSpan } from "./pytutor";
 
 $(document).ready(function () {
   const urlParams = new URLSearchParams(window.location.search);
@@ -28,16 +28,21 @@ $(document).ready(function () {
     stripTypePrefixes: stripTypePrefixes,
   };
 
+  performance.mark("cv:loadTrace:start");
   fetch("file://" + tracePath)
     .then((r) => r.json())
     .then((trace) => {
-      var myViz = new ExecutionVisualizer(
-        "visualizerDiv",
-        trace,
-        frontendOptions,
+      performance.measure("cv:loadTrace", "cv:loadTrace:start");
+
+      var myViz = measureSpan(
+        "ExecutionVisualizer",
+        () => new ExecutionVisualizer("visualizerDiv", trace, frontendOptions),
       );
 
       document.fonts.addEventListener("loadingdone", () => {
+        // from navigation start until the web fonts are available
+        performance.measure("cv:fontLoading");
+
         myViz.redrawConnectors();
 
         (window as any).optFrontend = myViz;
@@ -0,0 +1,1575 @@
+#!/usr/bin/env python3
+
+import base64
+import functools
+import json
+import logging
+import math
+import os
+import re
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+from xml.sax.saxutils import escape
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import browser_driver
+from . import trace_format
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+this_files_dir = Path(os.path.realpath(os.path.dirname(__file__)))
+
+
+# The image renderer used by render_image and render_images: "browser" (a screenshot of the
+# frontend, see browser_driver) or "native" (this module, falling back to the browser for traces it
+# doesn't support). Defaults to the CS1302_CODE_VISUALIZER_RENDERER environment variable, or
+# "browser".
+RENDERER: str = os.environ.get("CS1302_CODE_VISUALIZER_RENDERER", "browser")
+
+
+# The vector format written by this renderer in addition to Pillow's raster formats.
+SVG: str = "SVG"
+
+
+class UnsupportedTrace(Exception):
+    """A trace with something the native renderer can't draw like the frontend does."""
+
+
+# Heap objects the frontend nests inside their parent even with heap nesting disabled.
+ALWAYS_NESTED_TYPES: frozenset[str] = frozenset(["FUNCTION", "CLASS"])
+
+# Values the frontend renders in place instead of pointing to the heap.
+PRIMITIVE_TAGS: frozenset[str] = frozenset(
+    [
+        "IMPORTED_FAUX_PRIMITIVE",
+        "SPECIAL_FLOAT",
+        "JS_SPECIAL_VAL",
+        "C_DATA",
+        "VOID",
+        "NUMBER-LITERAL",
+        "CHAR-LITERAL",
+        "ELIDE",
+    ]
+)
+
+# Colors and sizes from pytutor.css, in CSS pixels (1pt = 4/3px, small = 13px, x-small = 10px and
+# xx-small = 9px).
+VALUE_BACKGROUND: str = "#ffffc6"
+OBJECT_BACKGROUND: str = "#faebbf"
+HIGHLIGHTED_FRAME_BACKGROUND: str = "#e2ebf6"
+FRAME_BORDER: str = "#a6b3b6"
+BORDER_RADIUS: float = 3.2
+ARROW_COLOR: str = "#005583"
+INACTIVE_ARROW_COLOR: str = "#cccccc"
+
+SMALL: float = 13
+X_SMALL: float = 10
+XX_SMALL: float = 9
+TYPE_LABEL: float = 8 * 4 / 3
+FIELD_TYPE_LABEL: float = 6 * 4 / 3
+RETURN_VALUE: float = 9 * 4 / 3
+HEAP: float = 10 * 4 / 3
+
+# jsPlumb's StateMachine connector and arrow overlay, as configured in pytutor.ts
+CONNECTOR_CURVINESS: float = 10
+CONNECTOR_MARGIN: float = 5
+CONNECTOR_PROXIMITY_LIMIT: float = 80
+ARROW_LENGTH: float = 10
+ARROW_WIDTH: float = 7
+ARROW_FOLDBACK: float = 0.55
+ENDPOINT_RADIUS: float = 3
+
+# How much heap objects are moved right when an object in an earlier row points to them from
+# further right, so that the arrow doesn't point backwards.
+NUDGE_MARGIN: float = 32
+
+# Connector curves are drawn at this multiple of the image resolution and scaled down, since
+# Pillow doesn't antialias lines.
+SUPERSAMPLING: int = 4
+
+
+@functools.cache
+def font_path() -> Path:
+    """Return the path of the frontend's font (Recursive), or raise UnsupportedTrace."""
+    for path in sorted((this_files_dir / "frontend" / "build").glob("*.woff2")):
+        font = ImageFont.truetype(path, 32)
+        # the bundle has a subset per script, keep the one with the basic latin glyphs
+        if font.getname()[0].startswith("Recursive") and all(
+            _has_glyph(font, char) for char in "Aa0"
+        ):
+            return path
+    raise UnsupportedTrace("The frontend's font wasn't found, is the frontend built?")
+
+
+@functools.lru_cache(maxsize=None)
+def _font(size: float) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_path(), size)
+
+
+def _glyph(font: ImageFont.FreeTypeFont, char: str) -> bytes:
+    image = Image.new("L", (2 * round(font.size), 2 * round(font.size)))
+    ImageDraw.Draw(image).text((0, 0), char, font=font, fill=255)
+    return image.tobytes()
+
+
+def _has_glyph(font: ImageFont.FreeTypeFont, char: str) -> bool:
+    # characters without a glyph are drawn as the font's .notdef box
+    return _glyph(font, char) != _glyph(font, "\uffff")
+
+
+@functools.lru_cache(maxsize=4096)
+def _supported_char(char: str) -> bool:
+    return char.isspace() or _has_glyph(_font(32), char)
+
+
+@functools.cache
+def _font_metrics() -> tuple[float, float]:
+    ascent, descent = _font(1000).getmetrics()
+    return ascent / 1000, descent / 1000
+
+
+def _line_height(size: float) -> int:
+    # the height of a line with line-height: normal, which Chrome rounds like this
+    ascent, descent = _font_metrics()
+    return round(ascent * size) + round(descent * size)
+
+
+def _ascent(size: float) -> int:
+    return round(_font_metrics()[0] * size)
+
+
+@functools.lru_cache(maxsize=4096)
+def _text_width(text: str, size: float) -> float:
+    return _font(size).getlength(text)
+
+
+# Layout: a tiny subset of CSS' block and table layout, enough for the frontend's markup. Sizes are
+# in CSS pixels and every box is positioned by place() after measure().
+
+
+Edges = tuple[float, float, float, float]  # top, right, bottom, left
+
+
+@dataclass
+class Text:
+    """A run of text on a single line."""
+
+    text: str
+    size: float
+    color: str = "#000000"
+    x: float = 0
+    y: float = 0
+
+    def measure(self) -> tuple[float, float]:
+        return _text_width(self.text, self.size), _line_height(self.size)
+
+
+@dataclass
+class Box:
+    """A block box whose inline children (Text) are laid out in lines and whose block children
+    (Box, Table) are stacked.
+
+    Boxes stretch to the width of their parent, tables shrink to fit their content and are aligned
+    by ``align``. ``width`` and ``height`` are the border box once placed.
+    """
+
+    children: list["Text | Box | Table"] = field(default_factory=list)
+    size: float = X_SMALL
+    padding: Edges = (0, 0, 0, 0)
+    margin: Edges = (0, 0, 0, 0)
+    border: str | None = None
+    # the sides of the border, a subset of "trbl"
+    border_sides: str = "trbl"
+    radius: float = 0
+    background: str | None = None
+    text_align: str = "left"
+    vertical_align: str = "middle"
+    min_width: float = 0
+    # a 0 to 1 brightness filter applied to the box's background and border
+    brightness: float = 1
+    # the key of the box in the layout's anchors, for connectors
+    anchor: str | None = None
+    x: float = 0
+    y: float = 0
+    width: float = 0
+    height: float = 0
+    natural: tuple[float, float] | None = field(default=None, repr=False)
+
+    def _border(self, side: str) -> float:
+        return 1 if self.border is not None and side in self.border_sides else 0
+
+    def _lines(self) -> list["list[Text] | Box | Table"]:
+        items: list[list[Text] | Box | Table] = []
+        for child in self.children:
+            if isinstance(child, Text):
+                if items and isinstance(items[-1], list):
+                    items[-1].append(child)
+                else:
+                    items.append([child])
+            else:
+                items.append(child)
+        return items
+
+    def _line_size(self, line: list[Text]) -> tuple[float, float]:
+        # the line box is at least as tall as the box's own font (the strut)
+        return sum(text.measure()[0] for text in line), max(
+            [_line_height(self.size)] + [text.measure()[1] for text in line]
+        )
+
+    def measure(self) -> tuple[float, float]:
+        """Return the natural width and height of the margin box."""
+        if self.natural is None:
+            self.natural = self._measure()
+        return self.natural
+
+    def forget_sizes(self) -> None:
+        """Measure the box and its descendants again, e.g. after changing a margin."""
+        self.natural = None
+        for child in self.children:
+            if not isinstance(child, Text):
+                child.forget_sizes()
+
+    def _measure(self) -> tuple[float, float]:
+        content_width: float = self.min_width
+        content_height: float = 0
+        for item in self._lines():
+            if isinstance(item, list):
+                width, height = self._line_size(item)
+            else:
+                width, height = item.measure()
+            content_width = max(content_width, width)
+            content_height += height
+        top, right, bottom, left = self.padding
+        return (
+            self.margin[3]
+            + self._border("l")
+            + left
+            + content_width
+            + right
+            + self._border("r")
+            + self.margin[1],
+            self.margin[0]
+            + self._border("t")
+            + top
+            + content_height
+            + bottom
+            + self._border("b")
+            + self.margin[2],
+        )
+
+    def place(
+        self,
+        x: float,
+        y: float,
+        width: float | None,
+        height: float | None,
+        anchors: dict[str, "Box"],
+    ) -> None:
+        """Position the box at (x, y) with the given margin box size (or its natural size)."""
+        natural_width, natural_height = self.measure()
+        width = natural_width if width is None else width
+        height = natural_height if height is None else height
+
+        self.x = x + self.margin[3]
+        self.y = y + self.margin[0]
+        self.width = width - self.margin[3] - self.margin[1]
+        self.height = height - self.margin[0] - self.margin[2]
+        if self.anchor is not None:
+            anchors[self.anchor] = self
+
+        top, right, bottom, left = self.padding
+        content_x = self.x + self._border("l") + left
+        content_width = (
+            self.width - self._border("l") - left - right - self._border("r")
+        )
+        content_y = self.y + self._border("t") + top
+        extra_height = height - natural_height
+        if self.vertical_align == "middle":
+            content_y += extra_height / 2
+        elif self.vertical_align == "bottom":
+            content_y += extra_height
+
+        for item in self._lines():
+            if isinstance(item, list):
+                line_width, line_height = self._line_size(item)
+                line_x = content_x
+                if self.text_align == "right":
+                    line_x += content_width - line_width
+                elif self.text_align == "center":
+                    line_x += (content_width - line_width) / 2
+                for text in item:
+                    text_width, text_height = text.measure()
+                    # align the baselines, which is the middle of the line for a single font
+                    text.x = line_x
+                    text.y = content_y + (line_height - text_height) / 2
+                    line_x += text_width
+                content_y += line_height
+            elif isinstance(item, Box):
+                item.place(content_x, content_y, content_width, None, anchors)
+                content_y += item.measure()[1]
+            else:
+                item_width, item_height = item.measure()
+                item_x = content_x
+                if item.align == "right":
+                    item_x += content_width - item_width
+                item.place(item_x, content_y, anchors)
+                content_y += item_height
+
+    def paint(self, ops: list[tuple]) -> None:
+        if self.background is not None or self.border is not None:
+            ops.append(
+                (
+                    "box",
+                    self.x,
+                    self.y,
+                    self.width,
+                    self.height,
+                    _dim(self.background, self.brightness),
+                    _dim(self.border, self.brightness),
+                    self.border_sides,
+                    self.radius,
+                )
+            )
+        for child in self.children:
+            if isinstance(child, Text):
+                ops.append(
+                    (
+                        "text",
+                        child.x,
+                        child.y + _ascent(child.size),
+                        child.text,
+                        child.size,
+                        child.color,
+                    )
+                )
+            else:
+                child.paint(ops)
+
+
+@dataclass
+class Table:
+    """A table of cells with separated borders."""
+
+    rows: list[list[Box]]
+    spacing: float = 2
+    border: str | None = None
+    radius: float = 0
+    background: str | None = None
+    margin: Edges = (0, 0, 0, 0)
+    align: str = "left"
+    x: float = 0
+    y: float = 0
+    width: float = 0
+    height: float = 0
+    natural: tuple[float, float] | None = field(default=None, repr=False)
+
+    def _edge(self) -> float:
+        return 1 if self.border is not None else 0
+
+    def _grid(self) -> tuple[list[float], list[float]]:
+        columns: list[float] = []
+        heights: list[float] = []
+        for row in self.rows:
+            heights.append(0)
+            for i, cell in enumerate(row):
+                width, height = cell.measure()
+                if i == len(columns):
+                    columns.append(0)
+                columns[i] = max(columns[i], width)
+                heights[-1] = max(heights[-1], height)
+        return columns, heights
+
+    def measure(self) -> tuple[float, float]:
+        if self.natural is None:
+            self.natural = self._measure()
+        return self.natural
+
+    def forget_sizes(self) -> None:
+        self.natural = None
+        for row in self.rows:
+            for cell in row:
+                cell.forget_sizes()
+
+    def _measure(self) -> tuple[float, float]:
+        columns, heights = self._grid()
+        inner_width = sum(columns) + self.spacing * (len(columns) + 1)
+        inner_height = sum(heights) + self.spacing * (len(heights) + 1)
+        return (
+            self.margin[3] + inner_width + 2 * self._edge() + self.margin[1],
+            self.margin[0] + inner_height + 2 * self._edge() + self.margin[2],
+        )
+
+    def place(self, x: float, y: float, anchors: dict[str, Box]) -> None:
+        columns, heights = self._grid()
+        width, height = self.measure()
+        self.x = x + self.margin[3]
+        self.y = y + self.margin[0]
+        self.width = width - self.margin[3] - self.margin[1]
+        self.height = height - self.margin[0] - self.margin[2]
+
+        cell_y = self.y + self._edge() + self.spacing
+        for row, row_height in zip(self.rows, heights):
+            cell_x = self.x + self._edge() + self.spacing
+            for cell, column_width in zip(row, columns):
+                cell.place(cell_x, cell_y, column_width, row_height, anchors)
+                cell_x += column_width + self.spacing
+            cell_y += row_height + self.spacing
+
+    def paint(self, ops: list[tuple]) -> None:
+        if self.background is not None or self.border is not None:
+            ops.append(
+                (
+                    "box",
+                    self.x,
+                    self.y,
+                    self.width,
+                    self.height,
+                    self.background,
+                    self.border,
+                    "trbl",
+                    self.radius,
+                )
+            )
+        for row in self.rows:
+            for cell in row:
+                cell.paint(ops)
+
+
+def _dim(color: str | None, brightness: float) -> str | None:
+    if color is None or brightness == 1:
+        return color
+    red, green, blue = (int(color[i : i + 2], 16) for i in (1, 3, 5))
+    return "#" + "".join(
+        f"{min(255, round(channel * brightness)):02x}" for channel in (red, green, blue)
+    )
+
+
+# Values, as formatted by the frontend
+
+
+def _js_number(number: int | float) -> str:
+    # numbers are formatted by JavaScript's String()
+    if isinstance(number, bool) or not isinstance(number, (int, float)):
+        raise UnsupportedTrace(f"Unexpected number {number!r}")
+    if isinstance(number, int):
+        return str(number)
+    if math.isnan(number):
+        return "NaN"
+    if math.isinf(number):
+        return "Infinity" if number > 0 else "-Infinity"
+    if number == int(number) and abs(number) < 1e21:
+        return str(int(number))
+    text = repr(number)
+    if "e" in text:
+        mantissa, exponent = text.split("e")
+        exponent_value = int(exponent)
+        if -7 < exponent_value < 21:
+            return format(number, "f").rstrip("0").rstrip(".")
+        return f"{mantissa}e{'+' if exponent_value > 0 else '-'}{abs(exponent_value)}"
+    return text
+
+
+def _char_literal(char: str) -> str:
+    escapes = {
+        "\n": "\\n",
+        "\r": "\\r",
+        "\t": "\\t",
+        "\b": "\\b",
+        "\f": "\\f",
+        "'": "\\'",
+        '"': '\\"',
+        "\\": "\\\\",
+    }
+    if char in escapes:
+        return escapes[char]
+    if len(char) == 1 and ord(char) < 32:
+        return f"\\u{ord(char):04x}"
+    return char
+
+
+def _collapse_whitespace(text: str) -> str:
+    # HTML collapses runs of whitespace (but not non-breaking spaces) to a single space
+    return re.sub(r"[ \t\n\r\f]+", " ", text)
+
+
+def _checked(text: str) -> str:
+    # text with glyphs missing from the font would be drawn by Chrome with a fallback font
+    for char in text:
+        if not _supported_char(char):
+            raise UnsupportedTrace(f"The font has no glyph for {char!r}")
+    return text
+
+
+def _is_primitive(value: Any) -> bool:
+    return not isinstance(value, list) or value[0] in PRIMITIVE_TAGS
+
+
+def _primitive(value: Any, size: float) -> Text:
+    """Return the text of a value rendered in place, like renderPrimitiveObject."""
+    if value is None:
+        return Text("null", X_SMALL)
+    if isinstance(value, bool):
+        return Text("true" if value else "false", size)
+    if isinstance(value, (int, float)):
+        return Text(_js_number(value), size)
+    if isinstance(value, str):
+        text = value.replace('"', '\\"')
+        return Text(_checked(_collapse_whitespace(f'"{text}"')), size)
+    match value[0]:
+        case "NUMBER-LITERAL" | "SPECIAL_FLOAT":
+            return Text(_checked(str(value[1])), size)
+        case "CHAR-LITERAL":
+            return Text(_checked(f"'{_char_literal(value[1])}'"), size)
+        case "VOID":
+            return Text("void", size)
+    raise UnsupportedTrace(f"Unsupported value {value[0]}")
+
+
+def _ref_id(value: Any) -> int:
+    if not isinstance(value, list) or value[0] != "REF":
+        raise UnsupportedTrace(f"Unsupported value {value!r}")
+    return value[1]
+
+
+# Heap layout, a port of precomputeCurTraceLayouts with heap nesting disabled
+
+
+def _is_linear(heap_object: list) -> bool:
+    return heap_object[0] in ("LIST", "TUPLE", "SET")
+
+
+def _should_nest(heap_object: list) -> bool:
+    return heap_object[0] in ALWAYS_NESTED_TYPES or (
+        heap_object[0] == "INSTANCE" and heap_object[1] in ALWAYS_NESTED_TYPES
+    )
+
+
+def _structurally_equivalent(first: Any, second: Any) -> bool:
+    if _is_primitive(first) or _is_primitive(second):
+        return False
+    if first[0] != second[0] or len(first) != len(second):
+        return False
+    if first[0] in ("LIST", "TUPLE"):
+        return True
+    start = {"DICT": 1, "INSTANCE": 2, "INSTANCE_PPRINT": 3}.get(first[0])
+    if start is None:
+        return False
+    # the same field names, in any order
+    names = {item[0] for item in first[start:]}
+    return all(item[0] in names for item in second[start:])
+
+
+def _heap_layout(steps: list[dict]) -> list[list[int]]:
+    """Return the rows of heap object ids at the last step, like precomputeCurTraceLayouts.
+
+    Objects keep their row across steps, so every step up to the last one is laid out.
+    Structurally equivalent objects linked from one another (e.g. the nodes of a linked list)
+    share a row.
+    """
+    layout: list[list] = []
+
+    for step in steps:
+        heap: dict = step["heap"]
+        # rows start with a tag, which keeps a row that was emptied during the step apart
+        current: list[list] = [list(row) for row in layout]
+        ids_to_remove: set[int] = {id for row in current for id in row[1:]}
+        laid_out: set[int] = set()
+
+        def heap_object(id: int) -> list:
+            try:
+                return heap[str(id)]
+            except KeyError:
+                raise UnsupportedTrace(f"Dangling reference to heap object {id}")
+
+        def find(id: int) -> tuple[list, int] | None:
+            for row in current:
+                if id in row[1:]:
+                    return row, row.index(id, 1)
+            return None
+
+        def visit(parent: list, child: Any, row: list | None, new_row: list) -> None:
+            if _is_primitive(child):
+                return
+            child_id = _ref_id(child)
+            child_object = heap_object(child_id)
+            if _structurally_equivalent(parent, child_object):
+                update(child_id, row, new_row)
+            elif _should_nest(child_object):
+                raise UnsupportedTrace(f"Unsupported heap object {child_object[0]}")
+            else:
+                update(child_id, [], [])
+
+        def recurse(id: int, row: list | None, new_row: list) -> None:
+            obj = heap_object(id)
+            if _is_linear(obj):
+                for child in obj[1:]:
+                    visit(obj, child, row, new_row)
+            elif obj[0] in ("DICT", "INSTANCE", "INSTANCE_PPRINT", "CLASS"):
+                header_length = {"DICT": 1, "INSTANCE": 2}.get(obj[0], 3)
+                for key, value in obj[header_length:]:
+                    if not _is_primitive(key):
+                        update(_ref_id(key), [], [])
+                    visit(obj, value, row, new_row)
+
+        def update(id: int, row: list | None, new_row: list) -> None:
+            if id in laid_out:
+                return
+            laid_out.add(id)
+
+            found = find(id)
+            if found is not None:
+                found_row, index = found
+                ids_to_remove.discard(id)
+                # the objects linking to this one go right before it in its row
+                if len(new_row) > 1:
+                    found_row[index:index] = new_row[1:]
+                    ids_to_remove.difference_update(new_row[1:])
+                    new_row.clear()
+                recurse(id, found_row, [])
+            else:
+                if not new_row:
+                    new_row.append(f"row{id}")
+                new_row.append(id)
+                recurse(id, row, new_row)
+                if new_row:
+                    if row:
+                        row.extend(new_row[1:])
+                    else:
+                        current.append(list(new_row))
+                    ids_to_remove.difference_update(new_row[1:])
+                    new_row.clear()
+
+        for name in step.get("ordered_globals", []):
+            value = step["globals"].get(name)
+            if value is not None and not _is_primitive(value):
+                update(_ref_id(value), None, [])
+        for frame in step["stack_to_render"]:
+            for name in frame["ordered_varnames"]:
+                value = frame["encoded_locals"].get(name)
+                if value is not None and not _is_primitive(value):
+                    update(_ref_id(value), None, [])
+
+        layout = [
+            [row[0]] + [id for id in row[1:] if id not in ids_to_remove]
+            for row in current
+        ]
+        layout = [row for row in layout if len(row) > 1]
+
+    return [row[1:] for row in layout]
+
+
+# Rendering
+
+
+@dataclass
+class _Connector:
+    source: str
+    target: str
+    color: str
+
+
+class _Renderer:
+    """Builds the boxes of a step, like the DataVisualizer of pytutor.ts."""
+
+    def __init__(
+        self,
+        step: dict,
+        heap_rows: list[list[int]],
+        *,
+        include_types: bool,
+        text_memory_labels: bool,
+        strip_type_prefixes: list[str],
+    ):
+        self.step = step
+        self.heap: dict = step["heap"]
+        self.heap_attrs: dict = step.get("heap_attrs", {})
+        self.heap_rows = heap_rows
+        self.include_types = include_types
+        self.text_memory_labels = text_memory_labels
+        self.strip_type_prefixes = strip_type_prefixes
+        self.connectors: list[_Connector] = []
+        self.heap_connectors: list[tuple[str, int]] = []
+        self.top_level_ids: set[int] = {id for row in heap_rows for id in row}
+        # the top level heap object boxes, nudged right by the layout
+        self.heap_objects: dict[int, Box] = {}
+        self.pointer_count = 0
+
+    def _trim_type(self, type_name: str) -> str:
+        for prefix in self.strip_type_prefixes:
+            if type_name.startswith(prefix):
+                return type_name[len(prefix) :]
+        return type_name
+
+    def _type_label(self, text: str) -> Box:
+        return Box(
+            [Text(_checked(text), TYPE_LABEL, "#555555")],
+            size=TYPE_LABEL,
+            margin=(0, 0, 2, 0),
+        )
+
+    def _field_type_label(self, type_name: str) -> Box:
+        return Box(
+            [Text(_checked(self._trim_type(type_name)), FIELD_TYPE_LABEL, "#555555")],
+            size=FIELD_TYPE_LABEL,
+            margin=(0, 0, 2, 0),
+        )
+
+    def _value(self, value: Any, size: float, source: str, color: str) -> list:
+        """Return the content of a cell holding a value: text or a pointer to the heap."""
+        if _is_primitive(value):
+            return [_primitive(value, size)]
+        id = _ref_id(value)
+        if id not in self.top_level_ids:
+            raise UnsupportedTrace(f"Heap object {id} isn't laid out")
+        if self.text_memory_labels:
+            return [
+                Box(
+                    [Text(f"id{id}", TYPE_LABEL, "#444444")],
+                    size=TYPE_LABEL,
+                    margin=(0, 0, 2, 0),
+                )
+            ]
+        self.pointer_count += 1
+        anchor = f"{source}_pointer_{self.pointer_count}"
+        if source == "heap":
+            self.heap_connectors.append((anchor, id))
+        self.connectors.append(_Connector(anchor, f"heap_object_{id}", color))
+        # the pointer's endpoint is drawn over a non-breaking space
+        return [Box([Text(" ", X_SMALL)], size=X_SMALL, anchor=anchor)]
+
+    def _value_cell(
+        self, value: Any, source: str, color: str, final: bool, **style
+    ) -> Box:
+        return Box(
+            self._value(value, X_SMALL, source, color),
+            size=X_SMALL,
+            padding=(1, 6, 1, 6),
+            border="#000000",
+            radius=BORDER_RADIUS,
+            background=VALUE_BACKGROUND,
+            min_width=20,
+            brightness=0.85 if final else 1,
+            **style,
+        )
+
+    def _frame(
+        self,
+        header: str,
+        names: list[str],
+        values: dict,
+        attrs: dict,
+        highlighted: bool,
+    ) -> Box:
+        color = ARROW_COLOR if highlighted else INACTIVE_ARROW_COLOR
+        rows: list[list[Box]] = []
+        for name in names:
+            name_content: list = []
+            if self.include_types and name in attrs:
+                name_content.append(self._field_type_label(attrs[name]["type"]))
+            if name == "__return__":
+                # "Return<br/>value", each line as tall as the cell's font
+                for line in ("Return", "value"):
+                    name_content.append(
+                        Box([Text(line, RETURN_VALUE, "#e93f34")], size=SMALL)
+                    )
+            else:
+                name_content.append(
+                    Text(
+                        _checked(name),
+                        SMALL,
+                        "#de4b58" if name == "this" else "#000000",
+                    )
+                )
+            final = bool(attrs.get(name, {}).get("final"))
+            rows.append(
+                [
+                    Box(
+                        name_content,
+                        size=SMALL,
+                        padding=(1, 6, 1, 6),
+                        text_align="right",
+                    ),
+                    self._value_cell(values[name], "stack", color, final),
+                ]
+            )
+        children: list = [
+            Box([Text(_checked(header), SMALL)], size=SMALL, margin=(4, 0, 3, 0))
+        ]
+        if rows:
+            children.append(Table(rows, spacing=2, margin=(3, 0, 0, 0), align="right"))
+        return Box(
+            children,
+            size=HEAP,
+            padding=(2, 6, 4, 6),
+            margin=(0, 0, 15, 0),
+            border=FRAME_BORDER,
+            border_sides="lr",
+            background=HIGHLIGHTED_FRAME_BACKGROUND if highlighted else "#ffffff",
+        )
+
+    def stack(self) -> Box:
+        step = self.step
+        frames: list[dict] = step["stack_to_render"]
+        for frame in frames:
+            if frame.get("is_zombie"):
+                raise UnsupportedTrace("Zombie frames aren't supported")
+        highlighted_frames = [frame for frame in frames if frame.get("is_highlighted")]
+
+        children: list = []
+        globals_names: list[str] = step.get("ordered_globals", [])
+        if globals_names:
+            children.append(
+                self._frame(
+                    "Static fields",
+                    globals_names,
+                    step["globals"],
+                    step.get("globals_attrs", {}),
+                    not highlighted_frames,
+                )
+            )
+        for frame in frames:
+            header = frame["func_name"]
+            if frame.get("is_parent"):
+                header = f"f{frame['frame_id']}: {header}"
+            if frame.get("parent_frame_id_list"):
+                header += f" [parent=f{frame['parent_frame_id_list'][0]}]"
+            children.append(
+                self._frame(
+                    header,
+                    frame["ordered_varnames"],
+                    frame["encoded_locals"],
+                    frame.get("locals_attrs", {}),
+                    bool(frame.get("is_highlighted")),
+                )
+            )
+        return Box(children, size=HEAP, padding=(0, 30, 0, 10))
+
+    def _heap_object(self, id: int) -> Box:
+        obj = self.heap[str(id)]
+        attrs = self.heap_attrs.get(str(id), {})
+        prefix = f"id{id}:" if self.text_memory_labels else ""
+        children: list = []
+        match obj[0]:
+            case "INSTANCE":
+                label = f"{obj[1]} instance"
+                children.append(self._type_label(prefix + label))
+                fields = obj[2:]
+                if fields:
+                    is_string = "String instance" in label
+                    types = attrs.get("type", [])
+                    if (
+                        self.include_types
+                        and isinstance(types, list)
+                        and len(types) < len(fields)
+                    ):
+                        raise UnsupportedTrace(f"Missing field types of {obj[1]}")
+                    rows: list[list[Box]] = []
+                    for i, (name, value) in enumerate(fields):
+                        row: list[Box] = []
+                        if not is_string and "___NO_LABEL!___" not in str(name):
+                            key_content: list = []
+                            if self.include_types and isinstance(types, list):
+                                key_content.append(self._field_type_label(types[i]))
+                            key_content.append(Text(_checked(str(name)), SMALL))
+                            row.append(
+                                Box(
+                                    key_content,
+                                    size=SMALL,
+                                    padding=(1, 6, 1, 6),
+                                    text_align="right",
+                                )
+                            )
+                        value_cell = self._value_cell(
+                            value, "heap", ARROW_COLOR, bool(attrs.get("final"))
+                        )
+                        if is_string:
+                            value_cell.border = None
+                        row.append(value_cell)
+                        rows.append(row)
+                    children.append(
+                        Table(
+                            rows,
+                            border="#000000",
+                            radius=BORDER_RADIUS,
+                            background=(
+                                VALUE_BACKGROUND if is_string else OBJECT_BACKGROUND
+                            ),
+                        )
+                    )
+            case "LIST":
+                label = self._trim_type(str(attrs.get("type", "array"))) + " instance"
+                if len(obj) == 1:
+                    children.append(self._type_label(prefix + "empty " + label))
+                else:
+                    children.append(self._type_label(prefix + label))
+                    headers: list[Box] = []
+                    elements: list[Box] = []
+                    index = 0
+                    for value in obj[1:]:
+                        if isinstance(value, list) and value[0] == "ELIDE":
+                            headers.append(self._list_header("…"))
+                            elements.append(self._list_element([Text("…", X_SMALL)]))
+                            index += value[1]
+                            continue
+                        headers.append(self._list_header(str(index)))
+                        elements.append(
+                            self._list_element(
+                                self._value(value, X_SMALL, "heap", ARROW_COLOR)
+                            )
+                        )
+                        index += 1
+                    children.append(
+                        Table(
+                            [headers, elements],
+                            border="#000000",
+                            radius=BORDER_RADIUS,
+                            background=OBJECT_BACKGROUND,
+                        )
+                    )
+            case "HEAP_PRIMITIVE":
+                children.append(
+                    Box(
+                        [
+                            self._type_label(prefix + str(obj[1])),
+                            _primitive(obj[2], HEAP),
+                        ],
+                        size=HEAP,
+                        padding=(0, 0, 0, 4),
+                    )
+                )
+            case tag:
+                raise UnsupportedTrace(f"Unsupported heap object {tag}")
+        box = Box(children, size=HEAP, padding=(0, 0, 0, 2), anchor=f"heap_object_{id}")
+        self.heap_objects[id] = box
+        return box
+
+    def _list_header(self, text: str) -> Box:
+        return Box(
+            [Text(text, XX_SMALL, "#777777")],
+            size=XX_SMALL,
+            padding=(2, 0, 3, 4),
+        )
+
+    def _list_element(self, content: list) -> Box:
+        return Box(
+            content,
+            size=X_SMALL,
+            padding=(1, 6, 1, 6),
+            border="#000000",
+            radius=BORDER_RADIUS,
+            background=VALUE_BACKGROUND,
+            vertical_align="bottom",
+        )
+
+    def heap_area(self) -> Box:
+        rows: list = []
+        for row in self.heap_rows:
+            cells = [
+                Box(
+                    [self._heap_object(id)],
+                    size=HEAP,
+                    padding=(4, 8, 4, 8),
+                )
+                for id in row
+            ]
+            rows.append(Table([cells], spacing=2, margin=(0, 0, 10, 0)))
+        return Box(rows, size=HEAP, padding=(0, 0, 0, 30))
+
+
+@dataclass
+class Drawing:
+    """The painting operations of a rendered trace, in CSS pixels."""
+
+    width: float
+    height: float
+    ops: list[tuple]
+
+
+def _load_trace(trace: str | bytes) -> dict:
+    data = json.loads(trace_format.read_trace(trace))
+    if "trace" not in data or not data["trace"]:
+        raise UnsupportedTrace("The trace has no steps")
+    return data
+
+
+def layout(
+    trace: str | bytes,
+    *,
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+) -> Drawing:
+    """Lay out the final state of an execution trace like the frontend does.
+
+    Args:
+        trace: The execution trace file, as JSON or in the compact trace format (see
+            ``trace_format``).
+        include_types: Whether or not type tags should be included in this visualization.
+        text_memory_labels: Whether or not memory connections should be rendered as text instead of arrows.
+        strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
+
+    Return:
+        The drawing of the trace.
+
+    Raises:
+        UnsupportedTrace: If the trace has something only the frontend can render.
+    """
+    steps: list[dict] = _load_trace(trace)["trace"]
+
+    # the frontend jumps to the first exception, or to the end
+    last = len(steps) - 1
+    for i, step in enumerate(steps):
+        if step.get("event") in ("exception", "uncaught_exception"):
+            last = i
+            break
+    steps = [
+        # the Java frontend shows the outermost frame first
+        {**step, "stack_to_render": list(reversed(step["stack_to_render"]))}
+        for step in steps[: last + 1]
+    ]
+    step = steps[-1]
+    if step.get("event") in ("exception", "uncaught_exception"):
+        raise UnsupportedTrace("Exceptions aren't supported")
+
+    renderer = _Renderer(
+        step,
+        _heap_layout(steps),
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+    )
+    stack = renderer.stack()
+    heap = renderer.heap_area()
+    page = Table(
+        [
+            [
+                Box([stack], size=HEAP, padding=(1, 1, 1, 1), vertical_align="top"),
+                Box([heap], size=HEAP, padding=(1, 1, 1, 1), vertical_align="top"),
+            ]
+        ],
+        spacing=2,
+    )
+
+    anchors: dict[str, Box] = {}
+    page.place(0, 0, anchors)
+
+    if renderer.heap_connectors:
+        _nudge_heap_rows(renderer, page, anchors)
+
+    ops: list[tuple] = []
+    page.paint(ops)
+
+    # inactive connectors are drawn below active ones
+    for connector in sorted(
+        renderer.connectors, key=lambda connector: connector.color == ARROW_COLOR
+    ):
+        source = anchors[connector.source]
+        target = anchors[connector.target]
+        ops.append(
+            (
+                "connector",
+                _connector_path(
+                    (source.x + source.width, source.y + source.height / 2),
+                    (target.x, target.y + target.height / 2),
+                ),
+                connector.color,
+            )
+        )
+
+    return Drawing(page.width, page.height, ops)
+
+
+def _nudge_heap_rows(renderer: _Renderer, page: Table, anchors: dict[str, Box]) -> None:
+    # like the end of renderDataStructures: an arrow from a heap object to an object in another
+    # row mustn't point left, so its target (and the rows that target nudged) move right
+    row_of: dict[int, int] = {
+        id: index for index, row in enumerate(renderer.heap_rows) for id in row
+    }
+    source_rows: dict[str, int] = {}
+    for id, box in renderer.heap_objects.items():
+        for anchor in _anchors_in(box):
+            source_rows[anchor] = row_of[id]
+
+    nudged_rows: dict[int, set[int]] = {}
+    # the frontend goes through the connectors in the order of their (string) ids
+    for source, target_id in sorted(
+        renderer.heap_connectors, key=lambda connector: connector[0]
+    ):
+        source_row = source_rows[source]
+        target_row = row_of[target_id]
+        if source_row == target_row:
+            continue
+        source_left = anchors[source].x
+        target = anchors[f"heap_object_{target_id}"]
+        if source_left <= target.x:
+            continue
+        delta = source_left - target.x + NUDGE_MARGIN
+        _nudge(target, delta)
+        nudged_rows.setdefault(source_row, set()).add(target_row)
+        for row in nudged_rows.get(target_row, set()) - {source_row}:
+            for id in renderer.heap_rows[row]:
+                _nudge(renderer.heap_objects[id], delta)
+            nudged_rows[source_row].add(row)
+        page.forget_sizes()
+        page.place(0, 0, anchors)
+
+
+def _nudge(box: Box, delta: float) -> None:
+    top, right, bottom, left = box.margin
+    box.margin = (top, right, bottom, left + delta)
+
+
+def _anchors_in(box: "Box | Table") -> list[str]:
+    found: list[str] = []
+    if isinstance(box, Box):
+        if box.anchor is not None and "_pointer_" in box.anchor:
+            found.append(box.anchor)
+        children = [child for child in box.children if not isinstance(child, Text)]
+    else:
+        children = [cell for row in box.rows for cell in row]
+    for child in children:
+        found.extend(_anchors_in(child))
+    return found
+
+
+def _connector_path(
+    source: tuple[float, float], target: tuple[float, float]
+) -> tuple[tuple[float, float], tuple[float, float], tuple[float, float]]:
+    """Return the start, control point and end of a connector, like jsPlumb's StateMachine
+    connector from a RightMiddle anchor to a LeftMiddle anchor."""
+    source_x, source_y = source
+    target_x, target_y = target
+    width = abs(source_x - target_x)
+    height = abs(source_y - target_y)
+    x_margin = 0.45 * width
+    y_margin = 0.45 * height
+    width *= 1.9
+    height *= 1.9
+    origin_x = min(source_x, target_x) - x_margin
+    origin_y = min(source_y, target_y) - y_margin
+
+    start_x = x_margin if source_x < target_x else width - x_margin
+    start_y = y_margin if source_y < target_y else height - y_margin
+    end_x = width - x_margin if source_x < target_x else x_margin
+    end_y = height - y_margin if source_y < target_y else y_margin
+
+    # the margin moves the ends away from the anchors along their orientation
+    start_x += CONNECTOR_MARGIN
+    start_y -= CONNECTOR_MARGIN
+    end_y -= CONNECTOR_MARGIN
+
+    middle_x = (start_x + end_x) / 2
+    middle_y = (start_y + end_y) / 2
+    if math.hypot(end_x - start_x, end_y - start_y) <= CONNECTOR_PROXIMITY_LIMIT:
+        control = (middle_x, middle_y)
+    elif start_x <= end_x and end_y <= start_y:
+        control = (middle_x, middle_y - CONNECTOR_CURVINESS)
+    elif start_x <= end_x and start_y <= end_y:
+        control = (middle_x, middle_y - CONNECTOR_CURVINESS)
+    elif end_x <= start_x and end_y >= start_y:
+        control = (middle_x - CONNECTOR_CURVINESS, middle_y - CONNECTOR_CURVINESS)
+    else:
+        control = (middle_x + CONNECTOR_CURVINESS, middle_y - CONNECTOR_CURVINESS)
+
+    return (
+        (origin_x + start_x, origin_y + start_y),
+        (origin_x + control[0], origin_y + control[1]),
+        (origin_x + end_x, origin_y + end_y),
+    )
+
+
+def _bezier(
+    path: tuple[tuple[float, float], ...], steps: int = 32
+) -> list[tuple[float, float]]:
+    (x0, y0), (cx, cy), (x1, y1) = path
+    points = []
+    for i in range(steps + 1):
+        t = i / steps
+        # a cubic curve whose two control points are the same
+        a, b, d = (1 - t) ** 3, 3 * (1 - t) ** 2 * t + 3 * (1 - t) * t**2, t**3
+        points.append((a * x0 + b * cx + d * x1, a * y0 + b * cy + d * y1))
+    return points
+
+
+def _arrow_head(
+    path: tuple[tuple[float, float], ...],
+) -> list[tuple[float, float]]:
+    _, (cx, cy), (x, y) = path
+    dx, dy = x - cx, y - cy
+    length = math.hypot(dx, dy) or 1
+    dx, dy = dx / length, dy / length
+    base_x, base_y = x - dx * ARROW_LENGTH, y - dy * ARROW_LENGTH
+    half_width = ARROW_WIDTH / 2
+    return [
+        (x, y),
+        (base_x - dy * half_width, base_y + dx * half_width),
+        (
+            x - dx * ARROW_LENGTH * ARROW_FOLDBACK,
+            y - dy * ARROW_LENGTH * ARROW_FOLDBACK,
+        ),
+        (base_x + dy * half_width, base_y - dx * half_width),
+    ]
+
+
+# Painting
+
+
+def draw_image(drawing: Drawing, dpi: int = 1) -> Image.Image:
+    """Paint a drawing (see ``layout``) to an RGB image at a multiple of its size."""
+    width = max(1, round(drawing.width * dpi))
+    height = max(1, round(drawing.height * dpi))
+    image = Image.new("RGB", (width, height), "#ffffff")
+    draw = ImageDraw.Draw(image)
+
+    def scaled(value: float) -> int:
+        return round(value * dpi)
+
+    connectors: list[tuple] = []
+    for op in drawing.ops:
+        match op:
+            case (
+                "box",
+                x,
+                y,
+                box_width,
+                box_height,
+                background,
+                border,
+                sides,
+                radius,
+            ):
+                box = (
+                    scaled(x),
+                    scaled(y),
+                    scaled(x + box_width) - 1,
+                    scaled(y + box_height) - 1,
+                )
+                if sides == "trbl":
+                    draw.rounded_rectangle(
+                        box,
+                        radius=radius * dpi,
+                        fill=background,
+                        outline=border,
+                        width=dpi if border else 0,
+                    )
+                    continue
+                if background is not None:
+                    draw.rectangle(box, fill=background)
+                if border is not None:
+                    if "l" in sides:
+                        draw.rectangle(
+                            (box[0], box[1], box[0] + dpi - 1, box[3]), fill=border
+                        )
+                    if "r" in sides:
+                        draw.rectangle(
+                            (box[2] - dpi + 1, box[1], box[2], box[3]), fill=border
+                        )
+            case ("text", x, baseline, text, size, color):
+                draw.text(
+                    (x * dpi, baseline * dpi),
+                    text,
+                    fill=color,
+                    font=_font(size * dpi),
+                    anchor="ls",
+                )
+            case ("connector", *_):
+                connectors.append(op)
+
+    for _, path, color in connectors:
+        _draw_connector(image, path, color, dpi)
+
+    return image
+
+
+def _draw_connector(
+    image: Image.Image, path: tuple[tuple[float, float], ...], color: str, dpi: int
+) -> None:
+    # the endpoint dot is on the anchor, which the connector's margin moved the curve away from
+    dot_x, dot_y = path[0][0] - CONNECTOR_MARGIN, path[0][1] + CONNECTOR_MARGIN
+    curve = _bezier(path)
+    head = _arrow_head(path)
+    points = curve + head + [(dot_x, dot_y)]
+
+    # only the connector's bounding box is supersampled
+    padding = ENDPOINT_RADIUS + 1
+    left = max(0, math.floor((min(x for x, _ in points) - padding) * dpi))
+    top = max(0, math.floor((min(y for _, y in points) - padding) * dpi))
+    right = min(image.width, math.ceil((max(x for x, _ in points) + padding) * dpi))
+    bottom = min(image.height, math.ceil((max(y for _, y in points) + padding) * dpi))
+    if right <= left or bottom <= top:
+        return
+
+    scale = dpi * SUPERSAMPLING
+
+    def scaled(point: tuple[float, float]) -> tuple[float, float]:
+        return (
+            point[0] * scale - left * SUPERSAMPLING,
+            point[1] * scale - top * SUPERSAMPLING,
+        )
+
+    mask = Image.new(
+        "L", ((right - left) * SUPERSAMPLING, (bottom - top) * SUPERSAMPLING)
+    )
+    draw = ImageDraw.Draw(mask)
+    draw.line([scaled(point) for point in curve], fill=255, width=scale, joint="curve")
+    draw.polygon([scaled(point) for point in head], fill=255)
+    x, y = scaled((dot_x, dot_y))
+    radius = ENDPOINT_RADIUS * scale
+    draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=255)
+
+    mask = mask.resize((right - left, bottom - top), Image.Resampling.BOX)
+    image.paste(color, (left, top, right, bottom), mask)
+
+
+@functools.cache
+def _font_face() -> str:
+    data = base64.b64encode(font_path().read_bytes()).decode()
+    return (
+        '@font-face { font-family: "Recursive"; '
+        f'src: url(data:font/woff2;base64,{data}) format("woff2"); }}'
+    )
+
+
+def draw_svg(drawing: Drawing, dpi: int = 1) -> str:
+    """Paint a drawing (see ``layout``) as an SVG document, with the font embedded."""
+
+    def number(value: float) -> str:
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+
+    elements: list[str] = []
+    for op in drawing.ops:
+        match op:
+            case ("box", x, y, width, height, background, border, sides, radius):
+                if sides == "trbl":
+                    attributes = (
+                        f'x="{number(x + 0.5)}" y="{number(y + 0.5)}" '
+                        f'width="{number(width - 1)}" height="{number(height - 1)}" '
+                        f'rx="{number(radius)}" fill="{background or "none"}"'
+                    )
+                    if border is not None:
+                        attributes += f' stroke="{border}"'
+                    elements.append(f"<rect {attributes}/>")
+                    continue
+                if background is not None:
+                    elements.append(
+                        f'<rect x="{number(x)}" y="{number(y)}" width="{number(width)}" '
+                        f'height="{number(height)}" fill="{background}"/>'
+                    )
+                for side, line_x in (("l", x + 0.5), ("r", x + width - 0.5)):
+                    if border is not None and side in sides:
+                        elements.append(
+                            f'<line x1="{number(line_x)}" y1="{number(y)}" '
+                            f'x2="{number(line_x)}" y2="{number(y + height)}" '
+                            f'stroke="{border}"/>'
+                        )
+            case ("text", x, baseline, text, size, color):
+                elements.append(
+                    f'<text x="{number(x)}" y="{number(baseline)}" '
+                    f'font-size="{number(size)}" fill="{color}">{escape(text)}</text>'
+                )
+            case ("connector", path, color):
+                (x0, y0), (cx, cy), (x1, y1) = path
+                elements.append(
+                    f'<path d="M {number(x0)} {number(y0)} C {number(cx)} {number(cy)} '
+                    f'{number(cx)} {number(cy)} {number(x1)} {number(y1)}" '
+                    f'fill="none" stroke="{color}"/>'
+                )
+                head = " ".join(
+                    f"{number(x)},{number(y)}" for x, y in _arrow_head(path)
+                )
+                elements.append(f'<polygon points="{head}" fill="{color}"/>')
+                elements.append(
+                    f'<circle cx="{number(x0 - CONNECTOR_MARGIN)}" '
+                    f'cy="{number(y0 + CONNECTOR_MARGIN)}" r="{number(ENDPOINT_RADIUS)}" '
+                    f'fill="{color}"/>'
+                )
+
+    width, height = number(drawing.width), number(drawing.height)
+    return "\n".join(
+        [
+            '<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{number(drawing.width * dpi)}" height="{number(drawing.height * dpi)}" '
+            f'viewBox="0 0 {width} {height}" '
+            'font-family="Recursive, monospace" xml:space="preserve">',
+            f"<style>{_font_face()}</style>",
+            f'<rect width="{width}" height="{height}" fill="#ffffff"/>',
+            *elements,
+            "</svg>",
+            "",
+        ]
+    )
+
+
+def _encode(
+    drawing: Drawing,
+    dpi: int,
+    format: str,
+    encode_options: browser_driver.EncodeOptions | None,
+) -> bytes:
+    if format.upper() == SVG:
+        return draw_svg(drawing, dpi).encode()
+    return browser_driver.encode_image(draw_image(drawing, dpi), format, encode_options)
+
+
+def submit_images(
+    trace: str | bytes,
+    *,
+    dpis: Iterable[int] = (1,),
+    formats: Iterable[str] = ("PNG",),
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    encode_options: browser_driver.EncodeOptions | None = None,
+) -> dict[tuple[int, str], Future[bytes]]:
+    """Lay out the final state of an execution trace and paint and encode it in the background.
+
+    The counterpart of ``browser_driver.submit_images``: the trace is laid out right away (so
+    ``UnsupportedTrace`` is raised here) and each image is painted and encoded by the
+    ``browser_driver.encoder_pool``.
+
+    Args:
+        trace: The execution trace file, as JSON or in the compact trace format (see
+            ``trace_format``).
+        dpis: Positive multiplicative factors for the output images' resolution.
+        formats: The image output formats. These get passed directly into PIL's ``Image.save()``,
+            except for ``SVG``.
+        include_types: Whether or not type tags should be included in this visualization.
+        text_memory_labels: Whether or not memory connections should be rendered as text instead of arrows.
+        strip_type_prefixes: A list of prefix strings to strip from the beginning of type labels.
+        encode_options: Options for the image encoders, see ``browser_driver.encode_image``.
+
+    Return:
+        A mapping from each ``(dpi, format)`` pair to a future of the bytes of the generated image.
+
+    Raises:
+        UnsupportedTrace: If the trace has something only the frontend can render.
+    """
+    drawing = layout(
+        trace,
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+    )
+    return {
+        (dpi, format): browser_driver.encoder_pool().submit(
+            _encode, drawing, dpi, format, encode_options
+        )
+        for dpi in dpis
+        for format in formats
+    }
+
+
+def generate_images(
+    trace: str | bytes,
+    *,
+    dpis: Iterable[int] = (1,),
+    formats: Iterable[str] = ("PNG",),
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    encode_options: browser_driver.EncodeOptions | None = None,
+) -> dict[tuple[int, str], bytes]:
+    """Generate images of the final state of an execution trace file without a browser.
+
+    See ``submit_images`` for the arguments.
+
+    Return:
+        A mapping from each ``(dpi, format)`` pair to the bytes of the generated image.
+
+    Raises:
+        UnsupportedTrace: If the trace has something only the frontend can render.
+    """
+    images = submit_images(
+        trace,
+        dpis=dpis,
+        formats=formats,
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+        encode_options=encode_options,
+    )
+    return {key: image.result() for key, image in images.items()}
+
+
+def generate_image(
+    trace: str | bytes,
+    *,
+    dpi: int = 1,
+    format: str = "PNG",
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    encode_options: browser_driver.EncodeOptions | None = None,
+) -> bytes:
+    """Generate an image of the final state of an execution trace file without a browser.
+
+    See ``submit_images`` for the arguments.
+
+    Return:
+        The bytes of the generated image in the format specified by the ``format`` argument.
+
+    Raises:
+        UnsupportedTrace: If the trace has something only the frontend can render.
+    """
+    return generate_images(
+        trace,
+        dpis=[dpi],
+        formats=[format],
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+        encode_options=encode_options,
+    )[(dpi, format)]
+
+
+def submit_images_with_fallback(
+    trace: str | bytes,
+    *,
+    dpis: Iterable[int] = (1,),
+    formats: Iterable[str] = ("PNG",),
+    include_types: bool = True,
+    text_memory_labels: bool = False,
+    strip_type_prefixes: list[str] = [],
+    encode_options: browser_driver.EncodeOptions | None = None,
+    **browser_options,
+) -> dict[tuple[int, str], Future[bytes]]:
+    """Like ``submit_images``, but traces that aren't supported are rendered by the browser.
+
+    Any other keyword arguments (e.g. ``driver``) are passed to ``browser_driver.submit_images``.
+    The browser can't write ``SVG`` images, so an exception is raised if they are requested for a
+    trace that isn't supported.
+    """
+    dpis = list(dpis)
+    formats = list(formats)
+    try:
+        return submit_images(
+            trace,
+            dpis=dpis,
+            formats=formats,
+            include_types=include_types,
+            text_memory_labels=text_memory_labels,
+            strip_type_prefixes=strip_type_prefixes,
+            encode_options=encode_options,
+        )
+    except UnsupportedTrace as exc:
+        if any(format.upper() == SVG for format in formats):
+            raise Exception(
+                f"Unable to render the trace as SVG, the native renderer doesn't support it: {exc}"
+            ) from exc
+        logger.info(f"Rendering with the browser: {exc}")
+    return browser_driver.submit_images(
+        trace,
+        dpis=dpis,
+        formats=formats,
+        include_types=include_types,
+        text_memory_labels=text_memory_labels,
+        strip_type_prefixes=strip_type_prefixes,
+        encode_options=encode_options,
+        **browser_options,
+    )
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+import functools
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, TypedDict
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+PROC: Path = Path("/proc")
+
+# How often the process tree is sampled. Peak memory is the largest sampled total, so a process
+# tree that peaks for less than this may be under-reported. Reading the PSS of a process makes the
+# kernel walk its page tables, so sampling much more often than this slows down what is measured.
+SAMPLE_INTERVAL_SECS: float = 0.1
+
+
+class ProcessUsage(TypedDict):
+    """The resources used by a process and its descendants while they were sampled.
+
+    name:              What the processes were doing, e.g. ``tracer`` or ``browser``.
+    wall_secs:         Wall time between the start and the end of the sampling.
+    cpu_secs:          User and system CPU time used by the process tree during the sampling.
+                       Time used by processes that lived for less than one sample interval isn't
+                       counted, unless they were reaped by the root process and its exit was
+                       recorded (see ``ProcessTreeSampler.record_exit``).
+    peak_memory_bytes: The largest total memory of the process tree over all samples, measured
+                       as given by ``memory_kind``, and at least the largest resident set size of
+                       a process reaped by the root process if its exit was recorded (see
+                       ``ProcessTreeSampler.record_exit``).
+    memory_kind:       ``pss`` if the proportional set sizes of the processes were summed, so that
+                       pages shared between them (e.g. by Chrome's processes) are counted once, or
+                       ``rss`` if ``/proc/<pid>/smaps_rollup`` isn't available and their resident
+                       set sizes were summed, which counts shared pages once per process.
+    processes:         Number of distinct processes seen in the tree.
+    samples:           Number of samples taken.
+    """
+
+    name: str
+    wall_secs: float
+    cpu_secs: float
+    peak_memory_bytes: int
+    memory_kind: str
+    processes: int
+    samples: int
+
+
+def is_supported() -> bool:
+    """Return whether process trees can be sampled, i.e. whether ``/proc`` is available."""
+    return (PROC / "self" / "stat").is_file()
+
+
+def _read_stat(pid: int) -> tuple[int, int, int] | None:
+    """Return the parent pid, CPU clock ticks and resident pages of a process."""
+    try:
+        stat = (PROC / str(pid) / "stat").read_bytes()
+    except OSError:
+        return None
+    # the command name is in parentheses and may contain spaces and parentheses itself
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    if fields[0] == b"Z":
+        # zombies have released their memory and their times are added to their parent's
+        return None
+    return int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[21])
+
+
+def _read_pss(pid: int) -> int | None:
+    """Return the proportional set size of a process in bytes."""
+    try:
+        rollup = (PROC / str(pid) / "smaps_rollup").read_bytes()
+    except OSError:
+        return None
+    for line in rollup.splitlines():
+        if line.startswith(b"Pss:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+@functools.cache
+def _has_children_files() -> bool:
+    """Return whether ``/proc/<pid>/task/<tid>/children`` exists (CONFIG_PROC_CHILDREN)."""
+    return (PROC / "self" / "task" / str(os.getpid()) / "children").is_file()
+
+
+def _read_children(pid: int) -> list[int]:
+    """Return the pids of the children of every thread of a process."""
+    children: list[int] = []
+    try:
+        tasks = list((PROC / str(pid) / "task").iterdir())
+    except OSError:
+        return children
+    for task in tasks:
+        try:
+            children += map(int, (task / "children").read_bytes().split())
+        except OSError:
+            pass
+    return children
+
+
+class ProcessTreeSampler:
+    """Samples the CPU time and memory of a process and its descendants from ``/proc``.
+
+    Samples are taken by a background thread from ``start()`` until ``stop()``. The tree is
+    walked from the process through ``/proc/<pid>/task/<tid>/children``, or found by scanning the
+    parent pids of every process in ``/proc`` on kernels without those files. Either way,
+    processes that were re-parented (e.g. daemonized) aren't included.
+
+    Sampling misses the CPU time a process used after the last sample before it exited, and that
+    of children it reaped in between samples. Whoever reaps the root process should pass its
+    ``os.wait4`` resource usage to ``record_exit``, which accounts for both.
+    """
+
+    def __init__(
+        self, pid: int, name: str, interval_secs: float = SAMPLE_INTERVAL_SECS
+    ):
+        self.pid: int = pid
+        self.name: str = name
+        self.interval_secs: float = interval_secs
+        self._clock_ticks: int = os.sysconf("SC_CLK_TCK")
+        self._page_size: int = os.sysconf("SC_PAGE_SIZE")
+        self._baseline_ticks: dict[int, int] = {}
+        self._last_ticks: dict[int, int] = {}
+        self._use_pss: bool = _read_pss(pid) is not None
+        self._peak_memory_bytes: int = 0
+        self._exit_rusage: "resource.struct_rusage | None" = None
+        self._samples: int = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_time: float = 0
+
+    def _tree(self) -> dict[int, tuple[int, int]]:
+        if _has_children_files():
+            tree: dict[int, tuple[int, int]] = {}
+            pending = [self.pid]
+            while pending:
+                pid = pending.pop()
+                if stat := _read_stat(pid):
+                    tree[pid] = stat[1:]
+                    pending += _read_children(pid)
+            return tree
+
+        stats: dict[int, tuple[int, int, int]] = {}
+        for entry in PROC.iterdir():
+            if entry.name.isdigit() and (stat := _read_stat(int(entry.name))):
+                stats[int(entry.name)] = stat
+        children: dict[int, list[int]] = {}
+        for pid, (parent, _, _) in stats.items():
+            children.setdefault(parent, []).append(pid)
+
+        tree = {}
+        pending = [self.pid] if self.pid in stats else []
+        while pending:
+            pid = pending.pop()
+            tree[pid] = stats[pid][1:]
+            pending += children.get(pid, [])
+        return tree
+
+    def sample(self) -> None:
+        """Take a sample now."""
+        tree = self._tree()
+        first = self._samples == 0
+        self._samples += 1
+        for pid, (ticks, _) in tree.items():
+            if first:
+                # only what is used from now on counts for processes that were already running
+                self._baseline_ticks[pid] = ticks
+            self._last_ticks[pid] = ticks
+        memory = 0
+        for pid, (_, pages) in tree.items():
+            # a process that exited since the tree was read counts with its last known RSS
+            pss = _read_pss(pid) if self._use_pss else None
+            memory += pages * self._page_size if pss is None else pss
+        self._peak_memory_bytes = max(self._peak_memory_bytes, memory)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval_secs):
+            try:
+                self.sample()
+            except Exception:
+                logger.debug("Unable to sample the process tree", exc_info=True)
+
+    def start(self) -> None:
+        self._start_time = time.perf_counter()
+        self.sample()
+        self._thread = threading.Thread(
+            target=self._run, name=f"sample-{self.name}", daemon=True
+        )
+        self._thread.start()
+
+    def record_exit(self, rusage: "resource.struct_rusage") -> None:
+        """Record the resource usage ``os.wait4`` returned when the root process was reaped.
+
+        It holds the exact CPU time of the root process and of every descendant it reaped, and
+        the largest resident set size of any of them, which become lower bounds of the usage
+        returned by ``stop()``.
+        """
+        self._exit_rusage = rusage
+
+    def stop(self) -> ProcessUsage:
+        """Take a last sample, stop sampling and return the usage of the process tree."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
+        cpu_secs = (
+            sum(
+                ticks - self._baseline_ticks.get(pid, 0)
+                for pid, ticks in self._last_ticks.items()
+            )
+            / self._clock_ticks
+        )
+        peak_memory_bytes = self._peak_memory_bytes
+        if (rusage := self._exit_rusage) is not None:
+            cpu_secs = max(
+                cpu_secs,
+                rusage.ru_utime
+                + rusage.ru_stime
+                - self._baseline_ticks.get(self.pid, 0) / self._clock_ticks,
+            )
+            # in kilobytes, except on macOS
+            max_rss_bytes = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            peak_memory_bytes = max(peak_memory_bytes, max_rss_bytes)
+        return ProcessUsage(
+            name=self.name,
+            wall_secs=time.perf_counter() - self._start_time,
+            cpu_secs=cpu_secs,
+            peak_memory_bytes=peak_memory_bytes,
+            memory_kind="pss" if self._use_pss else "rss",
+            processes=len(self._last_ticks),
+            samples=self._samples,
+        )
+
+
+@contextmanager
+def sample_process_tree(
+    pid: int | None, name: str, usage: list[ProcessUsage] | None
+) -> Iterator[ProcessTreeSampler | None]:
+    """Sample a process tree for the duration of the context and append its usage to ``usage``.
+
+    The context's value is the sampler, e.g. for ``record_exit``, or None if nothing is sampled
+    because ``usage`` is None, ``pid`` is None or ``/proc`` isn't available.
+    """
+    if usage is None or pid is None or not is_supported():
+        yield None
+        return
+    sampler = ProcessTreeSampler(pid, name)
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        usage.append(sampler.stop())
+
+
+def summarize(usage: list[ProcessUsage]) -> str:
+    """Return a table of the usage of each kind of process tree, e.g. for a batch of renders.
+
+    Peak memory is given as its median, 95th percentile and maximum over all runs, since the
+    maximum is what a pool of workers needs to fit into memory at once. It's labeled ``pss`` or
+    ``rss`` after ``ProcessUsage.memory_kind``, or ``mem`` if the runs were measured differently.
+    """
+    if not usage:
+        return "no process usage was sampled"
+
+    runs: dict[str, list[ProcessUsage]] = {}
+    for entry in usage:
+        runs.setdefault(entry["name"], []).append(entry)
+
+    def percentile(values: list[float], fraction: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, round(fraction * (len(values) - 1)))]
+
+    kinds = {entry["memory_kind"] for entry in usage}
+    memory_label = kinds.pop() if len(kinds) == 1 else "mem"
+
+    name_width = max(4, *(len(name) for name in runs))
+    lines = [
+        f"{'name':<{name_width}}  {'runs':>5}  {'wall s':>8}  {'cpu s':>8}  {'cpu %':>6}  "
+        f"{memory_label + ' MiB p50':>11}  {'p95':>7}  {'max':>7}"
+    ]
+    for name, entries in runs.items():
+        wall = sum(entry["wall_secs"] for entry in entries)
+        cpu = sum(entry["cpu_secs"] for entry in entries)
+        memory = [entry["peak_memory_bytes"] / 2**20 for entry in entries]
+        lines.append(
+            f"{name:<{name_width}}  {len(entries):>5}  {wall:>8.1f}  {cpu:>8.1f}  "
+            f"{cpu / wall if wall else 0:>6.0%}  {statistics.median(memory):>11.1f}  "
+            f"{percentile(memory, 0.95):>7.1f}  {max(memory):>7.1f}"
+        )
+    return "\n".join(lines)
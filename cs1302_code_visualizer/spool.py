@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, NotRequired, TypedDict
+
+from . import render_images
+from . import trace_generator
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# The layout of a spool directory:
+#
+#   jobs/<id>.json       jobs waiting for a worker
+#   claimed/<id>.json    jobs being rendered, with the claim token of their worker; the worker
+#                        keeps the file's mtime fresh as its lease
+#   results/<id>/        images of a finished job, followed by result.json once they are complete
+#   failed/<id>.json     jobs whose workers died max_attempts times
+#
+# Every state change is a single rename or an atomic write, so any number of workers on any number
+# of machines can share a spool on a network file system without a broker or file locks. Lease
+# expiry compares file mtimes with the local clock, so the clocks of the workers' machines should
+# agree to well within lease_secs. A worker whose lease expired (e.g. because it was paused) finds
+# another claim token in the claimed job, and then leaves the job to the worker that holds it.
+SPOOL_DIRS: tuple[str, ...] = ("jobs", "claimed", "results", "failed")
+
+# render_images options a job may set. Resource limits are set by the worker.
+JOB_OPTIONS: set[str] = {
+    "timeout_secs",
+    "dpi",
+    "format",
+    "inline_strings",
+    "remove_main_args",
+    "include_types",
+    "text_memory_labels",
+    "strip_type_prefixes",
+    "render_all_breakpoint_occurrences",
+    "animate",
+    "frame_duration_ms",
+}
+
+
+class RenderJob(TypedDict):
+    java_source: str
+    breakpoints: list[int]
+    options: dict[str, Any]
+    attempts: int
+    # set while the job is claimed, unique to the claim
+    claim: NotRequired[str]
+
+
+class JobResult(TypedDict, total=False):
+    images: dict[str, list[str]]
+    error: str
+    worker: str
+
+
+def _spool_paths(spool_dir: Path) -> dict[str, Path]:
+    paths = {name: spool_dir / name for name in SPOOL_DIRS}
+    for path in paths.values():
+        path.mkdir(parents=True, exist_ok=True)
+    return paths
+
+
+def submit_job(
+    spool_dir: Path, java_source: str, breakpoints: set[int], **options: Any
+) -> str:
+    """Add a render job to a spool directory.
+
+    Args:
+        spool_dir: The shared spool directory.
+        java_source: The Java source code to visualize.
+        breakpoints: The breakpoint lines, as for ``render_images``.
+        options: Other ``render_images`` keyword arguments. dpi and format must not be lists.
+
+    Return:
+        The job's id, which is a hash of the job so that identical submissions share one result.
+    """
+    unknown = set(options) - JOB_OPTIONS
+    if unknown:
+        raise Exception(f"Unsupported job options: {', '.join(sorted(unknown))}")
+    if isinstance(options.get("dpi"), list) or isinstance(options.get("format"), list):
+        raise Exception("dpi and format must not be lists in spooled jobs")
+
+    paths = _spool_paths(spool_dir)
+    job = RenderJob(
+        java_source=java_source,
+        breakpoints=sorted(breakpoints),
+        options=options,
+        attempts=0,
+    )
+    job_id = hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()[:32]
+
+    # a job that failed before is attempted again
+    (paths["failed"] / f"{job_id}.json").unlink(missing_ok=True)
+    if not any(
+        path.exists()
+        for path in [
+            paths["jobs"] / f"{job_id}.json",
+            paths["claimed"] / f"{job_id}.json",
+            paths["results"] / job_id / "result.json",
+        ]
+    ):
+        trace_generator.atomic_write(
+            paths["jobs"] / f"{job_id}.json", json.dumps(job).encode()
+        )
+    return job_id
+
+
+def job_result(spool_dir: Path, job_id: str) -> dict[int, list[bytes]] | None:
+    """Return the images of a finished job, or None if it hasn't finished yet.
+
+    Return:
+        Mapping from a breakpoint line to its images. There is one image per line unless the job
+        set render_all_breakpoint_occurrences.
+    """
+    result_dir = spool_dir / "results" / job_id
+    try:
+        result: JobResult = json.loads((result_dir / "result.json").read_text())
+    except FileNotFoundError:
+        if (spool_dir / "failed" / f"{job_id}.json").exists():
+            raise Exception(f"Job {job_id} failed: its workers died too many times")
+        return None
+    if "error" in result:
+        raise Exception(f"Job {job_id} failed: {result['error']}")
+    return {
+        int(line): [(result_dir / name).read_bytes() for name in names]
+        for line, names in result["images"].items()
+    }
+
+
+def wait_for_result(
+    spool_dir: Path,
+    job_id: str,
+    *,
+    timeout_secs: float | None = None,
+    poll_secs: float = 0.5,
+) -> dict[int, list[bytes]]:
+    """Wait for a job to finish and return its images. See ``job_result``."""
+    deadline = None if timeout_secs is None else time.monotonic() + timeout_secs
+    while (images := job_result(spool_dir, job_id)) is None:
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Job {job_id} did not finish in time")
+        time.sleep(poll_secs)
+    return images
+
+
+def requeue_expired_jobs(
+    spool_dir: Path, *, lease_secs: float = 60, max_attempts: int = 3
+) -> int:
+    """Put jobs whose workers stopped renewing their lease back into the queue.
+
+    Jobs that have already been attempted ``max_attempts`` times are moved to ``failed/``
+    instead.
+
+    Return:
+        The number of jobs requeued or failed.
+    """
+    paths = _spool_paths(spool_dir)
+    now = time.time()
+    expired_count = 0
+    for claimed_path in paths["claimed"].glob("*.json"):
+        try:
+            if now - claimed_path.stat().st_mtime < lease_secs:
+                continue
+            attempts = json.loads(claimed_path.read_text())["attempts"]
+            target = "failed" if attempts >= max_attempts else "jobs"
+            # only one of the workers noticing the expired lease wins the rename
+            os.rename(claimed_path, paths[target] / claimed_path.name)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        logger.info(f"Lease of job {claimed_path.stem} expired, moved to {target}")
+        expired_count += 1
+    return expired_count
+
+
+def claim_job(spool_dir: Path) -> tuple[str, RenderJob] | None:
+    """Claim the oldest waiting job of a spool directory, or return None if there is none.
+
+    The claimed job's ``claim`` is set to a token unique to this claim, see ``holds_claim``.
+    """
+    paths = _spool_paths(spool_dir)
+    waiting: list[tuple[float, Path]] = []
+    for job_path in paths["jobs"].glob("*.json"):
+        try:
+            waiting.append((job_path.stat().st_mtime, job_path))
+        except FileNotFoundError:
+            # claimed by another worker in the meantime
+            continue
+    waiting.sort()
+    for _, job_path in waiting:
+        claimed_path = paths["claimed"] / job_path.name
+        try:
+            # start the lease before the job shows up as claimed, and only one worker wins the
+            # rename
+            os.utime(job_path)
+            os.rename(job_path, claimed_path)
+        except FileNotFoundError:
+            continue
+        job: RenderJob = json.loads(claimed_path.read_text())
+        job["attempts"] += 1
+        job["claim"] = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(8)}"
+        # also renews the lease
+        trace_generator.atomic_write(claimed_path, json.dumps(job).encode())
+        return job_path.stem, job
+    return None
+
+
+def holds_claim(spool_dir: Path, job_id: str, claim: str) -> bool:
+    """Return whether a job is still claimed with the given claim token (see ``claim_job``).
+
+    A worker's claim is lost once its lease expired, even if another worker claimed the job again
+    since then.
+    """
+    try:
+        job: RenderJob = json.loads(
+            (spool_dir / "claimed" / f"{job_id}.json").read_text()
+        )
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return job.get("claim") == claim
+
+
+def _renew_lease(
+    spool_dir: Path,
+    job_id: str,
+    claim: str,
+    interval_secs: float,
+    done: threading.Event,
+):
+    while not done.wait(interval_secs):
+        if not holds_claim(spool_dir, job_id, claim):
+            # the lease expired, and the job was requeued or another worker took it over
+            logger.info(f"Lost the claim on job {job_id}")
+            return
+        try:
+            os.utime(spool_dir / "claimed" / f"{job_id}.json")
+        except FileNotFoundError:
+            return
+
+
+def _write_result(result_dir: Path, images: dict, format: str) -> JobResult:
+    extension = format.lower()
+    result = JobResult(images={})
+    for line, line_images in sorted(images.items()):
+        if not isinstance(line_images, list):
+            line_images = [line_images]
+        names = []
+        for occurrence, image in enumerate(line_images, start=1):
+            name = (
+                f"{line}.{extension}"
+                if len(line_images) == 1
+                else f"{line}-{occurrence}.{extension}"
+            )
+            trace_generator.atomic_write(result_dir / name, image)
+            names.append(name)
+        result["images"][str(line)] = names
+    return result
+
+
+def process_job(
+    spool_dir: Path,
+    job_id: str,
+    job: RenderJob,
+    *,
+    java_home: Path | None = None,
+    limits: trace_generator.TracerLimits | None = None,
+    lease_secs: float = 60,
+) -> None:
+    """Render a claimed job (see ``claim_job``) and publish its result.
+
+    The lease is renewed in the background while rendering. Rendering errors are recorded in the
+    job's result rather than retried, since they'd happen again on any other worker. If the claim
+    was lost in the meantime (see ``holds_claim``), nothing is published and the job is left to
+    the worker that holds it.
+    """
+    claimed_path = spool_dir / "claimed" / f"{job_id}.json"
+    result_dir = spool_dir / "results" / job_id
+    claim = job["claim"]
+
+    done = threading.Event()
+    renewer = threading.Thread(
+        target=_renew_lease,
+        args=(spool_dir, job_id, claim, lease_secs / 4, done),
+        daemon=True,
+    )
+    renewer.start()
+    try:
+        try:
+            images = render_images(
+                job["java_source"],
+                set(job["breakpoints"]),
+                java_home=java_home,
+                limits=limits,
+                **job["options"],
+            )
+            error = None
+        except Exception as exc:
+            logger.debug(f"Job {job_id} failed", exc_info=True)
+            error = str(exc)
+        if not holds_claim(spool_dir, job_id, claim):
+            logger.info(f"Lost the claim on job {job_id}, dropping its result")
+            return
+        if error is None:
+            result = _write_result(
+                result_dir, images, job["options"].get("format", "PNG")
+            )
+        else:
+            result = JobResult(error=error)
+        result["worker"] = claim
+        trace_generator.atomic_write(
+            result_dir / "result.json", json.dumps(result).encode()
+        )
+    finally:
+        done.set()
+        renewer.join()
+    if holds_claim(spool_dir, job_id, claim):
+        claimed_path.unlink(missing_ok=True)
+
+
+def run_worker(
+    spool_dir: Path,
+    *,
+    java_home: Path | None = None,
+    limits: trace_generator.TracerLimits | None = None,
+    lease_secs: float = 60,
+    max_attempts: int = 3,
+    poll_secs: float = 1,
+    exit_when_idle: bool = False,
+) -> int:
+    """Render jobs from a spool directory until interrupted.
+
+    Any number of workers may share a spool directory. Jobs whose worker stopped renewing its
+    lease for ``lease_secs`` (e.g. because the worker or its machine died) are retried, up to
+    ``max_attempts`` attempts in total.
+
+    Args:
+        spool_dir: The shared spool directory.
+        java_home: A path to a JDK 21+ installation home. If not provided, a JDK will be fetched
+            automatically.
+        limits: Resource limits for the tracer of every job.
+        lease_secs: How long a job's lease lasts without being renewed.
+        max_attempts: How many workers may claim a job before it's considered failed.
+        poll_secs: How often to look for new jobs while idle.
+        exit_when_idle: Return once there are no jobs left instead of waiting for more.
+
+    Return:
+        The number of jobs processed.
+    """
+    if not (java_home and trace_generator.jdk_exists(java_home)):
+        java_home = trace_generator.ensure_jdk_installed()
+    trace_generator.ensure_code_tracer_installed()
+
+    processed_count = 0
+    try:
+        while True:
+            requeue_expired_jobs(
+                spool_dir, lease_secs=lease_secs, max_attempts=max_attempts
+            )
+            claimed = claim_job(spool_dir)
+            if claimed is None:
+                if exit_when_idle and not any((spool_dir / "claimed").iterdir()):
+                    break
+                time.sleep(poll_secs)
+                continue
+            job_id, job = claimed
+            logger.info(f"Rendering job {job_id} (attempt {job['attempts']})")
+            process_job(
+                spool_dir,
+                job_id,
+                job,
+                java_home=java_home,
+                limits=limits,
+                lease_secs=lease_secs,
+            )
+            processed_count += 1
+    except KeyboardInterrupt:
+        pass
+    return processed_count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render jobs through a spool directory shared by any number of workers"
+    )
+
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        help="Enable output from logger.",
+        action="store_true",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser(
+        "submit",
+        help="Submit the Java program on standard input and print the job id.",
+    )
+    submit_parser.add_argument("spool", type=Path, help="The spool directory.")
+    submit_parser.add_argument(
+        "--breakpoint",
+        "-b",
+        help="A breakpoint line number. Can be given more than once.",
+        type=int,
+        action="append",
+    )
+    submit_parser.add_argument(
+        "--dpi",
+        help="A positive, integer multiplicative factor for the image resolution.",
+        type=int,
+        default=1,
+    )
+    submit_parser.add_argument(
+        "--format",
+        "-f",
+        help="The image format, e.g. PNG or WEBP.",
+        default="PNG",
+    )
+    submit_parser.add_argument(
+        "--wait",
+        help="Wait for the job and print a JSON object mapping each line to its image paths.",
+        action="store_true",
+    )
+
+    work_parser = subparsers.add_parser("work", help="Render jobs until interrupted.")
+    work_parser.add_argument("spool", type=Path, help="The spool directory.")
+    work_parser.add_argument(
+        "--lease",
+        help="Seconds a job stays claimed by a worker that stopped responding.",
+        type=float,
+        default=60,
+    )
+    work_parser.add_argument(
+        "--max-attempts",
+        help="Number of times a job is attempted before it's considered failed.",
+        type=int,
+        default=3,
+    )
+    work_parser.add_argument(
+        "--exit-when-idle",
+        help="Exit once there are no jobs left.",
+        action="store_true",
+    )
+    work_parser.add_argument(
+        "--jdk",
+        help=(
+            "Path to the home of a JDK 21+ installation. If not provided, "
+            "the script will attempt to download one itself."
+        ),
+    )
+    trace_generator.add_limit_arguments(work_parser)
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+
+    if args.command == "submit":
+        job_id = submit_job(
+            args.spool,
+            sys.stdin.read(),
+            set(args.breakpoint or [-1]),
+            dpi=args.dpi,
+            format=args.format,
+        )
+        if not args.wait:
+            print(job_id)
+            return
+        try:
+            wait_for_result(args.spool, job_id)
+        except Exception as exc:
+            print(exc, file=sys.stderr)
+            exit(1)
+        result_dir = args.spool / "results" / job_id
+        result: JobResult = json.loads((result_dir / "result.json").read_text())
+        print(
+            json.dumps(
+                {
+                    line: [str(result_dir / name) for name in names]
+                    for line, names in result["images"].items()
+                }
+            )
+        )
+    else:
+        java_home = Path(args.jdk) if args.jdk is not None else None
+        processed_count = run_worker(
+            args.spool,
+            java_home=java_home,
+            limits=trace_generator.limits_from_args(args),
+            lease_secs=args.lease,
+            max_attempts=args.max_attempts,
+            exit_when_idle=args.exit_when_idle,
+        )
+        print(f"Processed {processed_count} jobs", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+
+import argparse
+import gzip
+import json
+import logging
+import struct
+import sys
+import time
+
+from pathlib import Path
+from typing import Any
+
+try:
+    # Python 3.14+
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# A compact trace is MAGIC, a compression byte (see COMPRESSIONS) and the compressed body. The
+# body is a table of the trace's distinct strings, most frequent first, followed by the trace
+# itself as tagged values that refer to strings by their index in the table. Strings holding a
+# decimal integer as str(int) would write it (heap object ids, which key the heap of every step)
+# are stored as integers instead. Every list and dict gets an id in the order its encoding ends,
+# and a list or dict equal to an earlier one (e.g. a heap object or stack frame that didn't
+# change between steps) is stored as a reference to that id, so the decoder also builds it only
+# once.
+MAGIC: bytes = b"CVT1"
+
+COMPRESSIONS: dict[str, int] = {"none": 0, "gzip": 1, "zstd": 2}
+
+TAG_NULL = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STRING = 5
+TAG_LIST = 6
+TAG_DICT = 7
+TAG_INT_STRING = 8
+TAG_BACKREF = 9
+
+_float = struct.Struct("<d")
+
+
+def default_compression() -> str:
+    """Return ``zstd`` if a zstd module is available, and ``gzip`` otherwise."""
+    return "zstd" if zstd is not None else "gzip"
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _is_int_string(value: str) -> bool:
+    # not just any string int() accepts: "-0", "007" or "+1" wouldn't be decoded to the same string
+    if not "0" <= value[-1:] <= "9":
+        return False
+    try:
+        return str(int(value)) == value
+    except ValueError:
+        return False
+
+
+def _count_strings(value: Any, counts: dict[str, int]) -> None:
+    if isinstance(value, str):
+        if not _is_int_string(value):
+            counts[value] = counts.get(value, 0) + 1
+    elif isinstance(value, list):
+        for item in value:
+            _count_strings(item, counts)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _count_strings(key, counts)
+            _count_strings(item, counts)
+
+
+def _encode_value(
+    value: Any,
+    out: bytearray,
+    string_ids: dict[str, int],
+    composites: dict[tuple, int],
+) -> tuple:
+    """Append the encoding of ``value`` to ``out``.
+
+    Return a key that is equal for values with equal encodings. The key of a list or dict is made
+    of the keys of its items, and the key of an encoded list or dict is its id, so equal lists and
+    dicts are found without comparing their whole encodings.
+    """
+    if isinstance(value, str):
+        if _is_int_string(value):
+            out.append(TAG_INT_STRING)
+            _write_varint(out, _zigzag(int(value)))
+            return (TAG_INT_STRING, value)
+        string_id = string_ids[value]
+        out.append(TAG_STRING)
+        _write_varint(out, string_id)
+        return (TAG_STRING, string_id)
+    elif value is None:
+        out.append(TAG_NULL)
+        return (TAG_NULL,)
+    elif value is True:
+        out.append(TAG_TRUE)
+        return (TAG_TRUE,)
+    elif value is False:
+        out.append(TAG_FALSE)
+        return (TAG_FALSE,)
+    elif isinstance(value, int):
+        out.append(TAG_INT)
+        _write_varint(out, _zigzag(value))
+        return (TAG_INT, value)
+    elif isinstance(value, float):
+        data = _float.pack(value)
+        out.append(TAG_FLOAT)
+        out += data
+        # by the packed value, since 0.0 == -0.0
+        return (TAG_FLOAT, data)
+    elif isinstance(value, (list, dict)):
+        start = len(out)
+        if isinstance(value, list):
+            out.append(TAG_LIST)
+            _write_varint(out, len(value))
+            items = [TAG_LIST]
+            for item in value:
+                items.append(_encode_value(item, out, string_ids, composites))
+        else:
+            out.append(TAG_DICT)
+            _write_varint(out, len(value))
+            items = [TAG_DICT]
+            for item_key, item in value.items():
+                items.append(_encode_value(item_key, out, string_ids, composites))
+                items.append(_encode_value(item, out, string_ids, composites))
+        key = tuple(items)
+        composite_id = composites.get(key)
+        if composite_id is None:
+            composite_id = composites[key] = len(composites)
+        else:
+            # the lists and dicts in it are references already, since they are equal to those of
+            # the earlier one, so this drops little more than the tags of its items
+            del out[start:]
+            out.append(TAG_BACKREF)
+            _write_varint(out, composite_id)
+        return (TAG_BACKREF, composite_id)
+    else:
+        raise Exception(f"Unable to encode a {type(value).__name__} in a trace")
+
+
+def encode_trace(trace: str, compression: str | None = None) -> bytes:
+    """Convert a JSON trace (e.g. from ``generate_trace``) to the compact trace format.
+
+    Args:
+        trace: The JSON trace.
+        compression: ``zstd``, ``gzip`` or ``none``. Defaults to ``default_compression()``.
+
+    Return:
+        The compact trace.
+    """
+    compression = compression or default_compression()
+    if compression == "zstd" and zstd is None:
+        raise Exception(
+            "zstd compression requires Python 3.14+ or the zstandard package"
+        )
+
+    value = json.loads(trace)
+
+    counts: dict[str, int] = {}
+    _count_strings(value, counts)
+    strings = sorted(counts, key=lambda string: -counts[string])
+
+    body = bytearray()
+    _write_varint(body, len(strings))
+    for string in strings:
+        # Java chars and strings may hold lone surrogates, which JSON escapes as e.g. "\ud800"
+        data = string.encode("utf-8", "surrogatepass")
+        _write_varint(body, len(data))
+        body += data
+    _encode_value(
+        value, body, {string: i for i, string in enumerate(strings)}, composites={}
+    )
+
+    match compression:
+        case "zstd":
+            payload = zstd.compress(bytes(body))
+        case "gzip":
+            payload = gzip.compress(bytes(body), mtime=0)
+        case "none":
+            payload = bytes(body)
+        case _:
+            raise Exception(f"Unknown trace compression: {compression}")
+
+    return MAGIC + bytes([COMPRESSIONS[compression]]) + payload
+
+
+def is_compact_trace(data: bytes) -> bool:
+    """Return whether ``data`` is a trace in the compact format."""
+    return data[: len(MAGIC)] == MAGIC
+
+
+def decode_trace(data: bytes) -> str:
+    """Convert a compact trace back to the JSON produced by ``generate_trace``."""
+    if not is_compact_trace(data):
+        raise Exception("Not a compact trace")
+
+    payload = data[len(MAGIC) + 1 :]
+    match data[len(MAGIC)]:
+        case 2:
+            if zstd is None:
+                raise Exception(
+                    "Reading zstd compressed traces requires Python 3.14+ or the zstandard "
+                    "package"
+                )
+            body = zstd.decompress(payload)
+        case 1:
+            body = gzip.decompress(payload)
+        case 0:
+            body = payload
+        case compression:
+            raise Exception(f"Unknown trace compression: {compression}")
+
+    position = 0
+
+    def read_varint() -> int:
+        nonlocal position
+        result = 0
+        shift = 0
+        while True:
+            byte = body[position]
+            position += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def read_zigzag() -> int:
+        value = read_varint()
+        return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+    strings: list[str] = []
+    for _ in range(read_varint()):
+        length = read_varint()
+        strings.append(
+            body[position : position + length].decode("utf-8", "surrogatepass")
+        )
+        position += length
+
+    # decoded lists and dicts, shared by every reference to them
+    composites: list[Any] = []
+
+    def read_value() -> Any:
+        nonlocal position
+        tag = body[position]
+        position += 1
+        if tag == TAG_STRING:
+            return strings[read_varint()]
+        if tag == TAG_BACKREF:
+            return composites[read_varint()]
+        if tag == TAG_INT_STRING:
+            return str(read_zigzag())
+        if tag == TAG_INT:
+            return read_zigzag()
+        if tag == TAG_DICT:
+            value = {read_value(): read_value() for _ in range(read_varint())}
+            composites.append(value)
+            return value
+        if tag == TAG_LIST:
+            value = [read_value() for _ in range(read_varint())]
+            composites.append(value)
+            return value
+        if tag == TAG_NULL:
+            return None
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_FLOAT:
+            (value,) = _float.unpack_from(body, position)
+            position += _float.size
+            return value
+        raise Exception(f"Corrupt trace: unknown value tag {tag}")
+
+    return json.dumps(read_value())
+
+
+def read_trace(data: bytes | str) -> str:
+    """Return the JSON of a trace in either format."""
+    if isinstance(data, bytes):
+        return decode_trace(data) if is_compact_trace(data) else data.decode()
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert traces between JSON and the compact trace format"
+    )
+
+    parser.add_argument(
+        "--input",
+        "-i",
+        help="Trace to convert (in either format), or `-` for stdin.",
+        default="-",
+    )
+
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="Output path. If not provided, the trace is written to standard output.",
+    )
+
+    parser.add_argument(
+        "--to",
+        help="Output format. Defaults to the format the input isn't in.",
+        choices=["json", "compact"],
+    )
+
+    parser.add_argument(
+        "--compression",
+        help="Compression of compact traces. Defaults to zstd if available, gzip otherwise.",
+        choices=list(COMPRESSIONS),
+    )
+
+    parser.add_argument(
+        "--stats",
+        help=(
+            "Print the size of each format and the time to convert between them, and check "
+            "that the compact trace decodes to the same JSON."
+        ),
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+
+    if args.input == "-":
+        data = sys.stdin.buffer.read()
+    else:
+        data = Path(args.input).read_bytes()
+
+    to = args.to or ("json" if is_compact_trace(data) else "compact")
+
+    start = time.perf_counter()
+    trace = read_trace(data)
+    read_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    if to == "compact":
+        output = encode_trace(trace, args.compression)
+    else:
+        output = trace.encode()
+    write_ms = (time.perf_counter() - start) * 1000
+
+    if args.stats:
+        compact = output if to == "compact" else data
+        start = time.perf_counter()
+        decoded = decode_trace(compact)
+        decode_ms = (time.perf_counter() - start) * 1000
+        if decoded != json.dumps(json.loads(trace)):
+            raise Exception("The compact trace doesn't decode to the same JSON")
+        # strings that aren't valid UTF-8, like the value of a Java char '\uD800', must survive too
+        surrogates = json.dumps({"value": "\ud800", "text": "a\udfffb"})
+        if decode_trace(encode_trace(surrogates, "none")) != surrogates:
+            raise Exception("Lone surrogates don't survive the compact trace format")
+        json_size = len(trace.encode())
+        print(
+            f"json: {json_size} bytes, compact: {len(compact)} bytes "
+            f"({len(compact) / json_size:.1%}), decode: {decode_ms:.1f} ms, "
+            f"read: {read_ms:.1f} ms, write: {write_ms:.1f} ms",
+            file=sys.stderr,
+        )
+
+    if args.output is None:
+        sys.stdout.buffer.write(output)
+    else:
+        Path(args.output).write_bytes(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import fileinput
+import io
+import functools
 import tomllib
 import hashlib
 import socket
@@ -17,11 +19,33 @@ import platformdirs
 import requests
 import zipfile
 import tarfile
+import threading
+import time
+import math
+import signal
 
 from subprocess import CalledProcessError
 from pathlib import Path
 from halo import Halo as spinner
 from os import PathLike
+from contextlib import contextmanager
+from typing import Iterable, Iterator, TypedDict
+
+from . import process_usage
+from . import trace_format
+from . import watch
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
 
 
 logger: logging.Logger = logging.getLogger(__name__)
@@ -36,16 +60,505 @@ cache_dir: Path = Path(
 )
 
 
-def generate_trace(
-    java_home: Path,
+# JVM options that favor a fast startup over peak throughput. Traces are short-lived, so most of
+# their wall time is spent loading classes and warming up the JIT rather than running code.
+STARTUP_JVM_OPTIONS: list[str] = [
+    "-XX:TieredStopAtLevel=1",
+    "-XX:+UseSerialGC",
+    "-Xms16m",
+    "-Xss1m",
+]
+
+# Small program used to exercise the tracer (and the compiler classes it uses) while dumping the
+# class data sharing archive.
+CDS_TRAINING_PROGRAM: str = """
+public class Main {
+    public static void main(String[] args) {
+        java.util.List<String> names = new java.util.ArrayList<>();
+        names.add("Alice");
+        int[] ages = { 42 };
+        System.out.println(names + " " + ages[0]);
+    }
+}
+"""
+
+# CDS archives that haven't been used for this long are removed when another archive is created.
+# Archives are kept per JDK, so this bounds how long those of JDKs no longer in use stay around.
+CDS_ARCHIVE_MAX_AGE_SECS: float = 30 * 24 * 60 * 60
+
+
+@functools.cache
+def _file_sha256(path: Path, mtime_ns: int, size: int) -> str:
+    # mtime_ns and size are part of the cache key so a replaced file is hashed again
+    sha256_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+def file_sha256(path: str | PathLike[str]) -> str:
+    """Return the SHA256 sum of a file, memoized for as long as the file is unchanged."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    return _file_sha256(path, stat.st_mtime_ns, stat.st_size)
+
+
+def cds_archive_path(java_home: Path) -> Path:
+    """Return the class data sharing archive path for a JDK and the installed tracer JAR.
+
+    The file name is derived from the checksums of the JDK's ``java`` executable, its ``release``
+    file and its ``lib/modules`` image, followed by the checksum of the tracer JAR, so updating
+    either one automatically selects a new archive.
+    """
+    jdk_key = hashlib.sha256()
+    java_exe = java_home / "bin" / "java"
+    jdk_key.update(file_sha256(java_exe).encode())
+    for jdk_file in [java_home / "release", java_home / "lib" / "modules"]:
+        if jdk_file.is_file():
+            # lib/modules is large, so only its identity is hashed rather than its contents
+            stat = jdk_file.stat()
+            jdk_key.update(
+                f"{jdk_file.name}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+            )
+    tracer_key = file_sha256(cache_dir / "code-tracer.jar")
+    return (
+        cache_dir
+        / "cds"
+        / f"code-tracer-{jdk_key.hexdigest()[:16]}-{tracer_key[:16]}.jsa"
+    )
+
+
+def _prune_cds_archives(archive_path: Path) -> None:
+    # archives of earlier tracers for the same JDK, and of any JDK or tracer if they are unused
+    jdk_prefix = archive_path.name.rsplit("-", 1)[0] + "-"
+    now = time.time()
+    for stale_archive in archive_path.parent.glob("code-tracer-*.jsa"):
+        if stale_archive == archive_path:
+            continue
+        try:
+            unused_secs = now - stale_archive.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if (
+            stale_archive.name.startswith(jdk_prefix)
+            or unused_secs > CDS_ARCHIVE_MAX_AGE_SECS
+        ):
+            stale_archive.unlink(missing_ok=True)
+
+
+def ensure_cds_archive(java_home: Path, timeout_secs: float | None = 60) -> Path | None:
+    """Build the tracer's class data sharing archive, if one doesn't exist yet.
+
+    The archive is dumped by running the tracer on a small training program with
+    ``-XX:ArchiveClassesAtExit``. Archives of other tracers for the same JDK are then removed,
+    as are archives that haven't been used for ``CDS_ARCHIVE_MAX_AGE_SECS`` (other JDKs may
+    still be in use, e.g. by other projects sharing the cache).
+
+    Returns the path to the archive, or None if it could not be created (in which case the tracer
+    should be launched without one).
+    """
+    archive_path = cds_archive_path(java_home)
+    try:
+        # the mtime of an archive tells when it was last used, refreshed about once a day
+        if time.time() - archive_path.stat().st_mtime > 24 * 60 * 60:
+            os.utime(archive_path)
+        return archive_path
+    except FileNotFoundError:
+        pass
+
+    with cache_lock("cds"):
+        if archive_path.is_file():
+            return archive_path
+
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = archive_path.with_suffix(f".{os.getpid()}.tmp")
+
+        try:
+            subprocess.run(
+                [
+                    str(java_home / "bin" / "java"),
+                    f"-XX:ArchiveClassesAtExit={temp_path}",
+                    *STARTUP_JVM_OPTIONS,
+                    "-jar",
+                    str(cache_dir / "code-tracer.jar"),
+                    "trace",
+                ],
+                input=CDS_TRAINING_PROGRAM,
+                timeout=timeout_secs,
+                text=True,
+                capture_output=True,
+                check=True,
+            )
+            if not temp_path.is_file():
+                raise Exception("the JVM exited without writing a CDS archive")
+            os.replace(temp_path, archive_path)
+        except Exception:
+            logger.debug(
+                "Unable to create a CDS archive for the code tracer", exc_info=True
+            )
+            temp_path.unlink(missing_ok=True)
+            return None
+
+        _prune_cds_archives(archive_path)
+
+        logger.debug(f"Created CDS archive at {archive_path}")
+        return archive_path
+
+
+class TracerLimits(TypedDict, total=False):
+    """Per-run resource limits for the code tracer. Every key is optional.
+
+    max_heap_mb:      Maximum Java heap size of the tracer JVM (``-Xmx``), in megabytes.
+    max_memory_mb:    Maximum data segment size (``RLIMIT_DATA``) of each process in the tracer's
+                      process tree, in megabytes. Ignored on platforms without
+                      ``resource.prlimit`` (only Linux has it).
+    cpu_time_secs:    Maximum CPU time (``RLIMIT_CPU``) of each process in the tracer's process
+                      tree, in seconds. Ignored on platforms without ``resource.prlimit``.
+    max_processors:   Number of processors the JVM assumes it may use
+                      (``-XX:ActiveProcessorCount``), which bounds its GC and compiler threads.
+    max_output_bytes: Maximum size of the trace read from the tracer's standard output. The tracer
+                      is killed once its output exceeds this size.
+    """
+
+    max_heap_mb: int
+    max_memory_mb: int
+    cpu_time_secs: float
+    max_processors: int
+    max_output_bytes: int
+
+
+def tracer_jvm_options(limits: TracerLimits) -> list[str]:
+    """Return the JVM options that enforce the JVM-side parts of ``limits``."""
+    jvm_options: list[str] = []
+    if "max_heap_mb" in limits:
+        jvm_options.append(f"-Xmx{limits['max_heap_mb']}m")
+    if "max_processors" in limits:
+        jvm_options.append(f"-XX:ActiveProcessorCount={limits['max_processors']}")
+    return jvm_options
+
+
+def _os_rlimits(limits: TracerLimits) -> list[tuple[int, int]]:
+    if resource is None:
+        return []
+    rlimits: list[tuple[int, int]] = []
+    if "max_memory_mb" in limits:
+        rlimits.append((resource.RLIMIT_DATA, limits["max_memory_mb"] * 2**20))
+    if "cpu_time_secs" in limits:
+        rlimits.append((resource.RLIMIT_CPU, math.ceil(limits["cpu_time_secs"])))
+    return rlimits
+
+
+def _kill_process_tree(process: subprocess.Popen) -> None:
+    """Kill a process started by run_tracer along with every process in its process group.
+
+    The process must not have been reaped yet, or its pid (the group's id) may have been reused.
+    Windows has no process groups to kill, so there the tree is found by ``taskkill /T`` from the
+    parent of each process, which only works while the tracer itself is still running.
+    """
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    elif process.poll() is None:
+        subprocess.run(
+            ["taskkill", "/T", "/F", "/PID", str(process.pid)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        process.kill()
+
+
+def start_tracer(
+    command: list[str],
+    limits: TracerLimits | None = None,
+) -> subprocess.Popen:
+    """Start a tracer command in its own process group without giving it any input yet.
+
+    The JVM boots while the tracer waits for the Java program on standard input, which lets
+    callers start a tracer ahead of time (see ``WarmTracer``). Use ``finish_tracer`` to run it.
+
+    Args:
+        command: The full tracer command line (see ``tracer_command``).
+        limits: OS-level limits for the run. JVM options are expected to already be part of
+            ``command``.
+    """
+    rlimits = _os_rlimits(limits or {})
+    if rlimits and not hasattr(resource, "prlimit"):
+        logger.warning(
+            "Memory and CPU time limits of the tracer aren't supported on this platform"
+        )
+        rlimits = []
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        start_new_session=os.name == "posix",
+        creationflags=(subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0),
+    )
+
+    # set on the running process rather than in a preexec_fn, since running Python code between
+    # fork and exec is unsafe when other threads are rendering concurrently. The JVM hasn't
+    # forked anything this early, and its children inherit the limits.
+    for rlimit, value in rlimits:
+        resource.prlimit(process.pid, rlimit, (value, value))
+
+    return process
+
+
+def finish_tracer(
+    process: subprocess.Popen,
     java_program: str,
     timeout_secs: float | None = None,
+    limits: TracerLimits | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> str:
+    """Pass a Java program to a tracer started by ``start_tracer`` and return its standard output.
+
+    The tracer's process group is always killed once the tracer finishes, times out or exceeds its
+    output limit, so no JVM spawned by it outlives the call. On Windows, where there are no process
+    groups, the processes the tracer started are only killed with it on a timeout or when the
+    output limit is exceeded; those still running after the tracer exits on its own are left alone.
+
+    Args:
+        process: The tracer process.
+        java_program: The Java source code passed to the tracer on standard input.
+        timeout_secs: Maximum wall time of the tracer run (from now on), or no limit if None.
+        limits: The output-size limit for the run.
+        usage: If given, the resources used by the tracer's process tree during the run are
+            sampled and appended to this list (see ``process_usage.ProcessUsage``).
+
+    Raises:
+        subprocess.TimeoutExpired: If the tracer didn't finish within ``timeout_secs``.
+        subprocess.CalledProcessError: If the tracer exited with a non-zero exit code.
+        Exception: If the tracer's output exceeded ``limits["max_output_bytes"]``.
+    """
+    limits = limits or {}
+    timed_out = threading.Event()
+
+    # the process group may only be killed until the tracer is reaped, after which its id may be
+    # reused
+    kill_lock = threading.Lock()
+    reaped = False
+    rusage = None
+
+    def kill():
+        with kill_lock:
+            if not reaped:
+                _kill_process_tree(process)
+
+    def reap() -> int:
+        nonlocal reaped, rusage
+        with kill_lock:
+            # also kills anything the tracer left behind in its process group
+            _kill_process_tree(process)
+            if hasattr(os, "wait4"):
+                # the resource usage covers the JVMs the tracer reaped itself, which sampling
+                # misses
+                _, status, rusage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+            returncode = process.wait()
+            reaped = True
+        return returncode
+
+    def on_timeout():
+        timed_out.set()
+        kill()
+
+    timer = (
+        threading.Timer(timeout_secs, on_timeout) if timeout_secs is not None else None
+    )
+
+    def write_input():
+        try:
+            process.stdin.write(java_program.encode())
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    max_output_bytes = limits.get("max_output_bytes")
+    output = bytearray()
+    output_exceeded = False
+
+    # read concurrently with waiting for the tracer, since a process it started may keep the pipe
+    # open after it exits, until its group is killed
+    def read_output():
+        nonlocal output_exceeded
+        while chunk := process.stdout.read1(2**16):
+            output.extend(chunk)
+            if max_output_bytes is not None and len(output) > max_output_bytes:
+                output_exceeded = True
+                kill()
+                break
+
+    writer = threading.Thread(target=write_input, daemon=True)
+    reader = threading.Thread(target=read_output, daemon=True)
+
+    try:
+        with process_usage.sample_process_tree(process.pid, "tracer", usage) as sampler:
+            if timer is not None:
+                timer.start()
+            writer.start()
+            reader.start()
+            if hasattr(os, "waitid"):
+                # wait for the tracer to exit without reaping it, so that its group can still be
+                # killed
+                os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            else:
+                process.wait()
+            returncode = reap()
+            if sampler is not None and rusage is not None:
+                sampler.record_exit(rusage)
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if not reaped:
+            reap()
+        reader.join()
+        process.stdout.close()
+        writer.join()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(
+            process.args, timeout_secs, output=bytes(output)
+        )
+    if output_exceeded:
+        raise Exception(f"Tracer output exceeded the limit of {max_output_bytes} bytes")
+    if returncode != 0:
+        raise CalledProcessError(returncode, process.args, output=output.decode())
+
+    return output.decode()
+
+
+def run_tracer(
+    command: list[str],
+    java_program: str,
+    timeout_secs: float | None = None,
+    limits: TracerLimits | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> str:
+    """Run a tracer command on a Java program and return its standard output.
+
+    The tracer runs in its own process group (session), which is always killed once the tracer
+    finishes, times out or exceeds its output limit, so no JVM spawned by it outlives the call.
+
+    Args:
+        command: The full tracer command line (see ``tracer_command``).
+        java_program: The Java source code passed to the tracer on standard input.
+        timeout_secs: Maximum wall time of the tracer run, or no limit if None.
+        limits: OS-level and output-size limits for the run. JVM options are expected to already
+            be part of ``command``.
+        usage: If given, the resources used by the tracer's process tree are sampled and appended
+            to this list (see ``process_usage.ProcessUsage``).
+
+    Raises:
+        subprocess.TimeoutExpired: If the tracer didn't finish within ``timeout_secs``.
+        subprocess.CalledProcessError: If the tracer exited with a non-zero exit code.
+        Exception: If the tracer's output exceeded ``limits["max_output_bytes"]``.
+    """
+    return finish_tracer(
+        start_tracer(command, limits),
+        java_program,
+        timeout_secs,
+        limits,
+        usage,
+    )
+
+
+class WarmTracer:
+    """A tracer command that always has a process booted and waiting for its next input.
+
+    Each run hands the Java program to the waiting process and then starts the next one, so the
+    JVM startup of a run overlaps with whatever the caller does in between (e.g. waiting for a
+    file to change in watch mode).
+    """
+
+    def __init__(
+        self,
+        command: list[str],
+        limits: TracerLimits | None = None,
+    ):
+        self.command: list[str] = command
+        self.limits: TracerLimits | None = limits
+        self.process: subprocess.Popen | None = start_tracer(command, limits)
+
+    def run(
+        self,
+        java_program: str,
+        timeout_secs: float | None = None,
+        usage: list[process_usage.ProcessUsage] | None = None,
+    ) -> str:
+        """Run the waiting tracer process on a Java program and return its standard output.
+
+        If ``usage`` is given, the run's resource usage is appended to it, see ``finish_tracer``.
+        """
+        process = self.process or start_tracer(self.command, self.limits)
+        self.process = None
+        try:
+            return finish_tracer(
+                process, java_program, timeout_secs, self.limits, usage
+            )
+        finally:
+            self.process = start_tracer(self.command, self.limits)
+
+    def close(self) -> None:
+        """Kill the waiting tracer process."""
+        if self.process is not None:
+            _kill_process_tree(self.process)
+            self.process.wait()
+            self.process.stdin.close()
+            self.process.stdout.close()
+            self.process = None
+
+    def __enter__(self) -> "WarmTracer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def tracer_command(
+    java_home: Path,
+    *,
+    use_cds: bool = True,
+    limits: TracerLimits | None = None,
+) -> list[str]:
+    """Return the command line prefix used to launch the code tracer JAR.
+
+    Args:
+        java_home: The home of the JDK used to run the tracer.
+        use_cds: If True, launch the tracer with a class data sharing archive (created on first use)
+            and startup-oriented JVM options.
+        limits: Resource limits whose JVM options should be included in the command.
+    """
+    jvm_options: list[str] = []
+    if use_cds:
+        jvm_options += STARTUP_JVM_OPTIONS
+        if archive_path := ensure_cds_archive(java_home):
+            jvm_options += [f"-XX:SharedArchiveFile={archive_path}", "-Xshare:auto"]
+    if limits:
+        jvm_options += tracer_jvm_options(limits)
+
+    return [
+        str(java_home / "bin" / "java"),
+        *jvm_options,
+        "-jar",
+        str(cache_dir / "code-tracer.jar"),
+    ]
+
+
+def trace_arguments(
     inline_strings: bool = True,
     remove_main_args_parameter: bool = True,
     breakpoints: set[int] = set(),
     accumulate_breakpoints: bool = False,
-) -> str:
-    args = ["-s"] if inline_strings else []
+) -> list[str]:
+    """Return the tracer's ``trace`` subcommand and its arguments for the given options."""
+    args = ["trace"]
+    if inline_strings:
+        args.append("-s")
     if breakpoints:
         args.append("-b")
     for breakpoint in breakpoints:
@@ -54,20 +567,34 @@ def generate_trace(
         args.append("--remove-main-args")
     if accumulate_breakpoints:
         args.append("--accumulate-breakpoints")
+    return args
 
-    return subprocess.check_output(
-        (
-            [
-                str(java_home / "bin" / "java"),
-                "-jar",
-                str(cache_dir / "code-tracer.jar"),
-                "trace",
-            ]
-            + args
-        ),
-        input=java_program,
-        timeout=timeout_secs,
-        text=True,
+
+def generate_trace(
+    java_home: Path,
+    java_program: str,
+    timeout_secs: float | None = None,
+    inline_strings: bool = True,
+    remove_main_args_parameter: bool = True,
+    breakpoints: set[int] = set(),
+    accumulate_breakpoints: bool = False,
+    use_cds: bool = True,
+    limits: TracerLimits | None = None,
+    usage: list[process_usage.ProcessUsage] | None = None,
+) -> str:
+    args = trace_arguments(
+        inline_strings,
+        remove_main_args_parameter,
+        breakpoints,
+        accumulate_breakpoints,
+    )
+
+    return run_tracer(
+        tracer_command(java_home, use_cds=use_cds, limits=limits) + args,
+        java_program,
+        timeout_secs,
+        limits,
+        usage,
     )
 
 
@@ -81,6 +608,231 @@ def jdk_exists(maybe_java_home: str | PathLike[str]) -> bool:
     )
 
 
+@contextmanager
+def cache_lock(name: str) -> Iterator[None]:
+    """Hold an exclusive lock on an entry of the cache directory.
+
+    The lock is a file lock on ``cache_dir/locks/<name>.lock``, so it serializes both threads and
+    processes (including ones on other machines sharing the cache over a file system that
+    supports locking). Installs happen while holding the lock, so concurrent workers wait for the
+    first one to finish instead of downloading the same files again.
+    """
+    lock_dir = cache_dir / "locks"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    with open(lock_dir / f"{name}.lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write a file by renaming a temporary file over it, so readers never see partial contents."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    ) as temp_file:
+        temp_file.write(data)
+    try:
+        os.replace(temp_file.name, path)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+
+
+# Size of the chunks read from download streams and archive files.
+DOWNLOAD_CHUNK_SIZE: int = 2**20
+
+# Number of times an interrupted download is resumed before giving up.
+DOWNLOAD_RETRIES: int = 3
+
+
+def mirror_dir() -> Path | None:
+    """Return the local mirror directory, if one is configured.
+
+    Offline machines can be provisioned from a shared directory (set through the
+    ``CS1302_CODE_VISUALIZER_MIRROR`` environment variable) containing any of:
+
+    - ``jdk-<os>-<arch>.tar.gz`` or ``jdk-<os>-<arch>.zip``: a JDK archive as published by
+      Adoptium, e.g. ``jdk-linux-x64.tar.gz``
+    - ``code-tracer.jar``: the tracer JAR
+
+    Each file may be accompanied by a ``<file>.sha256`` file holding its SHA256 sum, which is then
+    verified before the file is installed.
+    """
+    if mirror := os.environ.get("CS1302_CODE_VISUALIZER_MIRROR"):
+        return Path(mirror)
+    return None
+
+
+def _mirror_sha256(path: Path) -> str | None:
+    sum_path = path.with_name(path.name + ".sha256")
+    if sum_path.is_file():
+        return sum_path.read_text().split()[0].lower()
+    return None
+
+
+def download_chunks(
+    url: str,
+    part_path: Path,
+    sha256_hash: "hashlib._Hash",
+    response: requests.Response | None = None,
+) -> Iterator[bytes]:
+    """Yield the contents of ``url`` in large chunks, keeping a resumable copy in ``part_path``.
+
+    Bytes already in ``part_path`` (left over by an interrupted download) are yielded first, and the
+    rest is requested with an HTTP ``Range`` header. Dropped connections are resumed the same way
+    up to ``DOWNLOAD_RETRIES`` times. Every yielded chunk is also fed into ``sha256_hash``.
+
+    Args:
+        url: The URL to download.
+        part_path: The file that receives the downloaded bytes.
+        sha256_hash: A hash object updated with the downloaded bytes.
+        response: An already opened streaming response for ``url``, used instead of making the
+            first request if ``part_path`` is empty.
+    """
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(part_path, "ab+") as part_file:
+        part_file.seek(0)
+        while chunk := part_file.read(DOWNLOAD_CHUNK_SIZE):
+            sha256_hash.update(chunk)
+            yield chunk
+        offset = part_file.tell()
+
+        if offset:
+            logger.debug(f"Resuming download of {url} at byte {offset}")
+            if response is not None:
+                response.close()
+                response = None
+
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            if response is None:
+                response = requests.get(
+                    url,
+                    headers={"Range": f"bytes={offset}-"} if offset else {},
+                    stream=True,
+                    timeout=30,
+                )
+                if response.status_code == 416:
+                    # the part file already holds the whole download
+                    response.close()
+                    return
+            response.raise_for_status()
+
+            # servers that don't support ranges send the whole file again
+            skip = offset if offset and response.status_code != 206 else 0
+
+            try:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    if skip:
+                        skipped = min(skip, len(chunk))
+                        chunk, skip = chunk[skipped:], skip - skipped
+                        if not chunk:
+                            continue
+                    part_file.write(chunk)
+                    offset += len(chunk)
+                    sha256_hash.update(chunk)
+                    yield chunk
+                return
+            except (
+                requests.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+                logger.debug(f"Download of {url} interrupted, retrying", exc_info=True)
+                part_file.flush()
+            finally:
+                response.close()
+                response = None
+
+
+def download_part_path(name: str, key: str) -> Path:
+    """Return the resumable download file of ``name``, removing those of other versions of it.
+
+    ``key`` identifies what is downloaded, e.g. its expected SHA256 sum or its URL, so that a file
+    left over by an interrupted download of another version is never resumed into this one. Call
+    it while holding the cache lock of the download.
+    """
+    part_path = (
+        cache_dir / f"{name}.{hashlib.sha256(key.encode()).hexdigest()[:16]}.part"
+    )
+    for stale_path in [cache_dir / f"{name}.part", *cache_dir.glob(f"{name}.*.part")]:
+        if stale_path != part_path:
+            stale_path.unlink(missing_ok=True)
+    return part_path
+
+
+class ChunkStream(io.RawIOBase):
+    """A readable file object over an iterator of byte chunks, for streaming extraction."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks: Iterator[bytes] = iter(chunks)
+        self.buffer: bytes = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.buffer:
+            try:
+                self.buffer = next(self.chunks)
+            except StopIteration:
+                return 0
+        size = min(len(b), len(self.buffer))
+        b[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+def _file_chunks(path: Path, sha256_hash: "hashlib._Hash") -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            sha256_hash.update(chunk)
+            yield chunk
+
+
+def _adoptium_jdk_package(os: str, arch: str) -> dict:
+    resp = requests.get("https://api.adoptium.net/v3/info/available_releases")
+    resp.raise_for_status()
+
+    lts_jdk_num = resp.json()["most_recent_lts"]
+
+    # fall back to JDK 21 if the latest LTS isn't available for this platform
+    for jdk_num in [lts_jdk_num, "21"]:
+        resp = requests.get(
+            f"https://api.adoptium.net/v3/assets/latest/{jdk_num}/hotspot",
+            params={
+                "os": os,
+                "architecture": arch,
+                "image_type": "jdk",
+                "vendor": "eclipse",
+            },
+        )
+        if resp.status_code == 404:
+            continue
+        resp.raise_for_status()
+        if assets := resp.json():
+            return assets[0]["binary"]["package"]
+
+    raise Exception(f"Adoptium has no JDK release for {os} {arch}.")
+
+
 def download_jdk():
 
     if (cache_dir / "jdk").exists():
@@ -108,49 +860,68 @@ def download_jdk():
                 f"Cannot automatically download a JDK for your computer's architecture ({m} {os}). Please download and provide one yourself."
             )
 
-    resp = requests.get("https://api.adoptium.net/v3/info/available_releases")
-    resp.raise_for_status()
+    with cache_lock("jdk"):
+        # another process may have installed the JDK while we were waiting for the lock
+        if (cache_dir / "jdk").exists():
+            return
 
-    lts_jdk_num = resp.json()["most_recent_lts"]
+        archive_name = f"jdk-{os}-{arch}.{'zip' if os == 'windows' else 'tar.gz'}"
+        sha256_hash = hashlib.sha256()
 
-    resp = requests.get(
-        f"https://api.adoptium.net/v3/binary/latest/{lts_jdk_num}/ga/{os}/{arch}/jdk/hotspot/normal/eclipse",
-        stream=True,
-    )
+        mirror = mirror_dir()
+        if mirror and (mirror_archive := mirror / archive_name).is_file():
+            logger.debug(f"Installing the JDK from {mirror_archive}")
+            expected_sha256 = _mirror_sha256(mirror_archive)
+            part_path = download_part_path(archive_name, str(mirror_archive))
+            archive_path = mirror_archive
+            chunks = _file_chunks(mirror_archive, sha256_hash)
+        else:
+            package = _adoptium_jdk_package(os, arch)
+            expected_sha256 = package.get("checksum")
+            part_path = download_part_path(
+                archive_name, expected_sha256 or package["link"]
+            )
+            archive_path = part_path
+            chunks = download_chunks(package["link"], part_path, sha256_hash)
 
-    if resp.status_code == 404:
-        # fall back to JDK 21
-        fallback_jdk_num = "21"
-        resp = requests.get(
-            f"https://api.adoptium.net/v3/binary/latest/{fallback_jdk_num}/ga/{os}/{arch}/jdk/hotspot/normal/eclipse",
-            stream=True,
-        )
+        extract_dir = Path(tempfile.mkdtemp(prefix="jdk-", dir=cache_dir))
+        try:
+            if os == "windows":
+                # zip archives can't be extracted while streaming since their index is at the end
+                for _ in chunks:
+                    pass
+                with zipfile.ZipFile(archive_path) as zip:
+                    zip.extractall(extract_dir)
+            else:
+                with tarfile.open(
+                    fileobj=ChunkStream(chunks), mode="r|*", errorlevel=0
+                ) as tar:
+                    tar.extractall(extract_dir, numeric_owner=True, filter="tar")
+                # read whatever follows the end of the tar archive so it's part of the checksum
+                for _ in chunks:
+                    pass
 
-    resp.raise_for_status()
+            if expected_sha256 and expected_sha256 != sha256_hash.hexdigest():
+                part_path.unlink(missing_ok=True)
+                raise Exception(
+                    f"Downloaded JDK doesn't have the correct SHA256 sum. Expected: {expected_sha256}, got {sha256_hash.hexdigest()}."
+                )
 
-    with tempfile.NamedTemporaryFile() as temp_file:
-        with temp_file.file as f:
-            for chunk in resp.iter_content(2**8):
-                f.write(chunk)
-        if os == "windows":
-            with zipfile.ZipFile(temp_file) as zip:
-                toplevel_dir = zip.namelist()[0]
-                zip.extractall(cache_dir)
-        elif os == "mac":
-            with tarfile.open(temp_file.name, mode="r:*", errorlevel=0) as tar:
-                toplevel_dir = Path(tar.getnames()[0]) / "Contents" / "Home"
-                tar.extractall(cache_dir, numeric_owner=True, filter="tar")
-        else:
-            with tarfile.open(temp_file.name, mode="r:*", errorlevel=0) as tar:
-                toplevel_dir = tar.getnames()[0]
-                tar.extractall(cache_dir, numeric_owner=True, filter="tar")
+            (toplevel_dir,) = extract_dir.iterdir()
+            if os == "mac":
+                toplevel_dir = toplevel_dir / "Contents" / "Home"
 
-    shutil.move(cache_dir / toplevel_dir, cache_dir / "jdk")
+            # renaming within cache_dir is atomic, so other processes never see a partial JDK
+            toplevel_dir.rename(cache_dir / "jdk")
+        finally:
+            shutil.rmtree(extract_dir, ignore_errors=True)
 
-    if not jdk_exists(str(cache_dir / "jdk")):
-        raise Exception(
-            "Could not extract the JDK. Please download and provide one yourself."
-        )
+        part_path.unlink(missing_ok=True)
+
+        if not jdk_exists(str(cache_dir / "jdk")):
+            raise Exception(
+                "Could not extract the JDK. Please download and provide one yourself."
+            )
 
 
 def ensure_jdk_installed(
@@ -235,44 +1006,118 @@ def ensure_code_tracer_installed(update_existing: bool = False):
             )
             return
 
-    dl_info_path = Path(cache_dir / "code_tracer_dl_headers.json")
+    with cache_lock("code-tracer"):
+        # another process may have installed the tracer while we were waiting for the lock
+        if (cache_dir / "code-tracer.jar").is_file() and not update_existing:
+            return
 
-    headers = {}
-    if (cache_dir / "code-tracer.jar").is_file() and dl_info_path.is_file():
-        with open(dl_info_path, "r") as dl_info_file:
-            dl_info = json.load(dl_info_file)
-        if "Last-Modified" in dl_info:
-            headers["If-Modified-Since"] = dl_info["Last-Modified"]
+        dl_info_path = Path(cache_dir / "code_tracer_dl_headers.json")
 
-    tracer_url_and_sum = read_tracer_url_and_sum_from_toml()
+        headers = {}
+        if (cache_dir / "code-tracer.jar").is_file() and dl_info_path.is_file():
+            with open(dl_info_path, "r") as dl_info_file:
+                dl_info = json.load(dl_info_file)
+            if "Last-Modified" in dl_info:
+                headers["If-Modified-Since"] = dl_info["Last-Modified"]
 
-    resp = requests.get(
-        (tracer_url_and_sum and tracer_url_and_sum[0])
-        or "https://github.com/cs1302uga/cs1302-tracer/releases/latest/download/code-tracer.jar",
-        headers=headers,
-        stream=True,
-    )
+        tracer_url_and_sum = read_tracer_url_and_sum_from_toml()
+        expected_sha256 = tracer_url_and_sum and tracer_url_and_sum[1]
+        sha256_hash = hashlib.sha256()
 
-    if resp.status_code == 304:
-        return
+        mirror = mirror_dir()
+        if mirror and (mirror_jar := mirror / "code-tracer.jar").is_file():
+            logger.debug(f"Installing the code tracer from {mirror_jar}")
+            expected_sha256 = _mirror_sha256(mirror_jar) or expected_sha256
+            part_path = download_part_path(
+                "code-tracer.jar", expected_sha256 or str(mirror_jar)
+            )
+            with open(part_path, "wb") as part_file:
+                for chunk in _file_chunks(mirror_jar, sha256_hash):
+                    part_file.write(chunk)
+            resp_headers = {}
+        else:
+            tracer_url = (
+                (tracer_url_and_sum and tracer_url_and_sum[0])
+                or "https://github.com/cs1302uga/cs1302-tracer/releases/latest/download/code-tracer.jar"
+            )
 
-    resp.raise_for_status()
+            resp = requests.get(
+                tracer_url,
+                headers=headers,
+                stream=True,
+            )
 
-    with tempfile.TemporaryFile() as temp_file:
-        sha256_hash = hashlib.sha256()
-        for chunk in resp.iter_content(2**8):
-            temp_file.write(chunk)
-            sha256_hash.update(chunk)
-        if tracer_url_and_sum and tracer_url_and_sum[1] != sha256_hash.hexdigest():
+            if resp.status_code == 304:
+                return
+
+            # the URL of the latest release stays the same, so its version is told by the response
+            part_path = download_part_path(
+                "code-tracer.jar",
+                expected_sha256
+                or f"{tracer_url} {resp.headers.get('ETag') or resp.headers.get('Last-Modified')}",
+            )
+            for _ in download_chunks(tracer_url, part_path, sha256_hash, response=resp):
+                pass
+            resp_headers = dict(resp.headers)
+
+        if expected_sha256 and expected_sha256 != sha256_hash.hexdigest():
+            part_path.unlink(missing_ok=True)
             raise Exception(
-                f"Downloaded tracer JAR doesn't have the correct SHA256 sum. Expected: {tracer_url_and_sum[1]}, got {sha256_hash.hexdigest()}."
+                f"Downloaded tracer JAR doesn't have the correct SHA256 sum. Expected: {expected_sha256}, got {sha256_hash.hexdigest()}."
             )
-        temp_file.seek(0)
-        with open(cache_dir / "code-tracer.jar", "wb") as jar_file:
-            shutil.copyfileobj(temp_file, jar_file)
 
-    with open(dl_info_path, "w") as dl_info_file:
-        json.dump(dict(resp.headers), dl_info_file)
+        os.replace(part_path, cache_dir / "code-tracer.jar")
+
+        atomic_write(dl_info_path, json.dumps(resp_headers).encode())
+
+
+def add_limit_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add command line options for each of the TracerLimits keys to ``parser``."""
+
+    parser.add_argument(
+        "--max-heap",
+        help="Max Java heap size (in megabytes) of the tracer JVM.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        help="Max data segment size (in megabytes) of each process run by the tracer.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--cpu-time",
+        help="Max CPU time (in seconds) of each process run by the tracer.",
+        type=float,
+    )
+
+    parser.add_argument(
+        "--max-processors",
+        help="Number of processors the tracer JVM may use.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--max-output",
+        help="Max size (in bytes) of the tracer's output.",
+        type=int,
+    )
+
+
+def limits_from_args(args: argparse.Namespace) -> TracerLimits:
+    """Build TracerLimits from options added by ``add_limit_arguments``."""
+    limits = TracerLimits()
+    for key, value in [
+        ("max_heap_mb", args.max_heap),
+        ("max_memory_mb", args.max_memory),
+        ("cpu_time_secs", args.cpu_time),
+        ("max_processors", args.max_processors),
+        ("max_output_bytes", args.max_output),
+    ]:
+        if value is not None:
+            limits[key] = value
+    return limits
 
 
 def main():
@@ -314,8 +1159,50 @@ def main():
         ),
     )
 
+    add_limit_arguments(parser)
+
+    parser.add_argument(
+        "--compact",
+        help=(
+            "Write the trace in the compact trace format (zstd compressed if available, gzip "
+            "otherwise) instead of JSON. See convert_trace."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--no-cds",
+        help="Launch the tracer without a class data sharing archive or startup JVM options.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--watch",
+        "-w",
+        help=(
+            "Trace the --input file again whenever it changes, keeping a tracer JVM booted "
+            "between changes. Stop with Ctrl+C."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--usage",
+        help=(
+            "Print the wall time, CPU time and peak memory of the tracer's process "
+            "tree to standard error (requires /proc)."
+        ),
+        action="store_true",
+    )
+
     args = parser.parse_args()
 
+    if args.watch and args.input == "-":
+        parser.error("--watch requires an --input file")
+    if args.watch and args.compact and args.output is None:
+        # compressed traces written back to back on stdout can't be told apart
+        parser.error("--watch --compact requires an --output file")
+
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
 
@@ -328,6 +1215,24 @@ def main():
     with spinner(text="Downloading Java tracer...", stream=sys.stderr):
         ensure_code_tracer_installed()
 
+    if args.watch:
+        limits = limits_from_args(args)
+        command = tracer_command(java_home, use_cds=not args.no_cds, limits=limits)
+        with WarmTracer(command + trace_arguments(), limits) as tracer:
+
+            def retrace() -> str:
+                trace = tracer.run(Path(args.input).read_text(), args.trace_timeout)
+                if args.output is None:
+                    print(trace)
+                elif args.compact:
+                    atomic_write(Path(args.output), trace_format.encode_trace(trace))
+                else:
+                    atomic_write(Path(args.output), trace.encode())
+                return f"traced {args.input}"
+
+            watch.watch_files([Path(args.input)], retrace)
+        return
+
     # get java file from stdin
     java_input = "".join(fileinput.input(args.input))
 
@@ -355,12 +1260,17 @@ def main():
     #     )
     #     exit(1)
 
+    usage: list[process_usage.ProcessUsage] | None = [] if args.usage else None
+
     try:
         with spinner(text="Generating execution trace...", stream=sys.stderr):
             trace = generate_trace(
                 java_home,
                 java_input,
                 args.trace_timeout,
+                use_cds=not args.no_cds,
+                limits=limits_from_args(args),
+                usage=usage,
             )
     except CalledProcessError as e:
         logger.exception(
@@ -368,7 +1278,17 @@ def main():
         )
         exit(1)
 
-    if args.output is None:
+    if usage is not None:
+        print(process_usage.summarize(usage), file=sys.stderr)
+
+    if args.compact:
+        compact_trace = trace_format.encode_trace(trace)
+        if args.output is None:
+            sys.stdout.buffer.write(compact_trace)
+        else:
+            with open(args.output, "wb") as f:
+                f.write(compact_trace)
+    elif args.output is None:
         print(trace)
     else:
         with open(args.output, "w") as f:
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import logging
+import sys
+import time
+
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def file_states(paths: list[Path]) -> list[tuple[int, int] | None]:
+    """Return the modification time and size of each path, or None for missing paths."""
+    states: list[tuple[int, int] | None] = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            states.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            states.append(None)
+    return states
+
+
+def watch_files(
+    paths: list[Path],
+    on_change: Callable[[], str | None],
+    *,
+    debounce_secs: float = 0.3,
+    poll_secs: float = 0.1,
+) -> None:
+    """Call ``on_change`` now and again whenever one of ``paths`` changes, until interrupted.
+
+    Files are polled, so this works the same on every platform and file system. A change is only
+    acted on once the files have stopped changing for ``debounce_secs``, so editors that save in
+    several steps trigger a single update. Exceptions raised by ``on_change`` are logged and don't
+    stop watching.
+
+    After each call, a line with the time, the summary returned by ``on_change`` (if any) and the
+    call's latency is printed to standard error.
+
+    Args:
+        paths: The files to watch.
+        on_change: The update to run. It may return a short summary of what it did.
+        debounce_secs: How long the files must stay unchanged before ``on_change`` is called.
+        poll_secs: How often the files are checked for changes.
+    """
+    states = file_states(paths)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                summary = on_change()
+            except Exception as exc:
+                logger.debug("Update failed", exc_info=True)
+                summary = f"failed: {exc}"
+            latency_ms = (time.perf_counter() - start) * 1000
+            print(
+                f"[{datetime.now():%H:%M:%S}] {summary or 'updated'} ({latency_ms:.0f} ms)",
+                file=sys.stderr,
+            )
+
+            while (new_states := file_states(paths)) == states:
+                time.sleep(poll_secs)
+
+            while True:
+                time.sleep(debounce_secs)
+                if (settled_states := file_states(paths)) == new_states:
+                    break
+                new_states = settled_states
+
+            states = new_states
+    except KeyboardInterrupt:
+        pass